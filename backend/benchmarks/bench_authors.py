@@ -0,0 +1,117 @@
+"""
+Index size and leaderboard aggregation speed with the user's name repeated
+on every karma row (the layout before the Author table) vs an interned
+integer author id.
+
+Both layouts hold the same karma history and get the same
+(user, -created_at, -id, points) index as KarmaTransaction. The all-time
+leaderboard's GROUP BY user runs on each; for the interned layout the
+id -> name lookup LeaderboardEntry.rebuild does afterwards is timed too.
+"""
+import random
+import time
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from .harness import test_database, report
+
+from django.db import connection
+
+from community.authors import author_ids
+from community.models import Author
+
+USERS = 5000
+TRANSACTIONS = 400000
+ITERATIONS = 5
+INSERT_BATCH = 10000
+
+# (label, table, type of the user column)
+LAYOUTS = [
+    ('name (varchar)', 'bench_karma_name', 'VARCHAR(255)'),
+    ('interned author id', 'bench_karma_id', 'BIGINT'),
+]
+
+
+def history():
+    """Synthetic (user name, points, created_at) rows with realistic name lengths."""
+    rng = random.Random(TRANSACTIONS)
+    words = ['river', 'quantum', 'maple', 'falcon', 'nightowl', 'pixel', 'harbor', 'juniper']
+    names = [f'{rng.choice(words)}_{rng.choice(words)}{i}' for i in range(USERS)]
+    start = datetime(2026, 1, 1, tzinfo=dt_timezone.utc)
+    return [
+        (rng.choice(names), rng.choice((5, 1, -1)), start + timedelta(seconds=i * 7))
+        for i in range(TRANSACTIONS)
+    ]
+
+
+def database_bytes(cursor):
+    cursor.execute('PRAGMA page_count')
+    pages = cursor.fetchone()[0]
+    cursor.execute('PRAGMA page_size')
+    return pages * cursor.fetchone()[0]
+
+
+def build(cursor, table, column_type, rows):
+    """Create and fill a karma table, returning the size of its user index in bytes."""
+    qn = connection.ops.quote_name
+    cursor.execute(
+        f"CREATE TABLE {qn(table)} (id INTEGER PRIMARY KEY, {qn('user')} {column_type} NOT NULL, "
+        f"points INTEGER NOT NULL, created_at TIMESTAMP NOT NULL)"
+    )
+    insert = f"INSERT INTO {qn(table)} (id, {qn('user')}, points, created_at) VALUES (%s, %s, %s, %s)"
+    for start in range(0, len(rows), INSERT_BATCH):
+        cursor.executemany(insert, [
+            (start + offset + 1, user, points, connection.ops.adapt_datetimefield_value(created_at))
+            for offset, (user, points, created_at) in enumerate(rows[start:start + INSERT_BATCH])
+        ])
+
+    index = f'{table}_user_idx'
+    before = database_bytes(cursor) if connection.vendor == 'sqlite' else 0
+    cursor.execute(f"CREATE INDEX {qn(index)} ON {qn(table)} ({qn('user')}, created_at DESC, id DESC, points)")
+    if connection.vendor == 'sqlite':
+        return database_bytes(cursor) - before
+    cursor.execute('SELECT pg_relation_size(%s)', [index])
+    return cursor.fetchone()[0]
+
+
+def best_of(fn):
+    timings = []
+    for _ in range(ITERATIONS):
+        start = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def main():
+    rows = []
+    qn = connection.ops.quote_name
+    with test_database():
+        named = history()
+        ids = author_ids(name for name, _, _ in named)
+        interned = [(ids[name], points, created_at) for name, points, created_at in named]
+
+        with connection.cursor() as cursor:
+            for (layout, table, column_type), data in zip(LAYOUTS, (named, interned)):
+                index_size = build(cursor, table, column_type, data)
+
+                def aggregate():
+                    cursor.execute(
+                        f"SELECT {qn('user')}, SUM(points) FROM {qn(table)} GROUP BY {qn('user')}"
+                    )
+                    return cursor.fetchall()
+
+                def name_lookup():
+                    Author.names(user for user, _ in totals)
+
+                seconds = best_of(aggregate)
+                totals = aggregate()
+                lookup = best_of(name_lookup) if data is interned else 0
+                rows.append((layout, f'index {index_size / 1024 / 1024:6.1f} MiB',
+                             f'GROUP BY user {seconds * 1000:7.1f} ms',
+                             f'+ id -> name lookup {lookup * 1000:5.1f} ms'))
+
+    report(f'{TRANSACTIONS} karma transactions from {USERS} users on {connection.vendor}', rows)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,73 @@
+"""
+Throughput and peak Python memory of the NDJSON export for growing tables,
+compared with walking the paginated posts endpoint.
+"""
+import time
+import tracemalloc
+
+from .harness import test_database, report
+
+from django.test import Client
+
+from community.export import Export
+from community.authors import author_ids
+from community.models import Post, PostLike
+
+TABLE_SIZES = [10000, 50000]
+
+
+def measure(fn):
+    """(seconds, peak traced allocation in KiB) of fn()."""
+    tracemalloc.start()
+    start = time.perf_counter()
+    fn()
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return elapsed, peak // 1024
+
+
+def main():
+    client = Client(HTTP_HOST='localhost')
+    rows = []
+    with test_database():
+        created = 0
+        for size in TABLE_SIZES:
+            ids = author_ids(f'user{i}' for i in range(size * 4))
+            Post.objects.bulk_create(
+                [Post(author_id=ids[f'user{i % 97}'], content='Lorem ipsum dolor sit amet. ' * 4)
+                 for i in range(created, size)],
+                batch_size=1000
+            )
+            post_ids = list(Post.objects.order_by('id').values_list('id', flat=True))
+            PostLike.objects.bulk_create(
+                [PostLike(user_id=ids[f'user{i}'], post_id=post_ids[i // 4]) for i in range(created * 4, size * 4)],
+                batch_size=1000
+            )
+            created = size
+
+            def export():
+                for _ in Export(['posts', 'post_likes']).chunks():
+                    pass
+
+            def paginate():
+                page = 1
+                while True:
+                    response = client.get('/api/posts/', {'page': page, 'fields': 'id,author,content'})
+                    if response.status_code != 200 or not response.json()['next']:
+                        break
+                    page += 1
+
+            export_seconds, export_peak = measure(export)
+            api_seconds, api_peak = measure(paginate)
+            rows.append((
+                f'{size} posts + {size * 4} likes',
+                f'export {size * 5 / export_seconds:9.0f} rows/s {export_peak:6d} KiB',
+                f'API pages (posts only) {size / api_seconds:7.0f} rows/s {api_peak:6d} KiB',
+            ))
+
+    report('NDJSON export vs paginated API', rows)
+
+
+if __name__ == '__main__':
+    main()
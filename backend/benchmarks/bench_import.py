@@ -0,0 +1,83 @@
+"""
+Rows per second of the bulk NDJSON import vs creating the same rows
+through the ORM (Post/Comment.save and the like write path).
+"""
+import json
+import random
+import time
+
+from .harness import test_database, report
+
+from django.db import transaction
+
+from community.bulk_import import Import
+from community.likes import add_like
+from community.models import Author, Post, Comment
+
+POSTS = 2000
+COMMENTS_PER_POST = 25
+LIKES_PER_POST = 100
+ORM_POSTS = 100
+
+
+def dump(posts):
+    """NDJSON lines for a synthetic community in export_data order."""
+    rng = random.Random(posts)
+    lines = []
+    comment_id = 0
+    for post_id in range(1, posts + 1):
+        lines.append({'type': 'post', 'id': post_id, 'author': f'user{post_id % 97}',
+                      'content': 'Lorem ipsum dolor sit amet. ' * 4})
+    for post_id in range(1, posts + 1):
+        thread = []
+        for _ in range(COMMENTS_PER_POST):
+            comment_id += 1
+            parent = rng.choice(thread) if thread and rng.random() < 0.7 else None
+            thread.append(comment_id)
+            lines.append({'type': 'comment', 'id': comment_id, 'post_id': post_id, 'parent_id': parent,
+                          'author': f'user{comment_id % 89}', 'content': 'Comment text. ' * 3})
+    for post_id in range(1, posts + 1):
+        for liker in range(LIKES_PER_POST):
+            lines.append({'type': 'like', 'user': f'liker{liker}', 'target': 'post', 'object_id': post_id})
+    return [json.dumps(line) for line in lines]
+
+
+def orm_load(lines):
+    """What a naive migration script does: save() per row, likes through the app's write path."""
+    posts, comments = {}, {}
+    with transaction.atomic():
+        for line in map(json.loads, lines):
+            if line['type'] == 'post':
+                posts[line['id']] = Post.objects.create(author=Author.intern(line['author']), content=line['content'])
+            elif line['type'] == 'comment':
+                comments[line['id']] = Comment.objects.create(
+                    post=posts[line['post_id']], parent=comments.get(line['parent_id']),
+                    author=Author.intern(line['author']), content=line['content']
+                )
+            else:
+                add_like(Post, posts[line['object_id']].id, line['user'])
+
+
+def bulk_load(lines):
+    """Bulk import, including the counter, karma and hot score recompute."""
+    with transaction.atomic():
+        run = Import()
+        run.load(lines)
+        run.finish()
+
+
+def main():
+    rows = []
+    with test_database():
+        for label, load, posts in (('ORM save() / add_like', orm_load, ORM_POSTS), ('bulk import', bulk_load, POSTS)):
+            lines = dump(posts)
+            start = time.perf_counter()
+            load(lines)
+            elapsed = time.perf_counter() - start
+            rows.append((label, f'{len(lines):7d} rows', f'{elapsed:6.2f}s', f'{len(lines) / elapsed:8.0f} rows/s'))
+
+    report(f'Importing posts with {COMMENTS_PER_POST} comments and {LIKES_PER_POST} likes each', rows)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,181 @@
+"""
+Like insert rate and "liked-by" lookups with the generic-key Like table
+(content_type, object_id, user) vs the typed PostLike / CommentLike tables
+(post | comment, user).
+
+Both layouts get the same constraints and indexes the models had: a unique
+(target, user) key and a (user, -created_at, -id, target) history index,
+with content_type leading the generic ones. Inserts go through the
+ON CONFLICT DO NOTHING RETURNING statement community.likes issues; the
+lookups are the home feed's "which of these posts has the viewer liked" and
+the count of a post's likers.
+"""
+import random
+import time
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from .harness import test_database, report
+
+from django.db import connection
+
+USERS = 5000
+POSTS = 20000
+COMMENTS = 60000
+LIKES = 300000
+INSERTS = 20000
+LOOKUPS = 2000
+PAGE = 20
+INSERT_BATCH = 10000
+
+POST_TYPE, COMMENT_TYPE = 1, 2
+
+
+def history():
+    """Synthetic (content type, object id, user, created_at) likes, unique per target and user."""
+    rng = random.Random(LIKES)
+    start = datetime(2026, 1, 1, tzinfo=dt_timezone.utc)
+    seen = set()
+    while len(seen) < LIKES + INSERTS:
+        if rng.random() < 0.4:
+            seen.add((POST_TYPE, rng.randrange(1, POSTS + 1), rng.randrange(1, USERS + 1)))
+        else:
+            seen.add((COMMENT_TYPE, rng.randrange(1, COMMENTS + 1), rng.randrange(1, USERS + 1)))
+    likes = sorted(seen)
+    rng.shuffle(likes)
+    return [
+        (content_type, object_id, user, start + timedelta(seconds=i * 3))
+        for i, (content_type, object_id, user) in enumerate(likes)
+    ]
+
+
+class Generic:
+    label = 'generic (content_type, object_id)'
+
+    def create(self, cursor):
+        cursor.execute(
+            "CREATE TABLE bench_like (id INTEGER PRIMARY KEY, content_type_id INTEGER NOT NULL, "
+            "object_id INTEGER NOT NULL, user_id INTEGER NOT NULL, created_at TIMESTAMP NOT NULL, "
+            "UNIQUE (content_type_id, object_id, user_id))"
+        )
+        cursor.execute(
+            "CREATE INDEX bench_like_user_idx "
+            "ON bench_like (content_type_id, user_id, created_at DESC, id DESC, object_id)"
+        )
+
+    def insert(self, cursor, content_type, object_id, user, created_at):
+        cursor.execute(
+            "INSERT INTO bench_like (content_type_id, object_id, user_id, created_at) "
+            "VALUES (%s, %s, %s, %s) "
+            "ON CONFLICT (content_type_id, object_id, user_id) DO NOTHING RETURNING id",
+            [content_type, object_id, user, created_at]
+        )
+        return cursor.fetchone()
+
+    def liked_posts(self, cursor, user, post_ids):
+        cursor.execute(
+            f"SELECT object_id FROM bench_like WHERE content_type_id = %s AND user_id = %s "
+            f"AND object_id IN ({', '.join(['%s'] * len(post_ids))})",
+            [POST_TYPE, user, *post_ids]
+        )
+        return cursor.fetchall()
+
+    def likers(self, cursor, post_id):
+        cursor.execute(
+            "SELECT COUNT(*) FROM bench_like WHERE content_type_id = %s AND object_id = %s",
+            [POST_TYPE, post_id]
+        )
+        return cursor.fetchone()
+
+
+class Typed:
+    label = 'typed (post_id | comment_id)'
+    tables = {POST_TYPE: ('bench_postlike', 'post_id'), COMMENT_TYPE: ('bench_commentlike', 'comment_id')}
+
+    def create(self, cursor):
+        for table, target in self.tables.values():
+            cursor.execute(
+                f"CREATE TABLE {table} (id INTEGER PRIMARY KEY, {target} INTEGER NOT NULL, "
+                f"user_id INTEGER NOT NULL, created_at TIMESTAMP NOT NULL, UNIQUE ({target}, user_id))"
+            )
+            cursor.execute(
+                f"CREATE INDEX {table}_user_idx ON {table} (user_id, created_at DESC, id DESC, {target})"
+            )
+
+    def insert(self, cursor, content_type, object_id, user, created_at):
+        table, target = self.tables[content_type]
+        cursor.execute(
+            f"INSERT INTO {table} ({target}, user_id, created_at) VALUES (%s, %s, %s) "
+            f"ON CONFLICT ({target}, user_id) DO NOTHING RETURNING id",
+            [object_id, user, created_at]
+        )
+        return cursor.fetchone()
+
+    def liked_posts(self, cursor, user, post_ids):
+        cursor.execute(
+            f"SELECT post_id FROM bench_postlike WHERE user_id = %s "
+            f"AND post_id IN ({', '.join(['%s'] * len(post_ids))})",
+            [user, *post_ids]
+        )
+        return cursor.fetchall()
+
+    def likers(self, cursor, post_id):
+        cursor.execute("SELECT COUNT(*) FROM bench_postlike WHERE post_id = %s", [post_id])
+        return cursor.fetchone()
+
+
+def fill(cursor, layout, likes):
+    """Load the existing history through the layout's own insert statement."""
+    for start in range(0, len(likes), INSERT_BATCH):
+        for content_type, object_id, user, created_at in likes[start:start + INSERT_BATCH]:
+            layout.insert(cursor, content_type, object_id, user, created_at)
+
+
+def main():
+    rows = []
+    likes = [
+        (content_type, object_id, user, connection.ops.adapt_datetimefield_value(created_at))
+        for content_type, object_id, user, created_at in history()
+    ]
+    existing, new = likes[:LIKES], likes[LIKES:]
+    rng = random.Random(LOOKUPS)
+    feeds = [
+        (rng.randrange(1, USERS + 1), rng.sample(range(1, POSTS + 1), PAGE))
+        for _ in range(LOOKUPS)
+    ]
+
+    with test_database(), connection.cursor() as cursor:
+        for layout in (Generic(), Typed()):
+            layout.create(cursor)
+            fill(cursor, layout, existing)
+
+            start = time.perf_counter()
+            for like in new:
+                layout.insert(cursor, *like)
+            inserts = time.perf_counter() - start
+
+            start = time.perf_counter()
+            for like in new[:LOOKUPS]:
+                layout.insert(cursor, *like)
+            duplicates = time.perf_counter() - start
+
+            start = time.perf_counter()
+            for user, post_ids in feeds:
+                layout.liked_posts(cursor, user, post_ids)
+            liked_by = time.perf_counter() - start
+
+            start = time.perf_counter()
+            for user, post_ids in feeds:
+                layout.likers(cursor, post_ids[0])
+            likers = time.perf_counter() - start
+
+            rows.append((layout.label,
+                         f'{INSERTS / inserts:8.0f} inserts/s',
+                         f'{LOOKUPS / duplicates:8.0f} duplicates/s',
+                         f'liked-by page {liked_by / LOOKUPS * 1e6:6.1f} us',
+                         f'likers of post {likers / LOOKUPS * 1e6:6.1f} us'))
+
+    report(f'{LIKES} existing likes from {USERS} users, {INSERTS} new, on {connection.vendor}', rows)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,81 @@
+"""
+Throughput of the like write path: community.likes vs the previous
+get_object / get_or_create / refresh_from_db implementation, and with
+LIKE_OUTBOX on (request path only, then the worker draining the outbox).
+"""
+from .harness import test_database, timed, report
+
+from django.contrib.contenttypes.models import ContentType
+from django.db import transaction
+from django.db.models import Count, F
+from django.test import override_settings
+
+from community import likes, outbox
+from community.models import Author, Post, PostLike, KarmaTransaction
+
+ITERATIONS = 2000
+POSTS = 50
+
+
+def legacy_like(post_id, user):
+    """The PostViewSet.like body before the upsert/RETURNING rewrite."""
+    post = Post.objects.select_related('author').annotate(comment_count_annotated=Count('comments')).get(pk=post_id)
+    with transaction.atomic():
+        content_type = ContentType.objects.get_for_model(Post)
+        like, created = PostLike.objects.get_or_create(user=Author.intern(user), post_id=post.id)
+        if not created:
+            return None
+        Post.objects.filter(id=post.id).update(like_count=F('like_count') + 1)
+        Post.refresh_hot_score(post.id)
+        KarmaTransaction.record(
+            user=post.author,
+            points=5,
+            transaction_type=KarmaTransaction.POST_LIKE,
+            content_type=content_type,
+            object_id=post.id
+        )
+        post.refresh_from_db()
+        return post.like_count
+
+
+def main():
+    with test_database():
+        post_ids = [
+            Post.objects.create(author=Author.intern(f'author{i}'), content='Benchmark post').id
+            for i in range(POSTS)
+        ]
+
+        def run_legacy(i):
+            legacy_like(post_ids[i % POSTS], f'legacy{i}')
+
+        def run_upsert(i):
+            likes.add_like(Post, post_ids[i % POSTS], f'upsert{i}')
+
+        def run_duplicate(i):
+            likes.add_like(Post, post_ids[0], 'upsert0')
+
+        def run_outbox(i):
+            likes.add_like(Post, post_ids[i % POSTS], f'outbox{i}')
+
+        rows = []
+        for label, fn in [
+            ('legacy', run_legacy),
+            ('upsert + RETURNING', run_upsert),
+            ('upsert, already liked', run_duplicate),
+        ]:
+            elapsed, queries = timed(fn, ITERATIONS)
+            rows.append((label, f'{ITERATIONS / elapsed:8.0f} likes/s', f'{queries:.1f} queries/like'))
+
+        with override_settings(LIKE_OUTBOX=True):
+            elapsed, queries = timed(run_outbox, ITERATIONS)
+        rows.append(('outbox, request path', f'{ITERATIONS / elapsed:8.0f} likes/s',
+                     f'{queries:.1f} queries/like'))
+        elapsed, queries = timed(lambda i: outbox.drain(), 1)
+        rows.append(('outbox, worker drain', f'{ITERATIONS / elapsed:8.0f} likes/s',
+                     f'{queries / ITERATIONS:.2f} queries/like'))
+
+    report(f'Post like throughput ({ITERATIONS} likes over {POSTS} posts)', rows)
+
+
+if __name__ == '__main__':
+    main()
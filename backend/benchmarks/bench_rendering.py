@@ -0,0 +1,57 @@
+"""
+Encode time and bytes on the wire for the feed and a large thread:
+DRF's stdlib JSONRenderer vs FastJSONRenderer (orjson) vs MessagePack,
+raw and gzipped.
+"""
+import gzip
+import time
+
+from .harness import test_database, report
+from .bench_streaming import build_thread
+
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIClient
+
+from community.models import Author, Post
+from community.renderers import FastJSONRenderer, MessagePackRenderer, orjson, msgpack
+
+REPEAT = 20
+THREAD_SIZE = 5000
+
+
+def measure(renderer, data):
+    start = time.perf_counter()
+    for _ in range(REPEAT):
+        body = renderer.render(data)
+    elapsed_ms = (time.perf_counter() - start) / REPEAT * 1000
+    return (
+        f'{elapsed_ms:8.2f} ms',
+        f'{len(body) / 1024:8.1f} KiB raw',
+        f'{len(gzip.compress(body, compresslevel=6)) / 1024:7.1f} KiB gzip',
+    )
+
+
+def main():
+    renderers = [('stdlib json', JSONRenderer())]
+    renderers.append(('orjson' if orjson else 'fast json (no orjson)', FastJSONRenderer()))
+    if msgpack:
+        renderers.append(('msgpack', MessagePackRenderer()))
+
+    client = APIClient(HTTP_HOST='localhost')
+    with test_database():
+        for i in range(20):
+            Post.objects.create(author=Author.intern(f'user{i}'), content='Feed post content. ' * 20)
+        thread = Post.objects.create(author=Author.intern('author'), content='Big thread')
+        build_thread(thread, THREAD_SIZE, 1)
+
+        payloads = [
+            ('feed page', client.get('/api/posts/').data),
+            (f'{THREAD_SIZE}-comment thread', client.get(f'/api/posts/{thread.id}/').data),
+        ]
+
+    for title, data in payloads:
+        report(f'Rendering: {title}', [(name, *measure(r, data)) for name, r in renderers])
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,79 @@
+"""
+Peak Python memory of the post detail endpoint, buffered vs ?stream=1,
+for growing comment threads.
+"""
+import random
+import tracemalloc
+
+from .harness import test_database, report
+
+from django.test import Client
+
+from community.authors import author_ids
+from community.models import Author, Post, Comment
+
+THREAD_SIZES = [1000, 5000, 20000]
+MAX_DEPTH = 8
+
+
+def build_thread(post, size, first_id):
+    """Bulk-insert a random comment tree with precomputed paths."""
+    rng = random.Random(size)
+    authors = author_ids(f'user{i}' for i in range(97))
+    comments = []
+    for offset in range(size):
+        pk = first_id + offset
+        parent = rng.choice(comments) if comments and rng.random() < 0.8 else None
+        if parent is not None and parent.depth >= MAX_DEPTH:
+            parent = None
+        comments.append(Comment(
+            id=pk,
+            post=post,
+            parent=parent,
+            author_id=authors[f'user{pk % 97}'],
+            content='Lorem ipsum dolor sit amet, consectetur adipiscing elit. ' * 3,
+            path=f'{parent.path}/{pk}' if parent else str(pk),
+            depth=parent.depth + 1 if parent else 0,
+        ))
+    Comment.objects.bulk_create(comments, batch_size=1000)
+
+
+def peak_memory(fetch):
+    """Peak traced allocation (KiB) while fetching and consuming a response."""
+    tracemalloc.start()
+    fetch()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return peak // 1024
+
+
+def main():
+    client = Client(HTTP_HOST='localhost')
+    rows = []
+    with test_database():
+        next_id = 1
+        for size in THREAD_SIZES:
+            post = Post.objects.create(author=Author.intern('author'), content=f'{size} comments')
+            build_thread(post, size, next_id)
+            next_id += size
+            url = f'/api/posts/{post.id}/'
+
+            def buffered():
+                assert len(client.get(url).content)
+
+            def streamed():
+                response = client.get(url + '?stream=1')
+                for _ in response.streaming_content:
+                    pass
+
+            rows.append((
+                f'{size} comments',
+                f'buffered {peak_memory(buffered):8d} KiB',
+                f'streamed {peak_memory(streamed):8d} KiB',
+            ))
+
+    report('Peak memory of post detail rendering', rows)
+
+
+if __name__ == '__main__':
+    main()
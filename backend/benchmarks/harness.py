@@ -0,0 +1,56 @@
+"""
+Shared setup for the benchmark scripts.
+
+Benchmarks run against a throwaway test database (in-memory for SQLite),
+so they never touch the development data. Run them from backend/, e.g.:
+
+    python -m benchmarks.bench_likes
+"""
+import os
+import sys
+import time
+from contextlib import contextmanager
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'config.settings')
+
+import django  # noqa: E402
+
+django.setup()
+
+from django.db import connection  # noqa: E402
+
+
+@contextmanager
+def test_database():
+    """Create a fresh test database for the duration of the block."""
+    old_name = connection.creation.create_test_db(verbosity=0)
+    try:
+        yield
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity=0)
+
+
+def timed(fn, iterations):
+    """Run fn(i) for each iteration, returning (seconds, queries per call)."""
+    queries = 0
+
+    def count(execute, sql, params, many, context):
+        nonlocal queries
+        queries += 1
+        return execute(sql, params, many, context)
+
+    with connection.execute_wrapper(count):
+        start = time.perf_counter()
+        for i in range(iterations):
+            fn(i)
+        elapsed = time.perf_counter() - start
+    return elapsed, queries / iterations
+
+
+def report(title, rows):
+    """Print a small aligned results table."""
+    print(f'\n{title}')
+    width = max(len(row[0]) for row in rows)
+    for label, *values in rows:
+        print(f'  {label.ljust(width)}  ' + '  '.join(str(v) for v in values))
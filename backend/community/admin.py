@@ -1,11 +1,22 @@
 from django.contrib import admin
-from .models import Post, Comment, Like, KarmaTransaction
+from .models import (
+    Author, Post, Comment, PostLike, CommentLike, LikeEvent, KarmaTransaction, UserKarma,
+    LeaderboardEntry, ScheduledJob, JobRun
+)
+
+@admin.register(Author)
+class AuthorAdmin(admin.ModelAdmin):
+    list_display = ('id', 'name')
+    search_fields = ('name',)
+
 
 @admin.register(Post)
 class PostAdmin(admin.ModelAdmin):
     list_display = ('id', 'author', 'content_preview', 'created_at', 'like_count')
     list_filter = ('created_at',)
-    search_fields = ('content', 'author')
+    list_select_related = ('author',)
+    search_fields = ('content', 'author__name')
+    raw_id_fields = ('author',)
     
     def content_preview(self, obj):
         return obj.content[:50] + '...' if len(obj.content) > 50 else obj.content
@@ -16,23 +27,71 @@ class PostAdmin(admin.ModelAdmin):
 class CommentAdmin(admin.ModelAdmin):
     list_display = ('id', 'author', 'post', 'parent', 'content_preview', 'created_at', 'like_count')
     list_filter = ('created_at',)
-    search_fields = ('content', 'author')
-    raw_id_fields = ('post', 'parent')
+    list_select_related = ('author',)
+    search_fields = ('content', 'author__name')
+    raw_id_fields = ('author', 'post', 'parent')
     
     def content_preview(self, obj):
         return obj.content[:50] + '...' if len(obj.content) > 50 else obj.content
     content_preview.short_description = 'Content'
 
 
-@admin.register(Like)
-class LikeAdmin(admin.ModelAdmin):
-    list_display = ('id', 'user', 'content_type', 'object_id', 'created_at')
-    list_filter = ('content_type', 'created_at')
-    search_fields = ('user',)
+@admin.register(PostLike)
+class PostLikeAdmin(admin.ModelAdmin):
+    list_display = ('id', 'user', 'post', 'created_at')
+    list_filter = ('created_at',)
+    list_select_related = ('user',)
+    search_fields = ('user__name',)
+    raw_id_fields = ('user', 'post')
+
+
+@admin.register(CommentLike)
+class CommentLikeAdmin(admin.ModelAdmin):
+    list_display = ('id', 'user', 'comment', 'created_at')
+    list_filter = ('created_at',)
+    list_select_related = ('user',)
+    search_fields = ('user__name',)
+    raw_id_fields = ('user', 'comment')
 
 
 @admin.register(KarmaTransaction)
 class KarmaTransactionAdmin(admin.ModelAdmin):
     list_display = ('id', 'user', 'points', 'transaction_type', 'created_at')
     list_filter = ('transaction_type', 'created_at')
+    list_select_related = ('user',)
+    search_fields = ('user__name',)
+    raw_id_fields = ('user',)
+
+
+@admin.register(UserKarma)
+class UserKarmaAdmin(admin.ModelAdmin):
+    list_display = ('user', 'karma', 'post_like_karma', 'comment_like_karma', 'updated_at')
+    list_select_related = ('user',)
+    search_fields = ('user__name',)
+    raw_id_fields = ('user',)
+
+
+@admin.register(LeaderboardEntry)
+class LeaderboardEntryAdmin(admin.ModelAdmin):
+    list_display = ('window', 'user', 'karma')
+    list_filter = ('window',)
     search_fields = ('user',)
+
+
+@admin.register(LikeEvent)
+class LikeEventAdmin(admin.ModelAdmin):
+    list_display = ('id', 'user', 'content_type', 'object_id', 'delta', 'created_at')
+    list_filter = ('content_type',)
+    list_select_related = ('user', 'content_type')
+    raw_id_fields = ('user',)
+
+
+@admin.register(ScheduledJob)
+class ScheduledJobAdmin(admin.ModelAdmin):
+    list_display = ('name', 'next_run_at', 'leased_by', 'lease_expires_at')
+
+
+@admin.register(JobRun)
+class JobRunAdmin(admin.ModelAdmin):
+    list_display = ('job', 'started_at', 'duration_ms', 'rows', 'succeeded', 'ran_by')
+    list_filter = ('job', 'succeeded')
@@ -0,0 +1,89 @@
+"""
+Name -> id interning for Author.
+
+Posts, comments, likes, like outbox rows, karma transactions and karma
+totals reference an Author by integer id; the API still speaks names, so
+every write has to turn a name into an id. Those lookups go through a
+bounded per-process LRU cache (settings.AUTHOR_CACHE_SIZE), so a known
+name costs no query at all.
+
+Ids are only cached once the transaction that read or created them
+commits (transaction.on_commit runs immediately outside one), so an Author
+insert that is rolled back never leaves a dangling id behind. Authors are
+never deleted, which keeps cached ids valid for the life of the process.
+"""
+import threading
+from collections import OrderedDict
+
+from django.conf import settings
+from django.db import transaction
+
+from .models import Author
+
+
+LOOKUP_BATCH = 500
+
+_ids = OrderedDict()
+_lock = threading.Lock()
+
+
+def author_id(name, create=True):
+    """
+    Id of the Author called name, created on first use.
+    With create=False returns None for an unknown name.
+    """
+    return author_ids([name], create=create).get(name)
+
+
+def author_ids(names, create=True):
+    """
+    {name: id} for names: cached ones for free, the rest with one SELECT
+    (plus one INSERT and a re-read for names seen for the first time).
+    With create=False unknown names are left out.
+    """
+    found = {}
+    missing = []
+    with _lock:
+        for name in set(names):
+            pk = _ids.get(name)
+            if pk is None:
+                missing.append(name)
+            else:
+                _ids.move_to_end(name)
+                found[name] = pk
+    if not missing:
+        return found
+
+    fetched = _fetch(missing)
+    new = [name for name in missing if name not in fetched]
+    if new and create:
+        # A concurrent writer may intern the same name; the unique constraint keeps one row
+        Author.objects.bulk_create([Author(name=name) for name in new], ignore_conflicts=True)
+        fetched.update(_fetch(new))
+    transaction.on_commit(lambda: _remember(fetched))
+    found.update(fetched)
+    return found
+
+
+def clear_cache():
+    """Forget every cached id (e.g. after the tables were emptied)."""
+    with _lock:
+        _ids.clear()
+
+
+def _fetch(names):
+    ids = {}
+    for start in range(0, len(names), LOOKUP_BATCH):
+        ids.update(
+            Author.objects.filter(name__in=names[start:start + LOOKUP_BATCH]).values_list('name', 'id')
+        )
+    return ids
+
+
+def _remember(ids):
+    with _lock:
+        _ids.update(ids)
+        for name in ids:
+            _ids.move_to_end(name)
+        while len(_ids) > settings.AUTHOR_CACHE_SIZE:
+            _ids.popitem(last=False)
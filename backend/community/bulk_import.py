@@ -0,0 +1,366 @@
+"""
+Bulk import of NDJSON dumps (the export_data format), used by the
+import_data command to migrate existing communities.
+
+Lines are read as a stream and buffered into large multi-row INSERTs
+instead of going through Comment.save (which costs an extra UPDATE per
+row, plus ancestor counter, hot score and cache work). Posts and comments
+get new ids from the end of their tables, assigned in stream order, so
+every batch appends to the primary key index; comment paths and depths are
+built from the new ids as each comment's parent is resolved. Rows whose
+post or parent has not been seen yet wait in memory until it arrives.
+Author and user names are interned once per batch (community.authors).
+
+The denormalized values are then recomputed in set-based SQL over the
+imported id ranges: reply/descendant counts level by level from the
+deepest comments up, like counts from the like rows, karma totals and
+leaderboards from KarmaTransaction, and the posts' hot scores.
+
+Ids are allocated up front, so nothing else should write posts or
+comments while an import runs.
+"""
+import json
+from collections import Counter, defaultdict
+from datetime import timezone as dt_timezone
+
+from django.contrib.contenttypes.models import ContentType
+from django.core.management.color import no_style
+from django.db import connection
+from django.db.models import Count, F, IntegerField, Max, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from .authors import author_ids
+from .likes import KARMA_RULES
+from .models import (
+    Post, Comment, PostLike, CommentLike, KarmaTransaction, UserKarma, LeaderboardEntry, LIKE_MODELS
+)
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+DEFAULT_BATCH_SIZE = 5000
+
+# Inserted columns per model (attnames)
+COLUMNS = {
+    Post: ['id', 'author_id', 'content', 'like_count', 'created_at', 'updated_at', 'hot_score'],
+    Comment: [
+        'id', 'post_id', 'parent_id', 'path', 'depth', 'author_id', 'content', 'like_count',
+        'created_at', 'updated_at', 'reply_count', 'descendant_count',
+    ],
+    PostLike: ['post_id', 'user_id', 'created_at'],
+    CommentLike: ['comment_id', 'user_id', 'created_at'],
+    KarmaTransaction: ['user_id', 'points', 'transaction_type', 'created_at', 'content_type_id', 'object_id'],
+}
+# Position of the Author column, buffered as a name and interned when flushed
+AUTHOR_SLOTS = {
+    model: next(i for i, column in enumerate(columns) if column in ('author_id', 'user_id'))
+    for model, columns in COLUMNS.items()
+}
+
+# Model -> line type, in the order buffers are flushed (parents first)
+TYPES = {
+    Post: 'post', Comment: 'comment', PostLike: 'like', CommentLike: 'like', KarmaTransaction: 'karma',
+}
+LINE_TYPES = list(dict.fromkeys(TYPES.values()))
+
+
+class DumpError(ValueError):
+    """A line of the dump could not be decoded."""
+
+
+def _loads(line):
+    if orjson is not None:
+        return orjson.loads(line)
+    return json.loads(line)
+
+
+def _insert(model, rows, ignore_conflicts=False):
+    """
+    Multi-row INSERT of value tuples in COLUMNS[model] order.
+    Returns the number of rows inserted.
+    """
+    inserted = 0
+    qn = connection.ops.quote_name
+    fields = [model._meta.get_field(column) for column in COLUMNS[model]]
+    per_statement = connection.ops.bulk_batch_size(fields, rows)
+    head = (
+        f"INSERT INTO {qn(model._meta.db_table)} "
+        f"({', '.join(qn(field.column) for field in fields)}) VALUES "
+    )
+    placeholder = f"({', '.join(['%s'] * len(fields))})"
+    suffix = ' ON CONFLICT DO NOTHING' if ignore_conflicts else ''
+    with connection.cursor() as cursor:
+        for start in range(0, len(rows), per_statement):
+            chunk = rows[start:start + per_statement]
+            cursor.execute(
+                head + ', '.join([placeholder] * len(chunk)) + suffix,
+                [value for row in chunk for value in row]
+            )
+            inserted += cursor.rowcount
+    return inserted
+
+
+class Import:
+    """
+    One import run. Feed it lines with load(), then call finish() (inside
+    the same transaction) to flush the buffers and recompute the
+    denormalized values. counts and skipped are per line type.
+    """
+
+    def __init__(self, batch_size=DEFAULT_BATCH_SIZE, derive_karma=False):
+        self.batch_size = batch_size
+        self.derive_karma = derive_karma
+        self.now = timezone.now()
+        # Bound once: this runs for every row
+        self._adapt_datetime = connection.ops.adapt_datetimefield_value
+        self._adapted_now = self._adapt_datetime(self.now)
+        self.counts = Counter()
+        self.skipped = Counter()
+
+        # First id each table will get from this import
+        self.first_ids = {
+            model: (model.objects.aggregate(high=Max('id'))['high'] or 0) + 1 for model in TYPES
+        }
+        self.next_ids = {Post: self.first_ids[Post], Comment: self.first_ids[Comment]}
+        self.content_types = {
+            name: ContentType.objects.get_for_model(model) for name, model in (('post', Post), ('comment', Comment))
+        }
+
+        # Source id -> new post id / new comment path (its last part is the new id)
+        self.post_ids = {}
+        self.comment_paths = {}
+        # ('post' | 'comment', source id) -> comment lines waiting for it
+        self.waiting = defaultdict(list)
+        # Like/karma lines whose target has not been seen yet, retried at the end
+        self.unresolved = []
+        self.buffers = {model: [] for model in TYPES}
+        self.max_depth = 0
+
+    def load(self, lines):
+        """Import an iterable of NDJSON lines (str or bytes)."""
+        for number, line in enumerate(lines, 1):
+            if not line.strip():
+                continue
+            try:
+                row = _loads(line)
+                handler = getattr(self, f"_add_{row['type']}", None)
+            except (ValueError, TypeError, KeyError) as exc:
+                raise DumpError(f'line {number}: {exc}')
+            if handler is None:
+                self.skipped[row['type']] += 1
+                continue
+            try:
+                handler(row)
+            except (KeyError, TypeError) as exc:
+                raise DumpError(f'line {number}: missing or invalid field {exc}')
+
+    def finish(self):
+        """Flush everything, then recompute counters, karma and scores."""
+        for row in self.unresolved:
+            if self._target_id(row) is None:
+                self.skipped[row['type']] += 1
+            else:
+                getattr(self, f"_add_{row['type']}")(row)
+        self.unresolved = []
+        for lines in self.waiting.values():
+            self.skipped['comment'] += len(lines)
+        self.waiting.clear()
+        for model in TYPES:
+            self._flush(model)
+
+        self._recompute_comment_counters()
+        self._recompute_like_counts()
+        if self.derive_karma:
+            self._derive_karma()
+        self._recompute_karma()
+        Post.decay_hot_scores(ids=Post.objects.filter(id__gte=self.first_ids[Post]).values('id'))
+        self._reset_sequences()
+
+    def _add_post(self, row):
+        if row['id'] in self.post_ids:
+            self.skipped['post'] += 1
+            return
+        post_id = self._allocate(Post)
+        self.post_ids[row['id']] = post_id
+        self._buffer(Post, (
+            post_id, row['author'], row['content'], 0,
+            self._datetime(row.get('created_at')), self._datetime(row.get('updated_at')), 0,
+        ))
+        self._release(('post', row['id']))
+
+    def _add_comment(self, row):
+        post_id = self.post_ids.get(row['post_id'])
+        if post_id is None:
+            self.waiting[('post', row['post_id'])].append(row)
+            return
+        parent_path = None
+        if row.get('parent_id') is not None:
+            parent_path = self.comment_paths.get(row['parent_id'])
+            if parent_path is None:
+                self.waiting[('comment', row['parent_id'])].append(row)
+                return
+        if row['id'] in self.comment_paths:
+            self.skipped['comment'] += 1
+            return
+
+        comment_id = self._allocate(Comment)
+        if parent_path is None:
+            path, depth, parent_id = str(comment_id), 0, None
+        else:
+            path = f'{parent_path}/{comment_id}'
+            depth = path.count('/')
+            parent_id = int(parent_path.rsplit('/', 1)[-1])
+        self.comment_paths[row['id']] = path
+        self.max_depth = max(self.max_depth, depth)
+        self._buffer(Comment, (
+            comment_id, post_id, parent_id, path, depth, row['author'], row['content'], 0,
+            self._datetime(row.get('created_at')), self._datetime(row.get('updated_at')), 0, 0,
+        ))
+        self._release(('comment', row['id']))
+
+    def _add_like(self, row):
+        object_id = self._target_id(row)
+        if object_id is None:
+            self.unresolved.append(row)
+            return
+        like_model = PostLike if row['target'] == 'post' else CommentLike
+        self._buffer(like_model, (object_id, row['user'], self._datetime(row.get('created_at'))))
+
+    def _add_karma(self, row):
+        if self.derive_karma:
+            # Rebuilt from the imported likes instead
+            self.skipped['karma'] += 1
+            return
+        object_id = self._target_id(row)
+        if row.get('target') is not None and object_id is None:
+            self.unresolved.append(row)
+            return
+        content_type = self.content_types[row['target']].id if row.get('target') else None
+        self._buffer(KarmaTransaction, (
+            row['user'], row['points'], row['transaction_type'],
+            self._datetime(row.get('created_at')), content_type, object_id,
+        ))
+
+    def _datetime(self, value):
+        """Database value for an exported timestamp (naive values are UTC, missing ones now)."""
+        parsed = parse_datetime(value) if value else None
+        if parsed is None:
+            return self._adapted_now
+        if timezone.is_naive(parsed):
+            parsed = timezone.make_aware(parsed, dt_timezone.utc)
+        return self._adapt_datetime(parsed)
+
+    def _target_id(self, row):
+        """New id of a like/karma line's target, or None if not seen yet."""
+        if row.get('target') == 'post':
+            return self.post_ids.get(row['object_id'])
+        if row.get('target') == 'comment':
+            path = self.comment_paths.get(row['object_id'])
+            return int(path.rsplit('/', 1)[-1]) if path else None
+        return None
+
+    def _release(self, key):
+        """Import the comments that were waiting for a post or parent comment."""
+        for row in self.waiting.pop(key, ()):
+            self._add_comment(row)
+
+    def _allocate(self, model):
+        pk = self.next_ids[model]
+        self.next_ids[model] += 1
+        return pk
+
+    def _buffer(self, model, values):
+        buffer = self.buffers[model]
+        buffer.append(values)
+        if len(buffer) >= self.batch_size:
+            self._flush(model)
+
+    def _flush(self, model):
+        if model is not Post:
+            # Referenced rows first, so foreign keys check against inserted rows
+            self._flush(Post)
+        if model in (CommentLike, KarmaTransaction):
+            self._flush(Comment)
+        rows = self.buffers[model]
+        if not rows:
+            return
+        # One lookup per batch for all of its names
+        slot = AUTHOR_SLOTS[model]
+        ids = author_ids(row[slot] for row in rows)
+        rows = [row[:slot] + (ids[row[slot]],) + row[slot + 1:] for row in rows]
+        # Likes can repeat in a dump; the unique (target, user) constraint drops them
+        inserted = _insert(model, rows, ignore_conflicts=model in (PostLike, CommentLike))
+        self.counts[TYPES[model]] += inserted
+        self.skipped[TYPES[model]] += len(rows) - inserted
+        self.buffers[model] = []
+
+    def _recompute_comment_counters(self):
+        """
+        reply_count and descendant_count for imported comments, one UPDATE
+        per depth from the deepest level up: a comment's descendants are its
+        replies plus theirs, which the previous pass already filled in.
+        """
+        replies = Comment.objects.filter(parent=OuterRef('pk')).order_by().values('parent')
+        for depth in range(self.max_depth, -1, -1):
+            Comment.objects.filter(id__gte=self.first_ids[Comment], depth=depth).update(
+                reply_count=Coalesce(
+                    Subquery(replies.annotate(n=Count('id')).values('n')), Value(0)
+                ),
+                descendant_count=Coalesce(
+                    Subquery(replies.annotate(n=Sum(F('descendant_count') + 1)).values('n')),
+                    Value(0), output_field=IntegerField()
+                ),
+            )
+
+    def _recompute_like_counts(self):
+        """like_count of imported posts and comments from their like rows."""
+        for model, like_model in LIKE_MODELS.items():
+            target = model._meta.model_name
+            likes = (
+                like_model.objects.filter(**{target: OuterRef('pk')})
+                .order_by().values(target).annotate(n=Count('id')).values('n')
+            )
+            model.objects.filter(id__gte=self.first_ids[model]).update(
+                like_count=Coalesce(Subquery(likes), Value(0))
+            )
+
+    def _derive_karma(self):
+        """One KarmaTransaction per imported like, for the liked row's author."""
+        qn = connection.ops.quote_name
+        with connection.cursor() as cursor:
+            for name, model in (('post', Post), ('comment', Comment)):
+                points, transaction_type = KARMA_RULES[model]
+                like_model = LIKE_MODELS[model]
+                target = qn(f'{name}_id')
+                cursor.execute(
+                    f"INSERT INTO {qn(KarmaTransaction._meta.db_table)} "
+                    f"({qn('user_id')}, {qn('points')}, {qn('transaction_type')}, {qn('created_at')}, "
+                    f"{qn('content_type_id')}, {qn('object_id')}) "
+                    f"SELECT t.{qn('author_id')}, %s, %s, l.{qn('created_at')}, %s, l.{target} "
+                    f"FROM {qn(like_model._meta.db_table)} l "
+                    f"JOIN {qn(model._meta.db_table)} t ON t.{qn('id')} = l.{target} "
+                    f"WHERE l.{qn('id')} >= %s "
+                    f"ORDER BY l.{qn('id')}",
+                    [points, transaction_type, self.content_types[name].id, self.first_ids[like_model]]
+                )
+                self.counts['karma'] += cursor.rowcount
+
+    def _recompute_karma(self):
+        """Karma totals of the users with imported transactions, then the leaderboards."""
+        imported = KarmaTransaction.objects.filter(id__gte=self.first_ids[KarmaTransaction])
+        if not imported.exists():
+            return
+        UserKarma.rebuild(users=imported.values('user'))
+        LeaderboardEntry.rebuild(self.now)
+
+    def _reset_sequences(self):
+        """Move Postgres sequences past the explicitly inserted ids (no-op on SQLite)."""
+        statements = connection.ops.sequence_reset_sql(no_style(), [Post, Comment])
+        with connection.cursor() as cursor:
+            for sql in statements:
+                cursor.execute(sql)
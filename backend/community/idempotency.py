@@ -0,0 +1,110 @@
+"""
+Idempotency-Key support for write actions.
+
+A client that retries a write after a timeout sends the same
+Idempotency-Key header. The first request claims the key with an atomic
+cache.add(); once it completes, its status and body are stored under the key
+and every replay gets them back without running the view again, so retries
+never create a second PostLike/CommentLike, Comment or KarmaTransaction.
+
+Keys live in the 'idempotency' cache, which expires entries after
+IDEMPOTENCY_KEY_TTL seconds. A retry can reach any worker, so that cache is
+shared: Redis when REDIS_URL is set, otherwise a bounded database table
+(MAX_ENTRIES) whose primary key makes the claim atomic across workers.
+"""
+import hashlib
+import json
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import caches
+from rest_framework import status
+from rest_framework.response import Response
+
+
+HEADER = 'Idempotency-Key'
+MAX_KEY_LENGTH = 255
+# How long a claimed key blocks retries if its worker dies mid-request
+IN_PROGRESS_TIMEOUT = 60
+
+
+def _store():
+    return caches['idempotency']
+
+
+def _cache_key(request, key):
+    """Keys are scoped to the method and path they were first used with."""
+    scope = f'{request.method}:{request.path}:{key}'
+    return 'idempotency:' + hashlib.sha256(scope.encode()).hexdigest()
+
+
+def _fingerprint(request):
+    body = json.dumps(request.data, sort_keys=True, default=str)
+    return hashlib.sha256(body.encode()).hexdigest()
+
+
+def _error(message, status_code):
+    return Response({'error': message}, status=status_code)
+
+
+def _replay(entry, fingerprint):
+    """Response for a key that is already claimed."""
+    if entry['fingerprint'] != fingerprint:
+        return _error(
+            f'{HEADER} was already used with a different request body',
+            status.HTTP_422_UNPROCESSABLE_ENTITY
+        )
+    if entry['status'] is None:
+        return _error(
+            f'A request with this {HEADER} is still in progress',
+            status.HTTP_409_CONFLICT
+        )
+    return Response(entry['data'], status=entry['status'],
+                    headers={'Idempotent-Replayed': 'true'})
+
+
+def idempotent(view_method):
+    """
+    Make a viewset action replayable with an Idempotency-Key header.
+    Requests without the header run as usual. Server errors (5xx and
+    exceptions) release the key so the client can retry.
+    """
+    @wraps(view_method)
+    def wrapper(self, request, *args, **kwargs):
+        key = request.headers.get(HEADER)
+        if not key:
+            return view_method(self, request, *args, **kwargs)
+        if len(key) > MAX_KEY_LENGTH:
+            return _error(
+                f'{HEADER} must be at most {MAX_KEY_LENGTH} characters',
+                status.HTTP_400_BAD_REQUEST
+            )
+
+        store = _store()
+        cache_key = _cache_key(request, key)
+        fingerprint = _fingerprint(request)
+        claim = {'fingerprint': fingerprint, 'status': None, 'data': None}
+        if not store.add(cache_key, claim, IN_PROGRESS_TIMEOUT):
+            entry = store.get(cache_key)
+            if entry is not None:
+                return _replay(entry, fingerprint)
+            # Expired between add() and get(): claim it now
+            store.set(cache_key, claim, IN_PROGRESS_TIMEOUT)
+
+        try:
+            response = view_method(self, request, *args, **kwargs)
+        except Exception:
+            store.delete(cache_key)
+            raise
+
+        if response.status_code >= 500:
+            store.delete(cache_key)
+        else:
+            store.set(cache_key, {
+                'fingerprint': fingerprint,
+                'status': response.status_code,
+                'data': response.data,
+            }, settings.IDEMPOTENCY_KEY_TTL)
+        return response
+
+    return wrapper
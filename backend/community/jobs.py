@@ -0,0 +1,49 @@
+"""
+Periodic maintenance jobs run by the run_scheduler command.
+Each job returns the number of rows it touched, recorded on its JobRun.
+"""
+from datetime import timedelta
+
+from django.conf import settings
+from django.utils import timezone
+
+from . import outbox, partitions
+from .models import Post, LeaderboardEntry, JobRun
+from .scheduler import job
+
+
+# How long JobRun history is kept
+RUN_RETENTION = timedelta(days=7)
+
+
+@job('refresh_leaderboard', every=timedelta(minutes=1))
+def refresh_leaderboard():
+    """Expire aged-out karma buckets from the windowed leaderboards."""
+    return LeaderboardEntry.refresh()
+
+
+@job('decay_hot_scores', every=timedelta(minutes=10))
+def decay_hot_scores():
+    """Re-decay every post's hot score."""
+    return Post.decay_hot_scores()
+
+
+@job('process_like_events', every=timedelta(seconds=10))
+def process_like_events():
+    """Drain the like outbox, for deployments without a dedicated worker."""
+    if not settings.LIKE_OUTBOX:
+        return 0
+    return outbox.drain()
+
+
+@job('maintain_karma_partitions', every=timedelta(hours=1))
+def maintain_karma_partitions():
+    """Create upcoming karma partitions and drop those past the retention."""
+    return partitions.maintain()
+
+
+@job('purge_job_runs', every=timedelta(hours=1))
+def purge_job_runs():
+    """Delete JobRun history older than RUN_RETENTION."""
+    deleted, _ = JobRun.objects.filter(started_at__lt=timezone.now() - RUN_RETENTION).delete()
+    return deleted
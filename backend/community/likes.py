@@ -0,0 +1,197 @@
+"""
+Write path for liking and unliking posts and comments.
+
+The target row is never loaded into a model instance: the like is inserted
+into the target's typed table (PostLike / CommentLike) with INSERT ... ON
+CONFLICT DO NOTHING RETURNING and the denormalized counter
+is bumped with UPDATE ... RETURNING, which also hands back the author for the
+karma transaction. Both statements are supported by Postgres and SQLite 3.35+.
+The liking user's name is interned (community.authors) before the
+transaction starts, so a known name adds no query.
+
+With settings.LIKE_OUTBOX on, the request only writes the like row and a
+LikeEvent outbox row; counters, karma and caches are updated later by the
+process_like_events worker (community.outbox), so no hot post/comment row
+is locked by the request. The like_count it returns is the applied count
+plus the request's own change, without adding up other queued events.
+"""
+from datetime import timezone as dt_timezone
+
+from django.conf import settings
+from django.contrib.contenttypes.models import ContentType
+from django.db import connection, transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from . import tree_cache
+from .authors import author_id
+from .models import Author, Post, Comment, LikeEvent, KarmaTransaction, LIKE_MODELS
+
+
+# Karma awarded to the author per like, by target model
+KARMA_RULES = {
+    Post: (5, KarmaTransaction.POST_LIKE),
+    Comment: (1, KarmaTransaction.COMMENT_LIKE),
+}
+
+
+def add_like(model, object_id, user):
+    """
+    Like a post or comment.
+    Returns the new like_count, or None if the user had already liked it.
+    Raises model.DoesNotExist if the target does not exist.
+    """
+    user_id = author_id(user)
+    with transaction.atomic():
+        if not _insert_like(model, object_id, user_id):
+            return None
+        if settings.LIKE_OUTBOX:
+            return _enqueue(model, object_id, user_id, 1)
+        return apply_like_delta(model, object_id, 1)
+
+
+def remove_like(model, object_id, user):
+    """
+    Unlike a post or comment.
+    Returns the new like_count, or None if the user had not liked it.
+    Raises model.DoesNotExist if the target does not exist.
+    """
+    user_id = author_id(user, create=False)
+    if user_id is None:
+        # Never liked anything
+        return None
+    with transaction.atomic():
+        deleted_count, _ = LIKE_MODELS[model].objects.filter(
+            **{f'{model._meta.model_name}_id': object_id, 'user_id': user_id}
+        ).delete()
+        if deleted_count == 0:
+            return None
+        if settings.LIKE_OUTBOX:
+            return _enqueue(model, object_id, user_id, -1)
+        return apply_like_delta(model, object_id, -1)
+
+
+def apply_like_delta(model, object_id, delta):
+    """
+    Adjust the target's like_count by delta and apply the side effects
+    (karma, hot score, comment tree cache). Returns the new like_count.
+    Raises model.DoesNotExist if the target does not exist.
+    """
+    row = _bump_like_count(model, object_id, delta)
+    _apply_side_effects(model, object_id, row, delta)
+    return row['like_count']
+
+
+def _insert_like(model, object_id, user_id):
+    """
+    Insert the like row, returning False if the user already liked the
+    target. The foreign key is checked at commit, after _bump_like_count
+    has already raised for a missing target.
+    """
+    qn = connection.ops.quote_name
+    target = qn(f'{model._meta.model_name}_id')
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"INSERT INTO {qn(LIKE_MODELS[model]._meta.db_table)} "
+            f"({target}, {qn('user_id')}, {qn('created_at')}) "
+            f"VALUES (%s, %s, %s) "
+            f"ON CONFLICT ({target}, {qn('user_id')}) DO NOTHING "
+            f"RETURNING {qn('id')}",
+            [object_id, user_id, connection.ops.adapt_datetimefield_value(timezone.now())]
+        )
+        return cursor.fetchone() is not None
+
+
+def _enqueue(model, object_id, user_id, delta):
+    """
+    Append the outbox row and return the target's applied like count plus
+    delta, in one INSERT ... SELECT that also checks the target exists.
+    """
+    qn = connection.ops.quote_name
+    target = qn(model._meta.db_table)
+    event = qn(LikeEvent._meta.db_table)
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"INSERT INTO {event} ({qn('content_type_id')}, {qn('object_id')}, {qn('user_id')}, "
+            f"{qn('delta')}, {qn('created_at')}) "
+            f"SELECT %s, {qn('id')}, %s, %s, %s FROM {target} WHERE {qn('id')} = %s "
+            f"RETURNING (SELECT {qn('like_count')} FROM {target} "
+            f"WHERE {qn('id')} = {event}.{qn('object_id')}) + {qn('delta')}",
+            [
+                # Served from ContentType's per-process cache
+                ContentType.objects.get_for_model(model).id, user_id, delta,
+                connection.ops.adapt_datetimefield_value(timezone.now()), object_id
+            ]
+        )
+        row = cursor.fetchone()
+    if row is None:
+        # Rolls back the like with the surrounding transaction
+        raise model.DoesNotExist
+    return row[0]
+
+
+def _bump_like_count(model, object_id, delta):
+    """
+    Adjust like_count and return the updated counter plus what the side
+    effects need (author id and name; for posts also created_at and comment
+    count, for comments the post id).
+    """
+    qn = connection.ops.quote_name
+    table = qn(model._meta.db_table)
+    columns = ['like_count', 'author_id', 'author_name']
+    returning = (
+        f"{qn('like_count')}, {qn('author_id')}, (SELECT {qn('name')} FROM {qn(Author._meta.db_table)} "
+        f"WHERE {qn('id')} = {table}.{qn('author_id')})"
+    )
+    if model is Post:
+        columns += ['created_at', 'comment_count']
+        returning += (
+            f", {qn('created_at')}, (SELECT COUNT(*) FROM {qn(Comment._meta.db_table)} "
+            f"WHERE {qn('post_id')} = {table}.{qn('id')})"
+        )
+    else:
+        columns.append('post_id')
+        returning += f", {qn('post_id')}"
+
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"UPDATE {table} SET {qn('like_count')} = {qn('like_count')} + %s "
+            f"WHERE {qn('id')} = %s RETURNING {returning}",
+            [delta, object_id]
+        )
+        values = cursor.fetchone()
+    if values is None:
+        # Rolls back the like insert/delete with the surrounding transaction
+        raise model.DoesNotExist
+    return dict(zip(columns, values))
+
+
+def _apply_side_effects(model, object_id, row, direction):
+    """
+    Record karma for the author, then refresh the post's hot score or patch
+    the comment's like count into the cached tree.
+    """
+    points, transaction_type = KARMA_RULES[model]
+    KarmaTransaction.record(
+        user=Author(id=row['author_id'], name=row['author_name']),
+        points=points * direction,
+        transaction_type=transaction_type,
+        # Served from ContentType's per-process cache
+        content_type=ContentType.objects.get_for_model(model),
+        object_id=object_id
+    )
+    if model is Post:
+        Post.set_hot_score(
+            object_id, row['like_count'], row['comment_count'], _as_datetime(row['created_at'])
+        )
+    else:
+        tree_cache.like_count_changed(row['post_id'], object_id, row['like_count'])
+
+
+def _as_datetime(value):
+    """Raw cursors on SQLite return datetimes as naive UTC strings."""
+    if isinstance(value, str):
+        value = parse_datetime(value)
+    if timezone.is_naive(value):
+        value = timezone.make_aware(value, dt_timezone.utc)
+    return value
@@ -1,6 +1,6 @@
+from django.core.management import call_command
 from django.core.management.base import BaseCommand
-from community.models import Post, Comment, KarmaTransaction
-from django.contrib.contenttypes.models import ContentType
+from community.models import Author, Post, Comment, KarmaTransaction
 from django.utils import timezone
 from datetime import timedelta
 
@@ -37,7 +37,7 @@ class Command(BaseCommand):
 
         posts = []
         for data in posts_data:
-            post = Post.objects.create(**data)
+            post = Post.objects.create(author=Author.intern(data['author']), content=data['content'])
             posts.append(post)
             self.stdout.write(f'Created post by {data["author"]}')
 
@@ -45,76 +45,76 @@ class Command(BaseCommand):
         # Post 1 comments
         comment1 = Comment.objects.create(
             post=posts[0],
-            author='bob',
+            author=Author.intern('bob'),
             content='Great to be here! The platform looks very promising.'
         )
         
         Comment.objects.create(
             post=posts[0],
             parent=comment1,
-            author='alice',
+            author=Author.intern('alice'),
             content='Thanks Bob! Let me know if you have any suggestions.'
         )
         
         comment2 = Comment.objects.create(
             post=posts[0],
-            author='charlie',
+            author=Author.intern('charlie'),
             content='I agree, this is exactly what we needed for community discussions.'
         )
         
         Comment.objects.create(
             post=posts[0],
             parent=comment2,
-            author='diana',
+            author=Author.intern('diana'),
             content='Absolutely! The threaded comments make conversations so much easier to follow.'
         )
 
         # Post 2 comments
         comment3 = Comment.objects.create(
             post=posts[1],
-            author='alice',
+            author=Author.intern('alice'),
             content='The nested replies look perfect! How deep does the nesting go?'
         )
         
         Comment.objects.create(
             post=posts[1],
             parent=comment3,
-            author='bob',
+            author=Author.intern('bob'),
             content='It can go pretty deep! The materialized path pattern handles it efficiently.'
         )
 
         # Post 3 comments
         Comment.objects.create(
             post=posts[2],
-            author='diana',
+            author=Author.intern('diana'),
             content='The leaderboard updates in real-time based on the last 24 hours of activity!'
         )
 
         # Post 4 comments
         Comment.objects.create(
             post=posts[3],
-            author='eve',
+            author=Author.intern('eve'),
             content='The color scheme is really nice. Modern but not too flashy.'
         )
 
         # Post 5 comments
         comment4 = Comment.objects.create(
             post=posts[4],
-            author='charlie',
+            author=Author.intern('charlie'),
             content='It\'s using a clever optimization technique. All comments are loaded in a single query!'
         )
         
         Comment.objects.create(
             post=posts[4],
             parent=comment4,
-            author='eve',
+            author=Author.intern('eve'),
             content='That\'s impressive! No N+1 queries at all?'
         )
         
         Comment.objects.create(
             post=posts[4],
             parent=comment4,
-            author='charlie',
+            author=Author.intern('charlie'),
             content='Correct! The path-based ordering makes it super efficient.'
         )
 
@@ -148,7 +148,7 @@ class Command(BaseCommand):
 
         for user, points, trans_type, created_at in karma_data:
             KarmaTransaction.objects.create(
-                user=user,
+                user=Author.intern(user),
                 points=points,
                 transaction_type=trans_type,
                 created_at=created_at
@@ -156,6 +156,10 @@ class Command(BaseCommand):
 
         self.stdout.write(f'Created {KarmaTransaction.objects.count()} karma transactions')
 
+        # Seed the maintained per-user totals from the history above
+        call_command('rebuild_user_karma', stdout=self.stdout)
+        call_command('refresh_leaderboard', rebuild=True, stdout=self.stdout)
+
         # Update like counts on posts and comments based on karma transactions
         for post in posts:
             # Simulate some likes
@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+
+from community.models import Post
+
+
+class Command(BaseCommand):
+    help = 'Recomputes time-decayed hot scores for posts in batches'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size', type=int, default=500,
+            help='Number of posts to rescore per batch'
+        )
+
+    def handle(self, *args, **options):
+        updated = Post.decay_hot_scores(options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f'Rescored {updated} posts'))
@@ -0,0 +1,61 @@
+import gzip
+import sys
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from community import bulk_import
+
+
+class Command(BaseCommand):
+    help = (
+        'Loads an NDJSON dump (export_data format) of posts, comments, likes and karma, '
+        'remapping ids and recomputing counters and karma afterwards'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'input', nargs='?', default='-',
+            help='NDJSON file to read (default: stdin); .gz files are decompressed'
+        )
+        parser.add_argument(
+            '--batch-size', type=int, default=bulk_import.DEFAULT_BATCH_SIZE,
+            help='Rows buffered per table before they are inserted'
+        )
+        parser.add_argument(
+            '--derive-karma', action='store_true',
+            help='Create karma transactions from the imported likes (ignores karma lines)'
+        )
+
+    def handle(self, *args, **options):
+        if options['input'] == '-':
+            stream = sys.stdin.buffer
+        elif options['input'].endswith('.gz'):
+            stream = gzip.open(options['input'], 'rb')
+        else:
+            stream = open(options['input'], 'rb')
+
+        start = time.monotonic()
+        try:
+            # All or nothing: a failed import leaves no partial rows behind
+            with transaction.atomic():
+                run = bulk_import.Import(options['batch_size'], derive_karma=options['derive_karma'])
+                run.load(stream)
+                loaded = time.monotonic()
+                run.finish()
+        except bulk_import.DumpError as exc:
+            raise CommandError(f'Import failed, nothing was written: {exc}')
+        finally:
+            if stream is not sys.stdin.buffer:
+                stream.close()
+        finished = time.monotonic()
+
+        rows = sum(run.counts.values())
+        for line_type in bulk_import.LINE_TYPES:
+            skipped = f', {run.skipped[line_type]} skipped' if run.skipped[line_type] else ''
+            self.stdout.write(f'{line_type}: {run.counts[line_type]} imported{skipped}')
+        self.stdout.write(self.style.SUCCESS(
+            f'Imported {rows} rows in {finished - start:.1f}s ({rows / max(finished - start, 1e-9):.0f} rows/s; '
+            f'loading {loaded - start:.1f}s, recomputing counters and karma {finished - loaded:.1f}s)'
+        ))
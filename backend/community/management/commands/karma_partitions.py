@@ -0,0 +1,53 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from community import partitions
+
+
+class Command(BaseCommand):
+    help = (
+        'Creates upcoming KarmaTransaction day partitions and drops (optionally archiving) '
+        'the ones older than the retention'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--ahead', type=int, default=settings.KARMA_PARTITION_AHEAD_DAYS,
+            help='Days of partitions to create ahead of today (PostgreSQL only)'
+        )
+        parser.add_argument(
+            '--retain-days', type=int, default=settings.KARMA_RETENTION_DAYS,
+            help='Drop days older than this many days (0 keeps everything)'
+        )
+        parser.add_argument(
+            '--archive-dir', default=settings.KARMA_ARCHIVE_DIR,
+            help='Write each dropped day here as karma-<day>.ndjson.gz first'
+        )
+        parser.add_argument(
+            '--list', action='store_true',
+            help='Show every partition with its range and row count, and exit'
+        )
+
+    def handle(self, *args, **options):
+        if options['list']:
+            for partition in partitions.partitions():
+                rows = partitions.row_count(partition)
+                if partition.start is None and partition.end is None:
+                    # The default partition holds whatever no other one covers
+                    span = 'default'
+                else:
+                    span = f'{partition.start or "-"} .. {partition.end or "-"}'
+                self.stdout.write(f'{partition.label:45} {span:55} {rows} rows')
+            return
+
+        created = partitions.create_partitions(options['ahead'])
+        self.stdout.write(self.style.SUCCESS(f'Created {len(created)} partitions'))
+
+        if options['retain_days'] > 0:
+            dropped = partitions.drop_partitions(
+                partitions.retention_cutoff(options['retain_days']), options['archive_dir'] or None
+            )
+            archived = f", archived to {options['archive_dir']}" if options['archive_dir'] else ''
+            for label, rows in dropped:
+                self.stdout.write(f'Dropped {label} ({rows} rows{archived})')
+            self.stdout.write(self.style.SUCCESS(f'Dropped {len(dropped)} partitions'))
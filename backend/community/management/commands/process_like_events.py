@@ -0,0 +1,39 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from community import outbox
+
+
+class Command(BaseCommand):
+    help = 'Applies queued like/unlike events (LIKE_OUTBOX) to counters, karma and caches'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size', type=int, default=outbox.DEFAULT_BATCH_SIZE,
+            help='Events claimed per transaction'
+        )
+        parser.add_argument(
+            '--interval', type=float, default=1.0,
+            help='Seconds to sleep when the outbox is empty'
+        )
+        parser.add_argument(
+            '--once', action='store_true',
+            help='Drain the outbox and exit instead of polling'
+        )
+
+    def handle(self, *args, **options):
+        if options['once']:
+            processed = outbox.drain(options['batch_size'])
+            self.stdout.write(self.style.SUCCESS(f'Processed {processed} like events'))
+            return
+
+        self.stdout.write('Processing like events (Ctrl+C to stop)')
+        try:
+            while True:
+                processed = outbox.drain(options['batch_size'])
+                if processed:
+                    self.stdout.write(f'Processed {processed} like events')
+                time.sleep(options['interval'])
+        except KeyboardInterrupt:
+            self.stdout.write(self.style.SUCCESS('Stopped'))
@@ -0,0 +1,176 @@
+import json
+import os
+import statistics
+import subprocess
+import sys
+from collections import defaultdict
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+
+# Runs in a fresh interpreter (python -X importtime) and replays what
+# config.wsgi does on a cold start, phase by phase, then serves the same
+# request twice. Prints the timings as JSON on stdout.
+CHILD_SCRIPT = r'''
+import json, os, sys, time
+
+path = sys.argv[1]
+phases = []
+
+def mark(name, start):
+    phases.append((name, (time.perf_counter() - start) * 1000))
+
+start = time.perf_counter()
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'config.settings')
+import django
+from django.conf import settings
+settings.INSTALLED_APPS
+mark('settings', start)
+
+start = time.perf_counter()
+django.setup(set_prefix=False)
+mark('app registry', start)
+
+start = time.perf_counter()
+from django.core.handlers.wsgi import WSGIHandler
+application = WSGIHandler()
+mark('middleware', start)
+
+start = time.perf_counter()
+from django.urls import get_resolver
+get_resolver().url_patterns
+mark('urlconf', start)
+
+# Imports made only by this profiler are left out of the report
+sys.stderr.write('profiler imports start\n')
+from django.db import connection
+from django.test import Client
+sys.stderr.write('profiler imports end\n')
+
+start = time.perf_counter()
+connection.ensure_connection()
+mark('db connect', start)
+
+hosts = [h.lstrip('.') for h in settings.ALLOWED_HOSTS if h.lstrip('.') not in ('', '*')]
+client = Client(HTTP_HOST=hosts[0] if hosts else 'localhost', raise_request_exception=False)
+queries = []
+
+def count(execute, sql, params, many, context):
+    queries.append(sql)
+    return execute(sql, params, many, context)
+
+start = time.perf_counter()
+with connection.execute_wrapper(count):
+    status = client.get(path).status_code
+mark('first request', start)
+
+start = time.perf_counter()
+client.get(path)
+mark('second request', start)
+
+print(json.dumps({'phases': phases, 'queries': len(queries), 'status': status,
+                  'apps': list(settings.INSTALLED_APPS)}))
+'''
+
+
+class Command(BaseCommand):
+    help = (
+        'Measures cold start of the WSGI app in fresh processes: import time per '
+        'module and installed app, app registry setup and the first request'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--path', default='/api/posts/',
+            help='Request path used for the first-request measurement'
+        )
+        parser.add_argument(
+            '--runs', type=int, default=3,
+            help='Fresh processes to start; phase timings are medians'
+        )
+        parser.add_argument(
+            '--top', type=int, default=15,
+            help='Number of slowest imports to list'
+        )
+        parser.add_argument(
+            '--env', action='append', default=[], metavar='NAME=VALUE',
+            help='Extra environment for the measured processes (e.g. ADMIN_ENABLED=False)'
+        )
+
+    def handle(self, *args, **options):
+        env = dict(os.environ)
+        for item in options['env']:
+            name, sep, value = item.partition('=')
+            if not sep:
+                raise CommandError(f'--env expects NAME=VALUE, got {item!r}')
+            env[name] = value
+
+        runs = [self._run_child(options['path'], env) for _ in range(max(options['runs'], 1))]
+        result, imports = runs[0]
+
+        phases = defaultdict(list)
+        for run, _ in runs:
+            for name, ms in run['phases']:
+                phases[name].append(ms)
+
+        self.stdout.write(self.style.MIGRATE_HEADING(
+            f'Cold start phases (median of {len(runs)} fresh processes)'
+        ))
+        startup = 0
+        for name, values in phases.items():
+            median = statistics.median(values)
+            if name != 'second request':
+                startup += median
+            self.stdout.write(f'  {name:<16} {median:8.1f} ms')
+        self.stdout.write(f'  {"total":<16} {startup:8.1f} ms  '
+                          f'(first request: HTTP {result["status"]}, {result["queries"]} queries)')
+
+        self.stdout.write(self.style.MIGRATE_HEADING(
+            'Import time by package (installed apps, then other top-level packages)'
+        ))
+        by_package = self._by_package(imports, result['apps'])
+        for package, ms in sorted(by_package.items(), key=lambda item: -item[1])[:options['top']]:
+            self.stdout.write(f'  {package:<32} {ms:8.1f} ms')
+
+        self.stdout.write(self.style.MIGRATE_HEADING('Slowest imports (self time)'))
+        for name, self_ms, cumulative_ms in sorted(imports, key=lambda row: -row[1])[:options['top']]:
+            self.stdout.write(f'  {name:<48} {self_ms:8.1f} ms  (cumulative {cumulative_ms:.1f} ms)')
+
+    def _run_child(self, path, env):
+        completed = subprocess.run(
+            [sys.executable, '-X', 'importtime', '-c', CHILD_SCRIPT, path],
+            cwd=settings.BASE_DIR, env=env, capture_output=True, text=True
+        )
+        if completed.returncode != 0:
+            raise CommandError(f'Profiled process failed:\n{completed.stderr[-2000:]}')
+        return json.loads(completed.stdout.strip().splitlines()[-1]), self._parse_importtime(completed.stderr)
+
+    def _parse_importtime(self, output):
+        """[(module, self ms, cumulative ms)] from python -X importtime output."""
+        imports = []
+        skipping = False
+        for line in output.splitlines():
+            if line.startswith('profiler imports'):
+                skipping = line.endswith('start')
+                continue
+            if skipping or not line.startswith('import time:') or 'self [us]' in line:
+                continue
+            self_us, cumulative_us, name = line[len('import time:'):].split('|')
+            imports.append((name.strip(), int(self_us) / 1000, int(cumulative_us) / 1000))
+        return imports
+
+    def _by_package(self, imports, apps):
+        """
+        Self import time summed per installed app package (longest match wins),
+        or per top-level package for modules outside the installed apps.
+        """
+        totals = defaultdict(float)
+        packages = sorted(apps, key=len, reverse=True)
+        for name, self_ms, _ in imports:
+            package = next(
+                (app for app in packages if name == app or name.startswith(app + '.')),
+                name.split('.')[0]
+            )
+            totals[package] += self_ms
+        return totals
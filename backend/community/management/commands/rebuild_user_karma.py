@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand
+
+from community.models import UserKarma
+
+
+class Command(BaseCommand):
+    help = 'Rebuilds the UserKarma totals table from KarmaTransaction history'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size', type=int, default=1000,
+            help='Number of UserKarma rows to insert per batch'
+        )
+
+    def handle(self, *args, **options):
+        rebuilt = UserKarma.rebuild(batch_size=options['batch_size'])
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Rebuilt karma totals for {rebuilt} users'
+        ))
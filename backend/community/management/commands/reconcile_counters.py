@@ -0,0 +1,90 @@
+import os
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import django
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from community import reconcile
+
+
+def _init_worker():
+    # Forked workers already have Django set up; spawned ones (macOS, Windows) do not
+    django.setup()
+
+
+class Command(BaseCommand):
+    help = (
+        'Checks like counts and karma totals against PostLike, CommentLike and KarmaTransaction rows, '
+        'aggregated in id-range chunks, optionally repairing discrepancies'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--check', action='append', choices=list(reconcile.CHECKS),
+            help='Check to run (repeatable; default: all)'
+        )
+        parser.add_argument(
+            '--repair', action='store_true',
+            help='Fix the discrepancies found (default: report only)'
+        )
+        parser.add_argument(
+            '--chunk-size', type=int, default=10000,
+            help='Ids per chunk'
+        )
+        parser.add_argument(
+            '--workers', type=int, default=os.cpu_count() or 1,
+            help='Processes aggregating chunks in parallel (1 runs in this process)'
+        )
+        parser.add_argument(
+            '--show', type=int, default=20,
+            help='Discrepancies to list per check'
+        )
+
+    def handle(self, *args, **options):
+        checks = options['check'] or list(reconcile.CHECKS)
+        tasks = reconcile.plan(checks, options['chunk_size'])
+        self.stdout.write(f'Aggregating {len(tasks)} chunks with {options["workers"]} workers')
+
+        totals = {}
+        for partial in self._run(tasks, options['workers']):
+            reconcile.merge(totals, partial)
+        if 'karma' in totals:
+            reconcile.add_archived(totals)
+
+        checked = defaultdict(int)
+        found = defaultdict(int)
+        repaired = defaultdict(int)
+        samples = defaultdict(list)
+        for result in reconcile.compare(checks, totals, options['chunk_size'], options['repair']):
+            checked[result.check] += result.checked
+            found[result.check] += len(result.discrepancies)
+            repaired[result.check] += result.repaired
+            room = options['show'] - len(samples[result.check])
+            samples[result.check].extend(result.discrepancies[:max(room, 0)])
+
+        for check in checks:
+            style = self.style.SUCCESS if not found[check] else self.style.WARNING
+            summary = f'{check}: {checked[check]} rows checked, {found[check]} discrepancies'
+            if options['repair']:
+                summary += f', {repaired[check]} repaired'
+            self.stdout.write(style(summary))
+            for key, fields in samples[check]:
+                details = ', '.join(
+                    f'{field} {stored} -> {expected}' for field, (stored, expected) in fields.items()
+                )
+                self.stdout.write(f'  {key}: {details}')
+
+    def _run(self, tasks, workers):
+        if workers <= 1:
+            for task in tasks:
+                yield reconcile.aggregate_chunk(*task)
+            return
+
+        # Forked workers must not share this process's database connections
+        connections.close_all()
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker) as pool:
+            futures = [pool.submit(reconcile.aggregate_chunk, *task) for task in tasks]
+            for future in as_completed(futures):
+                yield future.result()
@@ -0,0 +1,28 @@
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from community.models import LeaderboardEntry
+
+
+class Command(BaseCommand):
+    help = 'Expires aged-out karma buckets from the windowed leaderboards'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--rebuild', action='store_true',
+            help='Recompute buckets and all windows from KarmaTransaction history'
+        )
+
+    def handle(self, *args, **options):
+        now = timezone.now()
+
+        if options['rebuild']:
+            LeaderboardEntry.rebuild(now)
+            self.stdout.write(self.style.SUCCESS('Rebuilt leaderboards from karma history'))
+            return
+
+        purged = LeaderboardEntry.refresh(now)
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Refreshed leaderboards, purged {purged} expired buckets'
+        ))
@@ -0,0 +1,84 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from community import jobs, scheduler  # noqa: F401 (jobs registers the job functions)
+from community.models import ScheduledJob, JobRun
+
+
+class Command(BaseCommand):
+    help = 'Runs registered maintenance jobs on their intervals (safe to run on several workers)'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--once', action='store_true',
+            help='Run the jobs that are due and exit'
+        )
+        parser.add_argument(
+            '--run', metavar='JOB',
+            help='Run one job now, whether or not it is due, and exit'
+        )
+        parser.add_argument(
+            '--list', action='store_true',
+            help='Show every job with its schedule and last run'
+        )
+        parser.add_argument(
+            '--tick', type=float, default=1.0,
+            help='Seconds between checks for due jobs'
+        )
+
+    def handle(self, *args, **options):
+        scheduler.ensure_schedules()
+        owner = scheduler.instance_name()
+
+        if options['list']:
+            self._list()
+            return
+
+        if options['run']:
+            job = scheduler.JOBS.get(options['run'])
+            if job is None:
+                raise CommandError(
+                    f"Unknown job '{options['run']}'. Jobs: {', '.join(scheduler.JOBS)}"
+                )
+            if not scheduler.claim(job, owner, force=True):
+                raise CommandError(f"'{job.name}' is running on another instance")
+            self._report(scheduler.run_job(job, owner))
+            return
+
+        if options['once']:
+            for run in scheduler.run_due_jobs(owner):
+                self._report(run)
+            return
+
+        self.stdout.write(f'Scheduler {owner} running {len(scheduler.JOBS)} jobs (Ctrl+C to stop)')
+        try:
+            while True:
+                for run in scheduler.run_due_jobs(owner):
+                    self._report(run)
+                time.sleep(options['tick'])
+        except KeyboardInterrupt:
+            self.stdout.write(self.style.SUCCESS('Stopped'))
+
+    def _report(self, run):
+        if run.succeeded:
+            self.stdout.write(self.style.SUCCESS(
+                f'{run.job}: {run.rows} rows in {run.duration_ms}ms'
+            ))
+        else:
+            self.stderr.write(f'{run.job} failed after {run.duration_ms}ms\n{run.error}')
+
+    def _list(self):
+        schedules = {s.name: s for s in ScheduledJob.objects.all()}
+        for name, job in scheduler.JOBS.items():
+            schedule = schedules[name]
+            last = JobRun.objects.filter(job=name).first()
+            if last is None:
+                last_run = 'never run'
+            else:
+                status = 'ok' if last.succeeded else 'FAILED'
+                last_run = f'last {last.started_at:%Y-%m-%d %H:%M:%S} {status}, ' \
+                           f'{last.rows} rows in {last.duration_ms}ms'
+            self.stdout.write(
+                f'{name:<22} every {job.every}  next {schedule.next_run_at:%Y-%m-%d %H:%M:%S}  {last_run}'
+            )
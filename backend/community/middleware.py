@@ -0,0 +1,15 @@
+from django.conf import settings
+from django.middleware.gzip import GZipMiddleware
+
+
+class CompressionMiddleware(GZipMiddleware):
+    """
+    Gzip responses larger than settings.COMPRESSION_MIN_SIZE bytes.
+    Small bodies are sent as-is: compressing them costs CPU and saves
+    little or nothing on the wire. Streaming responses are always compressed.
+    """
+
+    def process_response(self, request, response):
+        if not response.streaming and len(response.content) < settings.COMPRESSION_MIN_SIZE:
+            return response
+        return super().process_response(request, response)
@@ -0,0 +1,45 @@
+# Generated by Django 4.2.9 on 2026-10-19 09:05
+
+from collections import Counter
+
+from django.db import migrations, models
+
+
+def backfill_counts(apps, schema_editor):
+    """Derive reply/descendant counts for existing comments from their paths."""
+    Comment = apps.get_model('community', 'Comment')
+    replies = Counter()
+    descendants = Counter()
+    for path in Comment.objects.values_list('path', flat=True).iterator():
+        ancestor_ids = [int(pk) for pk in path.split('/')[:-1]]
+        if ancestor_ids:
+            replies[ancestor_ids[-1]] += 1
+        for pk in ancestor_ids:
+            descendants[pk] += 1
+    
+    for pk, count in descendants.items():
+        Comment.objects.filter(pk=pk).update(
+            reply_count=replies[pk],
+            descendant_count=count,
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('community', '0002_alter_karmatransaction_created_at'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='comment',
+            name='descendant_count',
+            field=models.IntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='comment',
+            name='reply_count',
+            field=models.IntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(backfill_counts, migrations.RunPython.noop),
+    ]
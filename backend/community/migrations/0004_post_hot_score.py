@@ -0,0 +1,56 @@
+# Generated by Django 4.2.9 on 2026-10-19 09:06
+
+from django.db import migrations, models
+from django.db.models import Count
+from django.utils import timezone
+
+# Post.HOT_GRAVITY / Post.HOT_COMMENT_WEIGHT when the field was added
+HOT_GRAVITY = 1.8
+HOT_COMMENT_WEIGHT = 2
+BATCH_SIZE = 500
+
+
+def backfill_hot_scores(apps, schema_editor):
+    """
+    Score existing posts, in id-ordered batches as Post.decay_hot_scores
+    does, so they are not all tied at 0 in the hot feed until the first
+    decay run.
+    """
+    Post = apps.get_model('community', 'Post')
+    now = timezone.now()
+    last_id = 0
+    while True:
+        batch = list(
+            Post.objects.filter(id__gt=last_id)
+            .order_by('id')
+            .annotate(comment_count=Count('comments'))
+            .only('id', 'like_count', 'created_at', 'hot_score')[:BATCH_SIZE]
+        )
+        if not batch:
+            return
+        for post in batch:
+            age_hours = max((now - post.created_at).total_seconds(), 0) / 3600
+            engagement = 1 + post.like_count + HOT_COMMENT_WEIGHT * post.comment_count
+            post.hot_score = engagement / (age_hours + 2) ** HOT_GRAVITY
+        Post.objects.bulk_update(batch, ['hot_score'])
+        last_id = batch[-1].id
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('community', '0003_comment_reply_counts'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='post',
+            name='hot_score',
+            field=models.FloatField(default=0, editable=False),
+        ),
+        migrations.AddIndex(
+            model_name='post',
+            index=models.Index(fields=['-hot_score', '-id'], name='community_p_hot_sco_02a0ec_idx'),
+        ),
+        migrations.RunPython(backfill_hot_scores, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,44 @@
+# Generated by Django 4.2.9 on 2026-10-19 09:07
+
+from django.db import migrations, models
+from django.db.models import Q, Sum, Value
+from django.db.models.functions import Coalesce
+
+
+def backfill_user_karma(apps, schema_editor):
+    """Seed totals from existing karma history (same as rebuild_user_karma)."""
+    KarmaTransaction = apps.get_model('community', 'KarmaTransaction')
+    UserKarma = apps.get_model('community', 'UserKarma')
+    totals = (
+        KarmaTransaction.objects
+        .order_by()
+        .values('user')
+        .annotate(
+            karma=Sum('points'),
+            post_like_karma=Coalesce(Sum('points', filter=Q(transaction_type='post_like')), Value(0)),
+            comment_like_karma=Coalesce(Sum('points', filter=Q(transaction_type='comment_like')), Value(0)),
+        )
+    )
+    UserKarma.objects.bulk_create([UserKarma(**row) for row in totals], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('community', '0004_post_hot_score'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UserKarma',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('user', models.CharField(max_length=255, unique=True)),
+                ('karma', models.IntegerField(default=0)),
+                ('post_like_karma', models.IntegerField(default=0)),
+                ('comment_like_karma', models.IntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.RunPython(backfill_user_karma, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,106 @@
+# Generated by Django 4.2.9 on 2026-10-19 09:09
+
+from datetime import timedelta
+
+from django.db import migrations, models
+from django.db.models import Sum
+from django.utils import timezone
+
+
+# As in LeaderboardEntry at the time of this migration
+BUCKET_MINUTES = 5
+WINDOWS = {'1h': timedelta(hours=1), '24h': timedelta(hours=24), '7d': timedelta(days=7), 'all': None}
+
+
+def bucket_start(moment):
+    minutes = moment.minute - moment.minute % BUCKET_MINUTES
+    return moment.replace(minute=minutes, second=0, microsecond=0)
+
+
+def build_leaderboards(apps, schema_editor):
+    """
+    Fill the buckets and every window from the existing karma history, as
+    LeaderboardEntry.rebuild does, so boards are complete right after the
+    upgrade rather than only counting karma earned since.
+    """
+    KarmaTransaction = apps.get_model('community', 'KarmaTransaction')
+    KarmaBucket = apps.get_model('community', 'KarmaBucket')
+    LeaderboardEntry = apps.get_model('community', 'LeaderboardEntry')
+    LeaderboardWindow = apps.get_model('community', 'LeaderboardWindow')
+
+    now = bucket_start(timezone.now())
+    cutoffs = {window: now - span for window, span in WINDOWS.items() if span is not None}
+
+    buckets = {}
+    recent = (
+        KarmaTransaction.objects.filter(created_at__gte=min(cutoffs.values()))
+        .values_list('user', 'points', 'created_at')
+        .iterator(chunk_size=2000)
+    )
+    for user, points, created_at in recent:
+        key = (user, bucket_start(created_at))
+        buckets[key] = buckets.get(key, 0) + points
+    KarmaBucket.objects.bulk_create(
+        [KarmaBucket(user=user, bucket_start=start, points=points)
+         for (user, start), points in buckets.items()],
+        batch_size=1000
+    )
+
+    entries = []
+    for window, cutoff in cutoffs.items():
+        LeaderboardWindow.objects.create(window=window, expired_through=cutoff)
+        totals = (
+            KarmaBucket.objects.filter(bucket_start__gte=cutoff).values('user')
+            .annotate(karma=Sum('points')).values_list('user', 'karma')
+        )
+        entries.extend(LeaderboardEntry(window=window, user=user, karma=karma) for user, karma in totals)
+    totals = (
+        KarmaTransaction.objects.order_by().values('user')
+        .annotate(karma=Sum('points')).values_list('user', 'karma')
+    )
+    entries.extend(LeaderboardEntry(window='all', user=user, karma=karma) for user, karma in totals)
+    LeaderboardEntry.objects.bulk_create(entries, batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('community', '0005_userkarma'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LeaderboardWindow',
+            fields=[
+                ('window', models.CharField(max_length=8, primary_key=True, serialize=False)),
+                ('expired_through', models.DateTimeField()),
+            ],
+        ),
+        migrations.CreateModel(
+            name='LeaderboardEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('window', models.CharField(max_length=8)),
+                ('user', models.CharField(max_length=255)),
+                ('karma', models.IntegerField(default=0)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['window', '-karma', 'user'], name='community_l_window_7c8ad2_idx')],
+                'unique_together': {('window', 'user')},
+            },
+        ),
+        migrations.CreateModel(
+            name='KarmaBucket',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('user', models.CharField(max_length=255)),
+                ('bucket_start', models.DateTimeField()),
+                ('points', models.IntegerField(default=0)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['bucket_start'], name='community_k_bucket__d8d5d4_idx')],
+                'unique_together': {('user', 'bucket_start')},
+            },
+        ),
+        migrations.RunPython(build_leaderboards, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 4.2.9 on 2026-10-19 09:26
+
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('contenttypes', '0002_remove_content_type_name'),
+        ('community', '0006_leaderboard_buckets'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LikeEvent',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('object_id', models.PositiveIntegerField()),
+                ('user', models.CharField(max_length=255)),
+                ('delta', models.SmallIntegerField()),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('content_type', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='contenttypes.contenttype')),
+            ],
+            options={
+                'ordering': ['id'],
+                'indexes': [models.Index(fields=['content_type', 'object_id'], name='community_l_content_5db65d_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,40 @@
+# Generated by Django 4.2.9 on 2026-10-19 09:29
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('community', '0007_like_event'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ScheduledJob',
+            fields=[
+                ('name', models.CharField(max_length=64, primary_key=True, serialize=False)),
+                ('next_run_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('leased_by', models.CharField(blank=True, max_length=255)),
+                ('lease_expires_at', models.DateTimeField(blank=True, null=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='JobRun',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('job', models.CharField(max_length=64)),
+                ('ran_by', models.CharField(max_length=255)),
+                ('started_at', models.DateTimeField()),
+                ('duration_ms', models.PositiveIntegerField()),
+                ('rows', models.IntegerField(default=0)),
+                ('succeeded', models.BooleanField(default=True)),
+                ('error', models.TextField(blank=True)),
+            ],
+            options={
+                'ordering': ['-started_at'],
+                'indexes': [models.Index(fields=['job', '-started_at'], name='community_j_job_1fc562_idx'), models.Index(fields=['started_at'], name='community_j_started_dfdc91_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 4.2.9 on 2026-10-19 10:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('community', '0008_scheduled_jobs'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='karmatransaction',
+            name='community_k_user_be1aac_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='like',
+            name='community_l_user_b256ad_idx',
+        ),
+        migrations.AddIndex(
+            model_name='karmatransaction',
+            index=models.Index(fields=['user', '-created_at', '-id', 'points', 'transaction_type', 'content_type', 'object_id'], name='karma_user_history_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='like',
+            index=models.Index(fields=['user', '-created_at', '-id', 'content_type', 'object_id'], name='like_user_history_idx'),
+        ),
+    ]
@@ -0,0 +1,141 @@
+# Generated by Django 4.2.9 on 2026-10-19 11:00
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery
+
+
+# (model, name field) pairs moving to an Author foreign key
+NAME_FIELDS = [
+    ('post', 'author'),
+    ('comment', 'author'),
+    ('like', 'user'),
+    ('likeevent', 'user'),
+    ('karmatransaction', 'user'),
+    ('userkarma', 'user'),
+]
+CHUNK_SIZE = 5000
+
+
+def intern_names(apps, schema_editor):
+    """
+    Create an Author per distinct name and point every row at it, walking
+    each table in id chunks so no single statement rewrites a whole table.
+    """
+    Author = apps.get_model('community', 'Author')
+    for model_name, field in NAME_FIELDS:
+        model = apps.get_model('community', model_name)
+        last_id = 0
+        while True:
+            chunk = list(
+                model.objects.filter(id__gt=last_id).order_by('id').values_list('id', field)[:CHUNK_SIZE]
+            )
+            if not chunk:
+                break
+            Author.objects.bulk_create(
+                [Author(name=name) for name in {name for _, name in chunk}],
+                batch_size=500, ignore_conflicts=True
+            )
+            model.objects.filter(id__gt=last_id, id__lte=chunk[-1][0]).update(**{
+                f'{field}_ref': Subquery(Author.objects.filter(name=OuterRef(field)).values('id'))
+            })
+            last_id = chunk[-1][0]
+
+
+def _name_ref():
+    return models.ForeignKey(
+        null=True, db_index=False, on_delete=django.db.models.deletion.PROTECT,
+        related_name='+', to='community.author'
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('community', '0009_user_history_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Author',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=255, unique=True)),
+            ],
+        ),
+        migrations.RemoveIndex(
+            model_name='post',
+            name='community_p_author_c4e47f_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='comment',
+            name='community_c_author_79a639_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='like',
+            name='like_user_history_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='karmatransaction',
+            name='karma_user_history_idx',
+        ),
+        migrations.AlterUniqueTogether(
+            name='like',
+            unique_together=set(),
+        ),
+        *[
+            migrations.AddField(model_name=model_name, name=f'{field}_ref', field=_name_ref())
+            for model_name, field in NAME_FIELDS
+        ],
+        migrations.RunPython(intern_names, migrations.RunPython.noop),
+        *[
+            migrations.RemoveField(model_name=model_name, name=field)
+            for model_name, field in NAME_FIELDS
+        ],
+        *[
+            migrations.RenameField(model_name=model_name, old_name=f'{field}_ref', new_name=field)
+            for model_name, field in NAME_FIELDS
+        ],
+        migrations.AlterField(
+            model_name='post',
+            name='author',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='posts', to='community.author'),
+        ),
+        migrations.AlterField(
+            model_name='comment',
+            name='author',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='comments', to='community.author'),
+        ),
+        migrations.AlterField(
+            model_name='like',
+            name='user',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.PROTECT, related_name='likes', to='community.author'),
+        ),
+        migrations.AlterField(
+            model_name='likeevent',
+            name='user',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.PROTECT, related_name='+', to='community.author'),
+        ),
+        migrations.AlterField(
+            model_name='karmatransaction',
+            name='user',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.PROTECT, related_name='karma_transactions', to='community.author'),
+        ),
+        migrations.AlterField(
+            model_name='userkarma',
+            name='user',
+            field=models.OneToOneField(on_delete=django.db.models.deletion.PROTECT, related_name='karma_totals', to='community.author'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='like',
+            unique_together={('user', 'content_type', 'object_id')},
+        ),
+        migrations.AddIndex(
+            model_name='like',
+            index=models.Index(fields=['user', '-created_at', '-id', 'content_type', 'object_id'], name='like_user_history_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='karmatransaction',
+            index=models.Index(fields=['user', '-created_at', '-id', 'points', 'transaction_type', 'content_type', 'object_id'], name='karma_user_history_idx'),
+        ),
+    ]
@@ -0,0 +1,74 @@
+# Generated by Django 4.2.9 on 2026-10-19 12:00
+
+from datetime import datetime, time, timezone
+
+from django.db import migrations
+
+
+TABLE = 'community_karmatransaction'
+
+
+def partition_by_day(apps, schema_editor):
+    """
+    On PostgreSQL, rebuild KarmaTransaction as a table partitioned by range
+    of created_at. Existing rows go to a _history partition ending today,
+    rows past the created day partitions to a _default one; the
+    karma_partitions command (and its scheduled job) adds the days.
+
+    A partitioned table's primary key must include the partition key, so it
+    becomes (id, created_at) with ids still drawn from one sequence. The
+    old table's indexes and foreign keys are recreated on the new parent,
+    which propagates them to every partition.
+    """
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+
+    qn = schema_editor.quote_name
+    old = f'{TABLE}_unpartitioned'
+    sequence = f'{TABLE}_id_seq'
+    today = datetime.combine(datetime.now(timezone.utc).date(), time.min, tzinfo=timezone.utc)
+
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT indexdef FROM pg_indexes "
+            "WHERE schemaname = current_schema() AND tablename = %s AND indexname <> %s",
+            [TABLE, f'{TABLE}_pkey']
+        )
+        indexes = [indexdef for indexdef, in cursor.fetchall()]
+        cursor.execute(
+            "SELECT conname, pg_get_constraintdef(oid) FROM pg_constraint "
+            "WHERE conrelid = %s::regclass AND contype = 'f'",
+            [TABLE]
+        )
+        foreign_keys = cursor.fetchall()
+
+    for statement in [
+        f'ALTER TABLE {qn(TABLE)} RENAME TO {qn(old)}',
+        # Columns, NOT NULLs and defaults, but not the id identity: partitioned
+        # tables only take a plain sequence default
+        f'CREATE TABLE {qn(TABLE)} (LIKE {qn(old)} INCLUDING DEFAULTS) PARTITION BY RANGE (created_at)',
+        f"CREATE TABLE {qn(TABLE + '_history')} PARTITION OF {qn(TABLE)} "
+        f"FOR VALUES FROM (MINVALUE) TO ('{today.isoformat()}')",
+        f"CREATE TABLE {qn(TABLE + '_default')} PARTITION OF {qn(TABLE)} DEFAULT",
+        f'INSERT INTO {qn(TABLE)} SELECT * FROM {qn(old)}',
+        # Drops the identity sequence too, freeing its name
+        f'DROP TABLE {qn(old)}',
+        f'CREATE SEQUENCE {qn(sequence)} OWNED BY {qn(TABLE)}.id',
+        f"SELECT setval('{sequence}', COALESCE(MAX(id), 0) + 1, false) FROM {qn(TABLE)}",
+        f"ALTER TABLE {qn(TABLE)} ALTER COLUMN id SET DEFAULT nextval('{sequence}')",
+        f'ALTER TABLE {qn(TABLE)} ADD CONSTRAINT {qn(TABLE + "_pkey")} PRIMARY KEY (id, created_at)',
+        *indexes,
+        *[f'ALTER TABLE {qn(TABLE)} ADD CONSTRAINT {qn(name)} {definition}' for name, definition in foreign_keys],
+    ]:
+        schema_editor.execute(statement)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('community', '0010_author'),
+    ]
+
+    operations = [
+        migrations.RunPython(partition_by_day, migrations.RunPython.noop),
+    ]
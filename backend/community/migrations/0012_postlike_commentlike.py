@@ -0,0 +1,101 @@
+# Generated by Django 4.2.9 on 2026-10-19 13:00
+
+import django.db.models.deletion
+from django.db import migrations, models, transaction
+
+
+# (liked model, typed like table) pairs; the target column is <model>_id
+TARGETS = [
+    ('post', 'postlike'),
+    ('comment', 'commentlike'),
+]
+CHUNK_SIZE = 10000
+
+
+def copy_likes(apps, schema_editor):
+    """
+    Copy every Like into PostLike / CommentLike, walking Like in id ranges
+    with one transaction per range, so the copy never holds a long lock and
+    can simply be run again: the unique (target, user) constraint skips the
+    rows already copied. Likes of deleted posts and comments, which the
+    generic key left behind, are not copied.
+    """
+    Like = apps.get_model('community', 'Like')
+    ContentType = apps.get_model('contenttypes', 'ContentType')
+    connection = schema_editor.connection
+    qn = connection.ops.quote_name
+
+    high = Like.objects.aggregate(high=models.Max('id'))['high']
+    if high is None:
+        return
+    content_types = dict(
+        ContentType.objects.filter(app_label='community', model__in=[name for name, _ in TARGETS])
+        .values_list('model', 'id')
+    )
+    statements = [
+        (
+            f"INSERT INTO {qn(apps.get_model('community', like_model)._meta.db_table)} "
+            f"({qn(target + '_id')}, {qn('user_id')}, {qn('created_at')}) "
+            f"SELECT l.{qn('object_id')}, l.{qn('user_id')}, l.{qn('created_at')} "
+            f"FROM {qn(Like._meta.db_table)} l "
+            f"WHERE l.{qn('content_type_id')} = %s AND l.{qn('id')} >= %s AND l.{qn('id')} < %s "
+            f"AND EXISTS (SELECT 1 FROM {qn(apps.get_model('community', target)._meta.db_table)} t "
+            f"WHERE t.{qn('id')} = l.{qn('object_id')}) "
+            f"ORDER BY l.{qn('id')} "
+            f"ON CONFLICT DO NOTHING",
+            content_types[target]
+        )
+        for target, like_model in TARGETS if target in content_types
+    ]
+    for low in range(0, high + 1, CHUNK_SIZE):
+        with transaction.atomic(using=connection.alias), connection.cursor() as cursor:
+            for sql, content_type_id in statements:
+                cursor.execute(sql, [content_type_id, low, low + CHUNK_SIZE])
+
+
+class Migration(migrations.Migration):
+
+    # Each chunk of the copy commits on its own
+    atomic = False
+
+    dependencies = [
+        ('contenttypes', '0002_remove_content_type_name'),
+        ('community', '0011_partition_karma_transactions'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PostLike',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('post', models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='likes', to='community.post')),
+                ('user', models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.PROTECT, related_name='post_likes', to='community.author')),
+            ],
+            options={
+                'unique_together': {('post', 'user')},
+            },
+        ),
+        migrations.CreateModel(
+            name='CommentLike',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('comment', models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='likes', to='community.comment')),
+                ('user', models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.PROTECT, related_name='comment_likes', to='community.author')),
+            ],
+            options={
+                'unique_together': {('comment', 'user')},
+            },
+        ),
+        migrations.RunPython(copy_likes, migrations.RunPython.noop),
+        # Built once over the copied rows rather than maintained row by row during the copy
+        migrations.AddIndex(
+            model_name='postlike',
+            index=models.Index(fields=['user', '-created_at', '-id', 'post'], name='post_like_user_history_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='commentlike',
+            index=models.Index(fields=['user', '-created_at', '-id', 'comment'], name='comment_like_user_history_idx'),
+        ),
+    ]
@@ -0,0 +1,69 @@
+# Generated by Django 4.2.9 on 2026-10-19 13:05
+
+from importlib import import_module
+
+from django.db import migrations, models, transaction
+
+
+def copy_new_likes(apps, schema_editor):
+    """
+    Copy the likes written between 0012 and the switch to the typed tables
+    (e.g. by workers still running the previous release); rows 0012
+    already copied are skipped by the unique constraints.
+    """
+    import_module('community.migrations.0012_postlike_commentlike').copy_likes(apps, schema_editor)
+
+
+def remove_unliked(apps, schema_editor):
+    """
+    Delete typed likes whose Like row is gone: an unlike between 0012 and
+    now deleted the Like (and decremented like_count) but not the copy 0012
+    had made of it. Walks each typed table in id ranges, one transaction per
+    range, like the copy.
+    """
+    copy = import_module('community.migrations.0012_postlike_commentlike')
+    Like = apps.get_model('community', 'Like')
+    ContentType = apps.get_model('contenttypes', 'ContentType')
+    connection = schema_editor.connection
+    qn = connection.ops.quote_name
+
+    content_types = dict(
+        ContentType.objects.filter(app_label='community', model__in=[name for name, _ in copy.TARGETS])
+        .values_list('model', 'id')
+    )
+    for target, like_model in copy.TARGETS:
+        if target not in content_types:
+            continue
+        model = apps.get_model('community', like_model)
+        high = model.objects.aggregate(high=models.Max('id'))['high']
+        if high is None:
+            continue
+        table = qn(model._meta.db_table)
+        sql = (
+            f"DELETE FROM {table} "
+            f"WHERE {qn('id')} >= %s AND {qn('id')} < %s "
+            f"AND NOT EXISTS (SELECT 1 FROM {qn(Like._meta.db_table)} l "
+            f"WHERE l.{qn('content_type_id')} = %s "
+            f"AND l.{qn('object_id')} = {table}.{qn(target + '_id')} "
+            f"AND l.{qn('user_id')} = {table}.{qn('user_id')})"
+        )
+        for low in range(0, high + 1, copy.CHUNK_SIZE):
+            with transaction.atomic(using=connection.alias), connection.cursor() as cursor:
+                cursor.execute(sql, [low, low + copy.CHUNK_SIZE, content_types[target]])
+
+
+class Migration(migrations.Migration):
+
+    atomic = False
+
+    dependencies = [
+        ('community', '0012_postlike_commentlike'),
+    ]
+
+    operations = [
+        migrations.RunPython(copy_new_likes, migrations.RunPython.noop),
+        migrations.RunPython(remove_unliked, migrations.RunPython.noop),
+        migrations.DeleteModel(
+            name='Like',
+        ),
+    ]
@@ -0,0 +1,43 @@
+# Generated by Django 4.2.9 on 2026-10-19 14:00
+
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def count_karma_values(apps, schema_editor):
+    """Count the users at each nonzero karma value of every window."""
+    LeaderboardEntry = apps.get_model('community', 'LeaderboardEntry')
+    LeaderboardKarmaCount = apps.get_model('community', 'LeaderboardKarmaCount')
+    LeaderboardEntry.objects.filter(karma=0).delete()
+    counts = (
+        LeaderboardEntry.objects.order_by().values('window', 'karma')
+        .annotate(users=Count('id')).values_list('window', 'karma', 'users')
+    )
+    LeaderboardKarmaCount.objects.bulk_create(
+        [LeaderboardKarmaCount(window=window, karma=karma, users=users) for window, karma, users in counts],
+        batch_size=1000
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('community', '0013_delete_like'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LeaderboardKarmaCount',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('window', models.CharField(max_length=8)),
+                ('karma', models.IntegerField()),
+                ('users', models.IntegerField(default=0)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['window', 'karma', 'users'], name='leaderboard_karma_count_idx')],
+                'unique_together': {('window', 'karma')},
+            },
+        ),
+        migrations.RunPython(count_karma_values, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,24 @@
+# Generated by Django 4.2.9 on 2026-10-19 14:30
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('community', '0014_leaderboard_karma_count'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ArchivedKarma',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('karma', models.IntegerField(default=0)),
+                ('post_like_karma', models.IntegerField(default=0)),
+                ('comment_like_karma', models.IntegerField(default=0)),
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.PROTECT, related_name='archived_karma', to='community.author')),
+            ],
+        ),
+    ]
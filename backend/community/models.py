@@ -1,27 +1,139 @@
-from django.db import models
+from collections import Counter
+
+from django.db import models, connection, transaction, IntegrityError
 from django.contrib.contenttypes.fields import GenericForeignKey
 from django.contrib.contenttypes.models import ContentType
-from django.db.models import F
+from django.db.models import F, Q, Case, When, Value, Sum
+from django.db.models.functions import Coalesce
 from django.utils import timezone
+from datetime import timedelta
+
+
+def calculate_hot_score(like_count, comment_count, created_at, now=None):
+    """
+    Time-decayed ranking score for the "hot" feed.
+    Engagement is divided by (age in hours + 2) ^ gravity, so scores decay
+    over time and have to be periodically recomputed (see decay_hot_scores).
+    """
+    now = now or timezone.now()
+    age_hours = max((now - created_at).total_seconds(), 0) / 3600
+    engagement = 1 + like_count + Post.HOT_COMMENT_WEIGHT * comment_count
+    return engagement / (age_hours + 2) ** Post.HOT_GRAVITY
+
+
+class Author(models.Model):
+    """
+    Interned author/user name.
+    Posts, comments, likes and karma reference it by integer id, so their
+    indexes and per-user aggregations work on integers instead of repeating
+    the name on every row. See community.authors for the name -> id cache.
+    """
+    name = models.CharField(max_length=255, unique=True)
+    
+    @classmethod
+    def intern(cls, name):
+        """
+        The Author for name, created on first use. The instance is built from
+        the cached id, so assigning it to a foreign key costs no query.
+        """
+        from .authors import author_id
+        return cls(id=author_id(name), name=name)
+    
+    @classmethod
+    def names(cls, ids, batch_size=500):
+        """{id: name} for the given author ids."""
+        ids = list(ids)
+        names = {}
+        for start in range(0, len(ids), batch_size):
+            names.update(cls.objects.filter(id__in=ids[start:start + batch_size]).values_list('id', 'name'))
+        return names
+    
+    def __str__(self):
+        return self.name
 
 
 class Post(models.Model):
     """
     Represents a post in the community feed.
     """
-    author = models.CharField(max_length=255)
+    HOT_GRAVITY = 1.8
+    HOT_COMMENT_WEIGHT = 2
+    
+    author = models.ForeignKey(Author, on_delete=models.PROTECT, related_name='posts')
     content = models.TextField()
     like_count = models.IntegerField(default=0)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
+    # Stored, indexed ranking score for the hot feed (?sort=hot)
+    hot_score = models.FloatField(default=0, editable=False)
+    
     class Meta:
         ordering = ['-created_at']
         indexes = [
             models.Index(fields=['-created_at']),
-            models.Index(fields=['author']),
+            models.Index(fields=['-hot_score', '-id']),
         ]
     
+    def save(self, *args, **kwargs):
+        """Give new posts their initial hot score."""
+        if not self.pk:
+            self.hot_score = calculate_hot_score(self.like_count, 0, timezone.now())
+        super().save(*args, **kwargs)
+    
+    @classmethod
+    def refresh_hot_score(cls, post_id):
+        """
+        Recompute the hot score of a single post after a like or comment lands.
+        """
+        row = (
+            cls.objects.filter(pk=post_id)
+            .annotate(comment_count=models.Count('comments'))
+            .values('like_count', 'comment_count', 'created_at')
+            .first()
+        )
+        if row is None:
+            return
+        cls.set_hot_score(post_id, row['like_count'], row['comment_count'], row['created_at'])
+    
+    @classmethod
+    def set_hot_score(cls, post_id, like_count, comment_count, created_at):
+        """Store the hot score for already-known engagement numbers."""
+        cls.objects.filter(pk=post_id).update(
+            hot_score=calculate_hot_score(like_count, comment_count, created_at)
+        )
+    
+    @classmethod
+    def decay_hot_scores(cls, batch_size=500, now=None, ids=None):
+        """
+        Recompute every post's hot score (or those of the posts in ids) for
+        the current time, in batches. Returns the number of posts rescored.
+        """
+        now = now or timezone.now()
+        posts = cls.objects.all() if ids is None else cls.objects.filter(id__in=ids)
+        last_id = 0
+        updated = 0
+        
+        # Walk posts in primary-key order so each batch is an index range scan
+        while True:
+            batch = list(
+                posts.filter(id__gt=last_id)
+                .order_by('id')
+                .annotate(comment_count_annotated=models.Count('comments'))
+                .only('id', 'like_count', 'created_at', 'hot_score')[:batch_size]
+            )
+            if not batch:
+                return updated
+            
+            for post in batch:
+                post.hot_score = calculate_hot_score(
+                    post.like_count, post.comment_count_annotated, post.created_at, now
+                )
+            cls.objects.bulk_update(batch, ['hot_score'])
+            
+            updated += len(batch)
+            last_id = batch[-1].id
+    
     def __str__(self):
         return f"Post by {self.author}: {self.content[:50]}"
 
@@ -33,7 +145,7 @@ class Comment(models.Model):
     """
     post = models.ForeignKey(Post, on_delete=models.CASCADE, related_name='comments')
     parent = models.ForeignKey('self', null=True, blank=True, on_delete=models.CASCADE, related_name='replies')
-    author = models.CharField(max_length=255)
+    author = models.ForeignKey(Author, on_delete=models.PROTECT, related_name='comments')
     content = models.TextField()
     like_count = models.IntegerField(default=0)
     created_at = models.DateTimeField(auto_now_add=True)
@@ -44,12 +156,16 @@ class Comment(models.Model):
     path = models.CharField(max_length=500, blank=True, editable=False)
     depth = models.IntegerField(default=0, editable=False)
     
+    # Denormalized subtree counters so collapsed threads can render
+    # "N replies" without loading the subtree
+    reply_count = models.IntegerField(default=0, editable=False)
+    descendant_count = models.IntegerField(default=0, editable=False)
+    
     class Meta:
         ordering = ['path']
         indexes = [
             models.Index(fields=['post', 'path']),
             models.Index(fields=['parent']),
-            models.Index(fields=['author']),
             models.Index(fields=['-created_at']),
         ]
     
@@ -58,53 +174,182 @@ class Comment(models.Model):
         Automatically calculate path and depth on save.
         This enables efficient tree traversal without recursive queries.
         """
-        if self.parent:
-            self.depth = self.parent.depth + 1
-            # Create path after getting ID
-            if not self.pk:
-                super().save(*args, **kwargs)
-                self.path = f"{self.parent.path}/{self.pk}"
-                kwargs['force_insert'] = False
-        else:
-            self.depth = 0
-            if not self.pk:
-                super().save(*args, **kwargs)
-                self.path = str(self.pk)
-                kwargs['force_insert'] = False
-        
-        super().save(*args, **kwargs)
+        created = not self.pk
+        with transaction.atomic():
+            if self.parent:
+                self.depth = self.parent.depth + 1
+                # Create path after getting ID
+                if not self.pk:
+                    super().save(*args, **kwargs)
+                    self.path = f"{self.parent.path}/{self.pk}"
+                    kwargs['force_insert'] = False
+                    self._adjust_ancestor_counts(self.parent.path, 1)
+            else:
+                self.depth = 0
+                if not self.pk:
+                    super().save(*args, **kwargs)
+                    self.path = str(self.pk)
+                    kwargs['force_insert'] = False
+            
+            super().save(*args, **kwargs)
+            from . import tree_cache
+            if created:
+                Post.refresh_hot_score(self.post_id)
+                tree_cache.comment_added(self)
+            else:
+                tree_cache.comment_updated(self)
+    
+    def delete(self, *args, **kwargs):
+        """
+        Delete the comment (and its subtree via cascade), keeping the
+        ancestors' reply and descendant counters in step.
+        """
+        with transaction.atomic():
+            # Re-read the subtree size: this instance may be stale
+            descendants = (
+                Comment.objects.filter(pk=self.pk)
+                .values_list('descendant_count', flat=True)
+                .first()
+            ) or 0
+            ancestor_path = self.path.rsplit('/', 1)[0] if self.parent_id else ''
+            comment_id = self.pk
+            result = super().delete(*args, **kwargs)
+            if ancestor_path:
+                self._adjust_ancestor_counts(ancestor_path, -1, -(descendants + 1))
+            Post.refresh_hot_score(self.post_id)
+            from . import tree_cache
+            tree_cache.comment_deleted(self.post_id, comment_id, self.path)
+        return result
+    
+    def _adjust_ancestor_counts(self, ancestor_path, replies, descendants=None):
+        """
+        Update every ancestor listed in ancestor_path in a single UPDATE.
+        The last id in the path is the direct parent and also gets its
+        reply_count adjusted.
+        """
+        if descendants is None:
+            descendants = replies
+        ancestor_ids = [int(pk) for pk in ancestor_path.split('/')]
+        Comment.objects.filter(id__in=ancestor_ids).update(
+            descendant_count=F('descendant_count') + descendants,
+            reply_count=Case(
+                When(id=ancestor_ids[-1], then=F('reply_count') + replies),
+                default=F('reply_count'),
+            ),
+        )
     
     def __str__(self):
         return f"Comment by {self.author} on Post {self.post_id}"
 
 
-class Like(models.Model):
+class PostLike(models.Model):
     """
-    Generic like model that can be applied to Posts or Comments.
-    Uses composite unique constraint to prevent double-liking.
+    A user's like of a post.
+    The unique (post, user) index prevents double-liking and serves both
+    "who liked this post" and per-post counts; the real foreign key lets
+    likes join and cascade with their post.
     """
-    user = models.CharField(max_length=255)
-    content_type = models.ForeignKey(ContentType, on_delete=models.CASCADE)
-    object_id = models.PositiveIntegerField()
-    content_object = GenericForeignKey('content_type', 'object_id')
+    post = models.ForeignKey(Post, on_delete=models.CASCADE, related_name='likes', db_index=False)
+    # Leads the history index, so no index of its own
+    user = models.ForeignKey(Author, on_delete=models.PROTECT, related_name='post_likes', db_index=False)
     created_at = models.DateTimeField(auto_now_add=True)
     
     class Meta:
-        unique_together = ('user', 'content_type', 'object_id')
+        unique_together = ('post', 'user')
         indexes = [
-            models.Index(fields=['content_type', 'object_id']),
-            models.Index(fields=['user']),
-            models.Index(fields=['-created_at']),
+            # A user's likes newest first; the trailing post makes page reads index-only
+            models.Index(fields=['user', '-created_at', '-id', 'post'], name='post_like_user_history_idx'),
+        ]
+    
+    def __str__(self):
+        return f"{self.user} liked post #{self.post_id}"
+
+
+class CommentLike(models.Model):
+    """
+    A user's like of a comment, indexed like PostLike.
+    """
+    comment = models.ForeignKey(Comment, on_delete=models.CASCADE, related_name='likes', db_index=False)
+    # Leads the history index, so no index of its own
+    user = models.ForeignKey(Author, on_delete=models.PROTECT, related_name='comment_likes', db_index=False)
+    created_at = models.DateTimeField(auto_now_add=True)
+    
+    class Meta:
+        unique_together = ('comment', 'user')
+        indexes = [
+            models.Index(fields=['user', '-created_at', '-id', 'comment'], name='comment_like_user_history_idx'),
         ]
     
     def __str__(self):
-        return f"{self.user} liked {self.content_type.model} #{self.object_id}"
+        return f"{self.user} liked comment #{self.comment_id}"
+
+
+# Like table by liked model; each like's target column is named after the model
+LIKE_MODELS = {
+    Post: PostLike,
+    Comment: CommentLike,
+}
+
+
+class LikeEvent(models.Model):
+    """
+    Outbox row for a like (delta 1) or unlike (delta -1), written in the same
+    transaction as the PostLike/CommentLike row when settings.LIKE_OUTBOX is on.
+    The process_like_events worker applies counters, karma and cache updates
+    in batches and deletes the rows it applied (see community.outbox).
+    """
+    content_type = models.ForeignKey(ContentType, on_delete=models.CASCADE)
+    object_id = models.PositiveIntegerField()
+    user = models.ForeignKey(Author, on_delete=models.PROTECT, related_name='+', db_index=False)
+    delta = models.SmallIntegerField()
+    created_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        ordering = ['id']
+        indexes = [
+            models.Index(fields=['content_type', 'object_id']),
+        ]
+
+    def __str__(self):
+        return f"{self.user} {self.delta:+d} on {self.content_type.model} #{self.object_id}"
+
+
+class KarmaTransactionQuerySet(models.QuerySet):
+    def window(self, start=None, end=None):
+        """
+        Transactions created in [start, end) (either bound may be None).
+        On PostgreSQL the bounds prune the scan to the day partitions
+        overlapping the window (see community.partitions).
+        """
+        queryset = self
+        if start is not None:
+            queryset = queryset.filter(created_at__gte=start)
+        if end is not None:
+            queryset = queryset.filter(created_at__lt=end)
+        return queryset
+    
+    def totals(self):
+        """Per-user karma, post_like_karma and comment_like_karma value rows."""
+        return (
+            self.order_by()
+            .values('user')
+            .annotate(
+                karma=Sum('points'),
+                post_like_karma=Coalesce(
+                    Sum('points', filter=Q(transaction_type=KarmaTransaction.POST_LIKE)), Value(0)
+                ),
+                comment_like_karma=Coalesce(
+                    Sum('points', filter=Q(transaction_type=KarmaTransaction.COMMENT_LIKE)), Value(0)
+                ),
+            )
+        )
 
 
 class KarmaTransaction(models.Model):
     """
     Stores karma transactions for accurate historical tracking.
     This enables dynamic calculation of 24-hour leaderboards.
+    Partitioned by day on PostgreSQL (community.partitions).
     """
     POST_LIKE = 'post_like'
     COMMENT_LIKE = 'comment_like'
@@ -114,7 +359,10 @@ class KarmaTransaction(models.Model):
         (COMMENT_LIKE, 'Comment Like'),
     ]
     
-    user = models.CharField(max_length=255)
+    # Leads the history index, so no index of its own
+    user = models.ForeignKey(
+        Author, on_delete=models.PROTECT, related_name='karma_transactions', db_index=False
+    )
     points = models.IntegerField()
     transaction_type = models.CharField(max_length=20, choices=TRANSACTION_TYPES)
     created_at = models.DateTimeField(default=timezone.now, db_index=True)
@@ -124,12 +372,543 @@ class KarmaTransaction(models.Model):
     object_id = models.PositiveIntegerField(null=True)
     content_object = GenericForeignKey('content_type', 'object_id')
     
+    objects = KarmaTransactionQuerySet.as_manager()
+    
     class Meta:
         ordering = ['-created_at']
         indexes = [
-            models.Index(fields=['user', '-created_at']),
+            # A user's karma history newest first, covering like the like history indexes
+            models.Index(
+                fields=['user', '-created_at', '-id', 'points', 'transaction_type', 'content_type', 'object_id'],
+                name='karma_user_history_idx'
+            ),
             models.Index(fields=['-created_at']),
         ]
     
+    @classmethod
+    def record(cls, user, points, transaction_type, content_type=None, object_id=None):
+        """
+        Append a karma transaction and apply it to the user's running totals.
+        Must be called inside the like/unlike transaction so both stay in step.
+        user is an Author; its name keys the leaderboards.
+        """
+        karma_transaction = cls.objects.create(
+            user=user,
+            points=points,
+            transaction_type=transaction_type,
+            content_type=content_type,
+            object_id=object_id
+        )
+        UserKarma.apply(user, points, transaction_type)
+        LeaderboardEntry.apply(user.name, points, karma_transaction.created_at)
+        return karma_transaction
+    
     def __str__(self):
         return f"{self.user} earned {self.points} karma ({self.transaction_type})"
+
+
+class UserKarma(models.Model):
+    """
+    Maintained per-user karma totals.
+    Avoids summing a user's whole KarmaTransaction history for profile lookups.
+    """
+    BREAKDOWN_FIELDS = {
+        KarmaTransaction.POST_LIKE: 'post_like_karma',
+        KarmaTransaction.COMMENT_LIKE: 'comment_like_karma',
+    }
+    
+    user = models.OneToOneField(Author, on_delete=models.PROTECT, related_name='karma_totals')
+    karma = models.IntegerField(default=0)
+    post_like_karma = models.IntegerField(default=0)
+    comment_like_karma = models.IntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    @classmethod
+    def apply(cls, user, points, transaction_type):
+        """
+        Atomically add points to a user's totals, creating the row on first karma.
+        """
+        field = cls.BREAKDOWN_FIELDS[transaction_type]
+        deltas = {'karma': F('karma') + points, field: F(field) + points}
+        
+        if cls.objects.filter(user=user).update(updated_at=timezone.now(), **deltas):
+            return
+        try:
+            with transaction.atomic():
+                cls.objects.create(user=user, karma=points, **{field: points})
+        except IntegrityError:
+            # A concurrent request created the row first
+            cls.objects.filter(user=user).update(updated_at=timezone.now(), **deltas)
+    
+    @classmethod
+    def rebuild(cls, users=None, batch_size=1000):
+        """
+        Recompute totals from KarmaTransaction history plus ArchivedKarma,
+        for every user or only those in users (a list of Author ids or a
+        values('user') queryset). Returns the number of users rebuilt.
+        """
+        transactions = KarmaTransaction.objects.all()
+        archived = ArchivedKarma.objects.all()
+        rows = cls.objects.all()
+        if users is not None:
+            transactions = transactions.filter(user__in=users)
+            archived = archived.filter(user__in=users)
+            rows = rows.filter(user__in=users)
+        archived = {row.pop('user'): row for row in archived.values('user', *ArchivedKarma.FIELDS)}
+        
+        def totals():
+            for row in transactions.totals().iterator():
+                user = row.pop('user')
+                for field, points in archived.pop(user, {}).items():
+                    row[field] += points
+                yield cls(user_id=user, **row)
+            # Users whose whole history was dropped
+            for user, row in archived.items():
+                yield cls(user_id=user, **row)
+        
+        with transaction.atomic():
+            rows.delete()
+            return len(cls.objects.bulk_create(totals(), batch_size=batch_size))
+    
+    def __str__(self):
+        return f"{self.user}: {self.karma} karma"
+
+
+class ArchivedKarma(models.Model):
+    """
+    Karma of the KarmaTransactions the retention policy dropped, per user
+    (community.partitions). Rebuilds and reconcile_counters add it to the
+    remaining history, so dropping old days never changes anyone's totals.
+    """
+    FIELDS = ['karma', 'post_like_karma', 'comment_like_karma']
+    
+    user = models.OneToOneField(Author, on_delete=models.PROTECT, related_name='archived_karma')
+    karma = models.IntegerField(default=0)
+    post_like_karma = models.IntegerField(default=0)
+    comment_like_karma = models.IntegerField(default=0)
+    
+    @classmethod
+    def add(cls, transactions):
+        """Add the per-user totals of a KarmaTransaction queryset about to be dropped."""
+        totals = {row.pop('user'): row for row in transactions.totals()}
+        existing = set(cls.objects.filter(user__in=totals).values_list('user', flat=True))
+        users = list(existing)
+        for start in range(0, len(users), 500):
+            chunk = users[start:start + 500]
+            cls.objects.filter(user__in=chunk).update(**{
+                field: F(field) + Case(
+                    *[When(user=user, then=Value(totals[user][field])) for user in chunk],
+                    default=Value(0)
+                )
+                for field in cls.FIELDS
+            })
+        cls.objects.bulk_create(
+            [cls(user_id=user, **row) for user, row in totals.items() if user not in existing],
+            batch_size=1000
+        )
+    
+    def __str__(self):
+        return f"{self.user}: {self.karma} archived karma"
+
+
+def bucket_start(moment):
+    """Floor a datetime to the start of its KarmaBucket."""
+    minutes = moment.minute - moment.minute % KarmaBucket.BUCKET_MINUTES
+    return moment.replace(minute=minutes, second=0, microsecond=0)
+
+
+class KarmaBucket(models.Model):
+    """
+    Karma earned per user in fixed-size time buckets.
+    The shared source every windowed leaderboard is derived from and expired against.
+    Keyed by name like LeaderboardEntry, whose ties are ordered by username.
+    """
+    BUCKET_MINUTES = 5
+    
+    user = models.CharField(max_length=255)
+    bucket_start = models.DateTimeField()
+    points = models.IntegerField(default=0)
+    
+    class Meta:
+        unique_together = ('user', 'bucket_start')
+        indexes = [
+            models.Index(fields=['bucket_start']),
+        ]
+    
+    def __str__(self):
+        return f"{self.user}: {self.points} karma from {self.bucket_start}"
+
+
+class LeaderboardWindow(models.Model):
+    """
+    Expiry watermark for a windowed leaderboard.
+    Buckets older than expired_through have already been subtracted from its entries.
+    """
+    window = models.CharField(max_length=8, primary_key=True)
+    expired_through = models.DateTimeField()
+    
+    def __str__(self):
+        return f"{self.window} expired through {self.expired_through}"
+
+
+class LeaderboardKarmaCount(models.Model):
+    """
+    How many users of a leaderboard window hold each karma value, kept in
+    step with LeaderboardEntry. A user's dense rank is one more than the
+    number of values above theirs, counted here instead of de-duplicating
+    every entry above them. Zero karma is never counted (entries reaching
+    zero are deleted), and rows whose count drops to zero are purged by
+    LeaderboardEntry.refresh().
+    """
+    window = models.CharField(max_length=8)
+    karma = models.IntegerField()
+    users = models.IntegerField(default=0)
+    
+    class Meta:
+        unique_together = ('window', 'karma')
+        indexes = [
+            # Covers the rank count of values above a karma
+            models.Index(fields=['window', 'karma', 'users'], name='leaderboard_karma_count_idx'),
+        ]
+    
+    @classmethod
+    def shift(cls, deltas):
+        """
+        Add {(window, karma): users delta} to the counts, one upsert per
+        500 values.
+        """
+        deltas = [(window, karma, delta) for (window, karma), delta in deltas.items() if karma and delta]
+        qn = connection.ops.quote_name
+        table = qn(cls._meta.db_table)
+        for start in range(0, len(deltas), 500):
+            chunk = deltas[start:start + 500]
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    f"INSERT INTO {table} ({qn('window')}, {qn('karma')}, {qn('users')}) "
+                    f"VALUES {', '.join(['(%s, %s, %s)'] * len(chunk))} "
+                    f"ON CONFLICT ({qn('window')}, {qn('karma')}) "
+                    f"DO UPDATE SET {qn('users')} = {table}.{qn('users')} + EXCLUDED.{qn('users')}",
+                    [value for row in chunk for value in row]
+                )
+    
+    @classmethod
+    def dense_rank(cls, window, karma):
+        """Dense rank of karma in a window."""
+        return cls.objects.filter(window=window, karma__gt=karma, users__gt=0).count() + 1
+    
+    @classmethod
+    def users_above(cls, window, karma):
+        """Number of users in a window with more karma."""
+        return (
+            cls.objects.filter(window=window, karma__gt=karma)
+            .aggregate(users=Coalesce(Sum('users'), 0))['users']
+        )
+    
+    def __str__(self):
+        return f"{self.users} users at {self.karma} karma ({self.window})"
+
+
+class LeaderboardEntry(models.Model):
+    """
+    Precomputed karma per user for every leaderboard window.
+    Likes add to all windows at once; buckets that age out of a window are
+    subtracted incrementally, so reading a board is an index range scan.
+    """
+    ALL_TIME = 'all'
+    WINDOWS = {
+        '1h': timedelta(hours=1),
+        '24h': timedelta(hours=24),
+        '7d': timedelta(days=7),
+        ALL_TIME: None,
+    }
+    DEFAULT_WINDOW = '24h'
+    
+    window = models.CharField(max_length=8)
+    user = models.CharField(max_length=255)
+    karma = models.IntegerField(default=0)
+    
+    class Meta:
+        unique_together = ('window', 'user')
+        indexes = [
+            models.Index(fields=['window', '-karma', 'user']),
+        ]
+    
+    @classmethod
+    def apply(cls, user, points, when):
+        """
+        Add points to the user's bucket and to their entry in every window,
+        moving the user between karma values in LeaderboardKarmaCount.
+        """
+        _increment_or_create(
+            KarmaBucket, {'user': user, 'bucket_start': bucket_start(when)}, 'points', points
+        )
+        
+        # One upsert for every window; RETURNING gives the new karma, so the
+        # old one is known without reading the entries first
+        qn = connection.ops.quote_name
+        table = qn(cls._meta.db_table)
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"INSERT INTO {table} ({qn('window')}, {qn('user')}, {qn('karma')}) "
+                f"VALUES {', '.join(['(%s, %s, %s)'] * len(cls.WINDOWS))} "
+                f"ON CONFLICT ({qn('window')}, {qn('user')}) "
+                f"DO UPDATE SET {qn('karma')} = {table}.{qn('karma')} + EXCLUDED.{qn('karma')} "
+                f"RETURNING {qn('window')}, {qn('karma')}",
+                [value for window in cls.WINDOWS for value in (window, user, points)]
+            )
+            updated = cursor.fetchall()
+        
+        # A missing entry counts as zero karma, which is never counted
+        deltas = Counter()
+        for window, karma in updated:
+            deltas[window, karma - points] -= 1
+            deltas[window, karma] += 1
+        LeaderboardKarmaCount.shift(deltas)
+        if any(karma == 0 for _, karma in updated):
+            cls.objects.filter(user=user, karma=0).delete()
+    
+    @classmethod
+    def cutoff(cls, window, now=None):
+        """Earliest bucket still inside a finite window."""
+        return bucket_start(now or timezone.now()) - cls.WINDOWS[window]
+    
+    @classmethod
+    def expire(cls, window, now=None):
+        """
+        Subtract buckets that have aged out of a window since the last expiry.
+        Cheap when nothing has aged out; safe to call on every read.
+        """
+        finite = cls.WINDOWS[window] is not None
+        # rebuild() records every finite window's state; with none recorded the
+        # entries, all-time ones included, were never built from history
+        state = LeaderboardWindow.objects.filter(window=window if finite else cls.DEFAULT_WINDOW).first()
+        if state is None:
+            cls.rebuild(now)
+            return
+        if not finite:
+            return
+        
+        new_cutoff = cls.cutoff(window, now)
+        if new_cutoff <= state.expired_through:
+            return
+        
+        with transaction.atomic():
+            # Claim the range first so concurrent readers never subtract it twice
+            claimed = LeaderboardWindow.objects.filter(
+                window=window, expired_through=state.expired_through
+            ).update(expired_through=new_cutoff)
+            if not claimed:
+                return
+            
+            expired = list(
+                KarmaBucket.objects
+                .filter(bucket_start__gte=state.expired_through, bucket_start__lt=new_cutoff)
+                .values('user')
+                .annotate(points=Sum('points'))
+                .values_list('user', 'points')
+            )
+            # Subtract and read the resulting karma in one statement: values read
+            # before the update could be changed by a concurrent apply()
+            qn = connection.ops.quote_name
+            table = qn(cls._meta.db_table)
+            deltas = Counter()
+            for start in range(0, len(expired), 500):
+                chunk = expired[start:start + 500]
+                points = dict(chunk)
+                with connection.cursor() as cursor:
+                    cursor.execute(
+                        f"UPDATE {table} SET {qn('karma')} = {qn('karma')} - CASE {qn('user')} "
+                        f"{' '.join(['WHEN %s THEN %s'] * len(chunk))} ELSE 0 END "
+                        f"WHERE {qn('window')} = %s AND {qn('user')} IN ({', '.join(['%s'] * len(chunk))}) "
+                        f"RETURNING {qn('user')}, {qn('karma')}",
+                        [value for row in chunk for value in row] + [window] + [user for user, _ in chunk]
+                    )
+                    updated = cursor.fetchall()
+                for user, karma in updated:
+                    deltas[window, karma + points[user]] -= 1
+                    deltas[window, karma] += 1
+            LeaderboardKarmaCount.shift(deltas)
+            cls.objects.filter(window=window, karma=0).delete()
+    
+    @classmethod
+    def top(cls, window, limit):
+        """
+        Top entries of a window with dense ranks (ties share a rank and are
+        ordered by username), read straight off the (window, -karma) index.
+        """
+        entries = (
+            cls.objects
+            .filter(window=window)
+            .order_by('-karma', 'user')
+            .values('user', 'karma')[:limit]
+        )
+        return dense_rank(entries, 1)
+    
+    @classmethod
+    def refresh(cls, now=None):
+        """
+        Expire every window and purge buckets no window needs any more, along
+        with karma values no user holds. Returns the number of buckets purged.
+        """
+        now = now or timezone.now()
+        for window in cls.WINDOWS:
+            cls.expire(window, now)
+        LeaderboardKarmaCount.objects.filter(users__lte=0).delete()
+        return cls.purge_buckets()
+    
+    @classmethod
+    def purge_buckets(cls):
+        """Delete buckets that every finite window has already expired."""
+        watermarks = LeaderboardWindow.objects.values_list('expired_through', flat=True)
+        finite = [window for window, span in cls.WINDOWS.items() if span is not None]
+        if len(watermarks) < len(finite):
+            return 0
+        deleted, _ = KarmaBucket.objects.filter(bucket_start__lt=min(watermarks)).delete()
+        return deleted
+    
+    @classmethod
+    def rebuild(cls, now=None):
+        """
+        Recompute buckets and every window from KarmaTransaction history.
+        """
+        now = now or timezone.now()
+        horizon = min(
+            cls.cutoff(window, now) for window, span in cls.WINDOWS.items() if span is not None
+        )
+        
+        with transaction.atomic():
+            KarmaBucket.objects.all().delete()
+            cls.objects.all().delete()
+            LeaderboardWindow.objects.all().delete()
+            LeaderboardKarmaCount.objects.all().delete()
+            
+            buckets = {}
+            recent = (
+                KarmaTransaction.objects
+                .window(horizon)
+                .values_list('user__name', 'points', 'created_at')
+                .iterator(chunk_size=2000)
+            )
+            for user, points, created_at in recent:
+                key = (user, bucket_start(created_at))
+                buckets[key] = buckets.get(key, 0) + points
+            KarmaBucket.objects.bulk_create(
+                [KarmaBucket(user=user, bucket_start=start, points=points)
+                 for (user, start), points in buckets.items()],
+                batch_size=1000
+            )
+            
+            entries = []
+            for window, span in cls.WINDOWS.items():
+                if span is None:
+                    # Group by the integer author id, then look the names up once
+                    karma = dict(ArchivedKarma.objects.values_list('user', 'karma'))
+                    for user, points in (
+                        KarmaTransaction.objects.order_by().values('user')
+                        .annotate(karma=Sum('points')).values_list('user', 'karma')
+                    ):
+                        karma[user] = karma.get(user, 0) + points
+                    names = Author.names(karma)
+                    totals = [(names[user], points) for user, points in karma.items()]
+                else:
+                    cutoff = cls.cutoff(window, now)
+                    LeaderboardWindow.objects.create(window=window, expired_through=cutoff)
+                    totals = (
+                        KarmaBucket.objects.filter(bucket_start__gte=cutoff).values('user')
+                        .annotate(karma=Sum('points')).values_list('user', 'karma')
+                    )
+                for user, karma in totals:
+                    if karma:
+                        entries.append(cls(window=window, user=user, karma=karma))
+            cls.objects.bulk_create(entries, batch_size=1000)
+            LeaderboardKarmaCount.objects.bulk_create(
+                [LeaderboardKarmaCount(window=window, karma=karma, users=users)
+                 for (window, karma), users in Counter((e.window, e.karma) for e in entries).items()],
+                batch_size=1000
+            )
+    
+    def __str__(self):
+        return f"{self.user}: {self.karma} karma ({self.window})"
+
+
+class ScheduledJob(models.Model):
+    """
+    Schedule and lease of a periodic maintenance job (see community.scheduler).
+    An instance runs a job only after claiming its lease with a conditional
+    UPDATE, so each run happens on exactly one scheduler across workers.
+    """
+    name = models.CharField(max_length=64, primary_key=True)
+    next_run_at = models.DateTimeField(default=timezone.now)
+    leased_by = models.CharField(max_length=255, blank=True)
+    lease_expires_at = models.DateTimeField(null=True, blank=True)
+    
+    def __str__(self):
+        return f"{self.name} next at {self.next_run_at}"
+
+
+class JobRun(models.Model):
+    """
+    One run of a scheduled job, with its duration and the rows it touched.
+    """
+    job = models.CharField(max_length=64)
+    ran_by = models.CharField(max_length=255)
+    started_at = models.DateTimeField()
+    duration_ms = models.PositiveIntegerField()
+    rows = models.IntegerField(default=0)
+    succeeded = models.BooleanField(default=True)
+    error = models.TextField(blank=True)
+    
+    class Meta:
+        ordering = ['-started_at']
+        indexes = [
+            models.Index(fields=['job', '-started_at']),
+            models.Index(fields=['started_at']),
+        ]
+    
+    def __str__(self):
+        status = 'ok' if self.succeeded else 'failed'
+        return f"{self.job} at {self.started_at}: {status}, {self.rows} rows in {self.duration_ms}ms"
+
+
+class IdempotencyKey(models.Model):
+    """
+    Table behind the 'idempotency' cache when REDIS_URL is unset: Django's
+    DatabaseCache reads and writes it directly (see community.idempotency).
+    It is a model so that `migrate` creates it on every deploy.
+    """
+    cache_key = models.CharField(max_length=255, primary_key=True)
+    value = models.TextField()
+    expires = models.DateTimeField(db_index=True)
+    
+    class Meta:
+        db_table = 'community_idempotency_key'
+
+
+def dense_rank(entries, first_rank, step=1):
+    """
+    Assign dense ranks to leaderboard entries already ordered by karma,
+    starting at first_rank and moving by step whenever karma changes.
+    """
+    ranked = []
+    rank = first_rank
+    previous = None
+    for entry in entries:
+        if previous is not None and entry['karma'] != previous:
+            rank += step
+        previous = entry['karma']
+        ranked.append({'user': entry['user'], 'karma': entry['karma'], 'rank': rank})
+    return ranked
+
+
+def _increment_or_create(model, lookup, field, amount):
+    """
+    Atomically add amount to field on the row matching lookup, creating it if missing.
+    """
+    if model.objects.filter(**lookup).update(**{field: F(field) + amount}):
+        return
+    try:
+        with transaction.atomic():
+            model.objects.create(**lookup, **{field: amount})
+    except IntegrityError:
+        # A concurrent request created the row first
+        model.objects.filter(**lookup).update(**{field: F(field) + amount})
@@ -0,0 +1,77 @@
+"""
+Worker side of the like outbox (settings.LIKE_OUTBOX).
+
+Like/unlike requests only write a PostLike/CommentLike and a LikeEvent
+row. The process_like_events command drains LikeEvent in batches: each
+batch is claimed with SELECT ... FOR UPDATE SKIP LOCKED (so several
+workers can run on Postgres), its deltas are coalesced per target, and
+one counter update and one karma transaction are applied per target
+before the batch's rows are deleted, all in one transaction. A crash before commit leaves the rows
+to be picked up again; a committed batch is never applied twice.
+
+Listeners of like_counts_changed (e.g. a push layer) are notified after
+each batch commits.
+"""
+from collections import defaultdict
+
+from django.contrib.contenttypes.models import ContentType
+from django.db import transaction
+from django.dispatch import Signal
+
+from .likes import apply_like_delta
+from .models import LikeEvent
+
+
+# Sent after a batch commits with changes=[(model, object_id, like_count), ...]
+like_counts_changed = Signal()
+
+DEFAULT_BATCH_SIZE = 500
+
+
+def process_batch(batch_size=DEFAULT_BATCH_SIZE):
+    """
+    Apply and delete up to batch_size pending events.
+    Returns the number of events processed.
+    """
+    with transaction.atomic():
+        events = list(
+            LikeEvent.objects
+            .select_for_update(skip_locked=True)
+            .order_by('id')
+            .values_list('id', 'content_type_id', 'object_id', 'delta')[:batch_size]
+        )
+        if not events:
+            return 0
+
+        net = defaultdict(int)
+        for _, content_type_id, object_id, delta in events:
+            net[content_type_id, object_id] += delta
+
+        changes = []
+        for (content_type_id, object_id), delta in net.items():
+            if delta == 0:
+                # Liked and unliked within the batch
+                continue
+            model = ContentType.objects.get_for_id(content_type_id).model_class()
+            try:
+                like_count = apply_like_delta(model, object_id, delta)
+            except model.DoesNotExist:
+                # Deleted since it was liked; nothing left to count
+                continue
+            changes.append((model, object_id, like_count))
+
+        LikeEvent.objects.filter(id__in=[event[0] for event in events]).delete()
+
+        if changes:
+            transaction.on_commit(
+                lambda: like_counts_changed.send(sender=LikeEvent, changes=changes)
+            )
+    return len(events)
+
+
+def drain(batch_size=DEFAULT_BATCH_SIZE):
+    """Process batches until the outbox is empty. Returns the events processed."""
+    total = 0
+    while processed := process_batch(batch_size):
+        total += processed
+    return total
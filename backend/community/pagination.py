@@ -0,0 +1,46 @@
+from rest_framework.pagination import CursorPagination
+
+
+class HotFeedPagination(CursorPagination):
+    """
+    Keyset pagination over the stored hot score.
+    Ordering matches the (-hot_score, -id) index so each page is an index range scan.
+    """
+    ordering = ('-hot_score', '-id')
+
+
+class ActivityPagination(CursorPagination):
+    """
+    Keyset pagination for a user's like and karma history, newest first.
+    Ordering matches the (user, -created_at, -id) indexes so each page is an index range scan.
+    """
+    ordering = ('-created_at', '-id')
+
+
+class MergedQuerySet:
+    """
+    Value querysets over several tables paged as one, e.g. a user's post and
+    comment likes. CursorPagination's ordering and position filter are
+    applied to every part; a slice reads up to its end from each part (one
+    index range scan per table) and merges the rows in order.
+    """
+
+    def __init__(self, *querysets, ordering=()):
+        self.querysets = querysets
+        self.ordering = ordering
+
+    def order_by(self, *ordering):
+        return MergedQuerySet(*[queryset.order_by(*ordering) for queryset in self.querysets], ordering=ordering)
+
+    def filter(self, *args, **kwargs):
+        return MergedQuerySet(
+            *[queryset.filter(*args, **kwargs) for queryset in self.querysets], ordering=self.ordering
+        )
+
+    def __getitem__(self, page):
+        rows = [row for queryset in self.querysets for row in queryset[:page.stop]]
+        # Stable sorts from the last ordering field to the first
+        for field in reversed(self.ordering):
+            name = field.lstrip('-')
+            rows.sort(key=lambda row: row[name], reverse=field.startswith('-'))
+        return rows[page]
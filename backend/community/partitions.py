@@ -0,0 +1,242 @@
+"""
+Day partitions of KarmaTransaction.
+
+On PostgreSQL the table is natively partitioned BY RANGE (created_at)
+(migration 0011): one partition per UTC day named
+community_karmatransaction_pYYYYMMDD, a ..._history partition with
+everything from before the conversion, and a ..._default partition that
+catches rows no day partition covers yet. Postgres routes each insert to
+its day, and reads bounded on created_at (KarmaTransaction.objects.window())
+only touch the partitions overlapping the window, so the day being written
+stays small however long the history grows.
+
+SQLite has no declarative partitioning, and the ORM, the bulk import's raw
+INSERTs and migrations all need KarmaTransaction to be one real table.
+There a partition is a day's range of the created_at index: windowed reads
+are a range scan of it, and dropping a day deletes that range in batches.
+
+maintain() creates partitions ahead of time and, when a retention is set,
+drops the days older than it, first archiving each one as gzipped NDJSON
+in the export_data format (import_data reads it back). Day partitions
+past the retention are dropped whole; days still inside the _history or
+_default partition are deleted from it by range, as on SQLite. The karma
+of every dropped transaction is added to ArchivedKarma in the same
+transaction, so UserKarma.rebuild, refresh_leaderboard --rebuild and
+reconcile_counters still count it.
+"""
+import os
+import re
+from collections import namedtuple
+from datetime import datetime, time, timedelta, timezone as dt_timezone
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from . import export
+from .models import ArchivedKarma, KarmaTransaction
+
+
+TABLE = KarmaTransaction._meta.db_table
+DEFAULT_PARTITION = f'{TABLE}_default'
+DELETE_BATCH = 5000
+
+# label is the partition table on PostgreSQL and the day (YYYY-MM-DD)
+# elsewhere; start / end are None where the range is unbounded
+Partition = namedtuple('Partition', ['label', 'start', 'end'])
+
+_BOUNDS = re.compile(r"FROM \((?P<start>[^)]+)\) TO \((?P<end>[^)]+)\)")
+
+
+def partitioned():
+    """Whether KarmaTransaction is natively partitioned (PostgreSQL)."""
+    return connection.vendor == 'postgresql'
+
+
+def day_start(moment):
+    """UTC midnight starting moment's day."""
+    return datetime.combine(moment.astimezone(dt_timezone.utc).date(), time.min, tzinfo=dt_timezone.utc)
+
+
+def partition_name(day):
+    return f'{TABLE}_p{day:%Y%m%d}'
+
+
+def partitions():
+    """
+    Existing partitions, oldest first. On PostgreSQL the default partition
+    comes last with no bounds; elsewhere there is one per day with rows.
+    """
+    if not partitioned():
+        days = []
+        for day in KarmaTransaction.objects.order_by().dates('created_at', 'day'):
+            start = datetime.combine(day, time.min, tzinfo=dt_timezone.utc)
+            days.append(Partition(f'{day:%Y-%m-%d}', start, start + timedelta(days=1)))
+        return days
+
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT child.relname, pg_get_expr(child.relpartbound, child.oid) "
+            "FROM pg_inherits JOIN pg_class child ON child.oid = pg_inherits.inhrelid "
+            "WHERE pg_inherits.inhparent = %s::regclass",
+            [TABLE]
+        )
+        found = cursor.fetchall()
+
+    result = []
+    for name, bound in found:
+        match = _BOUNDS.search(bound)
+        if match is None:
+            result.append(Partition(name, None, None))
+        else:
+            result.append(Partition(name, _bound(match['start']), _bound(match['end'])))
+    unbounded = datetime.min.replace(tzinfo=dt_timezone.utc)
+    result.sort(key=lambda partition: (
+        partition.end is None and partition.start is None, partition.start or unbounded
+    ))
+    return result
+
+
+def _bound(value):
+    if value in ('MINVALUE', 'MAXVALUE'):
+        return None
+    return parse_datetime(value.strip("'"))
+
+
+def row_count(partition):
+    """Rows stored in the partition (or, on PostgreSQL, a day outside any day partition)."""
+    if not partitioned() or not partition.label.startswith(TABLE):
+        return KarmaTransaction.objects.window(partition.start, partition.end).count()
+    with connection.cursor() as cursor:
+        cursor.execute(f'SELECT COUNT(*) FROM {connection.ops.quote_name(partition.label)}')
+        return cursor.fetchone()[0]
+
+
+def create_partitions(ahead, now=None):
+    """
+    Create the missing day partitions from today through `ahead` days from
+    now, moving any rows the default partition already holds for those
+    days into them. Returns the names created; always empty off PostgreSQL.
+    """
+    if not partitioned():
+        return []
+
+    qn = connection.ops.quote_name
+    today = day_start(now or timezone.now())
+    existing = {partition.label for partition in partitions()}
+    created = []
+    for offset in range(ahead + 1):
+        start = today + timedelta(days=offset)
+        end = start + timedelta(days=1)
+        name = partition_name(start)
+        if name in existing:
+            continue
+        # Attaching a filled standalone table, rather than CREATE ... PARTITION OF,
+        # works even when the default partition has rows for the day
+        with transaction.atomic(), connection.cursor() as cursor:
+            cursor.execute(f'CREATE TABLE {qn(name)} (LIKE {qn(TABLE)} INCLUDING DEFAULTS)')
+            cursor.execute(
+                f'WITH moved AS (DELETE FROM {qn(DEFAULT_PARTITION)} '
+                f'WHERE created_at >= %s AND created_at < %s RETURNING *) '
+                f'INSERT INTO {qn(name)} SELECT * FROM moved',
+                [start, end]
+            )
+            cursor.execute(
+                f"ALTER TABLE {qn(TABLE)} ATTACH PARTITION {qn(name)} "
+                f"FOR VALUES FROM ('{start.isoformat()}') TO ('{end.isoformat()}')"
+            )
+        created.append(name)
+    return created
+
+
+def retention_cutoff(days, now=None):
+    """Start of the oldest day a `days`-day retention keeps."""
+    return day_start(now or timezone.now()) - timedelta(days=days)
+
+
+def drop_partitions(before, archive_dir=None):
+    """
+    Drop every partition that ends at or before `before` (never the default
+    one), then, on PostgreSQL, every day before it still held by the
+    _history or _default partition. Each is first written to archive_dir as
+    karma-<day>.ndjson.gz when given. Returns (label, rows) per dropped
+    partition or day.
+    """
+    dropped = []
+    for partition in partitions():
+        if partition.end is None or partition.end > before:
+            continue
+        rows = _archive(partition, archive_dir) if archive_dir else row_count(partition)
+        if partitioned():
+            qn = connection.ops.quote_name
+            with transaction.atomic(), connection.cursor() as cursor:
+                ArchivedKarma.add(KarmaTransaction.objects.window(partition.start, partition.end))
+                cursor.execute(f'ALTER TABLE {qn(TABLE)} DETACH PARTITION {qn(partition.label)}')
+                cursor.execute(f'DROP TABLE {qn(partition.label)}')
+        else:
+            _delete_range(partition.start, partition.end)
+        dropped.append((partition.label, rows))
+    
+    if partitioned():
+        # Whatever is left before the cutoff sits in _history or _default
+        for day in KarmaTransaction.objects.window(end=before).order_by().dates('created_at', 'day'):
+            start = datetime.combine(day, time.min, tzinfo=dt_timezone.utc)
+            partition = Partition(f'{day:%Y-%m-%d}', start, start + timedelta(days=1))
+            rows = _archive(partition, archive_dir) if archive_dir else row_count(partition)
+            _delete_range(partition.start, partition.end)
+            dropped.append((partition.label, rows))
+    return dropped
+
+
+def _archive(partition, archive_dir):
+    """Write the partition's rows as gzipped NDJSON; returns the row count."""
+    if partition.start is None:
+        filename = f'karma-before-{partition.end:%Y-%m-%d}.ndjson.gz'
+    else:
+        filename = f'karma-{partition.start:%Y-%m-%d}.ndjson.gz'
+    os.makedirs(archive_dir, exist_ok=True)
+    path = os.path.join(archive_dir, filename)
+
+    run = export.Export(['karma'], since=partition.start, until=partition.end)
+    # Replace atomically so an interrupted run never leaves a truncated archive
+    partial = f'{path}.tmp'
+    with open(partial, 'wb') as archive:
+        for block in run.chunks(compress=True):
+            archive.write(block)
+    os.replace(partial, path)
+    return run.counts['karma']
+
+
+def _delete_range(start, end):
+    """
+    Delete a day's rows in id batches, so no statement holds the write lock
+    for long, moving each batch's karma to ArchivedKarma as it goes.
+    """
+    while True:
+        with transaction.atomic():
+            ids = list(
+                KarmaTransaction.objects.window(start, end).order_by().values_list('id', flat=True)[:DELETE_BATCH]
+            )
+            if not ids:
+                return
+            batch = KarmaTransaction.objects.window(start, end).filter(id__in=ids)
+            ArchivedKarma.add(batch)
+            batch.delete()
+
+
+def maintain(now=None):
+    """
+    Create partitions settings.KARMA_PARTITION_AHEAD_DAYS ahead and drop
+    (archiving to settings.KARMA_ARCHIVE_DIR when set) the days older than
+    settings.KARMA_RETENTION_DAYS, if set. Returns partitions created plus
+    rows dropped.
+    """
+    now = now or timezone.now()
+    created = create_partitions(settings.KARMA_PARTITION_AHEAD_DAYS, now)
+    dropped = []
+    if settings.KARMA_RETENTION_DAYS:
+        dropped = drop_partitions(
+            retention_cutoff(settings.KARMA_RETENTION_DAYS, now), settings.KARMA_ARCHIVE_DIR or None
+        )
+    return len(created) + sum(rows for _, rows in dropped)
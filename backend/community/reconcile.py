@@ -0,0 +1,274 @@
+"""
+Consistency checks for the denormalized counters, used by the
+reconcile_counters command.
+
+Checks run in two passes. The first streams the source tables (PostLike,
+CommentLike and KarmaTransaction) in id ranges with one GROUP BY per range,
+and the command merges the partial sums into like counts per post/comment
+and karma per user. Ranges are independent, so the command aggregates them
+in a process pool. The second pass walks the counter tables (Post, Comment,
+UserKarma) in id ranges and compares each stored value with the merged one,
+less the likes still queued in the like outbox, plus any karma dropped by
+retention (ArchivedKarma).
+
+The merged sums are not one snapshot: a like landing mid-run can make a row
+look wrong. So a row flagged by the comparison only counts as a discrepancy
+if an exact recount of that row still disagrees. Repairs apply that
+difference (F(field) + delta) rather than overwriting the value, so a like or
+karma transaction landing between the check and the repair is not lost.
+"""
+from collections import namedtuple
+
+from django.contrib.contenttypes.models import ContentType
+from django.db import transaction
+from django.db.models import Case, Count, F, IntegerField, Max, Min, OuterRef, Subquery, Sum, Value, When
+from django.db.models.functions import Coalesce
+
+from . import tree_cache
+from .models import Author, Post, Comment, LikeEvent, KarmaTransaction, UserKarma, ArchivedKarma, LIKE_MODELS
+
+
+# Rows per CASE ... WHEN repair statement
+REPAIR_BATCH = 500
+
+# Users per UserKarma lookup of the missing_karma check
+LOOKUP_BATCH = 1000
+
+ChunkResult = namedtuple('ChunkResult', ['check', 'checked', 'discrepancies', 'repaired'])
+
+# Sums of one id range of a source table: {post/comment id: likes} or
+# {author id: (karma, post_like_karma, comment_like_karma)}
+Partial = namedtuple('Partial', ['source', 'sums'])
+
+# source name -> (table aggregated in the first pass, column it is grouped by)
+SOURCES = {
+    'post_likes': (LIKE_MODELS[Post], 'post_id'),
+    'comment_likes': (LIKE_MODELS[Comment], 'comment_id'),
+    'karma': (KarmaTransaction, 'user'),
+}
+
+# check name -> source whose merged sums it compares against
+CHECKS = {
+    'post_likes': 'post_likes',
+    'comment_likes': 'comment_likes',
+    'user_karma': 'karma',
+    'missing_karma': 'karma',
+}
+
+KARMA_FIELDS = ArchivedKarma.FIELDS
+
+
+def plan(checks, chunk_size):
+    """(source, low id, high id) tasks covering every row of the sources the checks need."""
+    tasks = []
+    for source in dict.fromkeys(CHECKS[check] for check in checks):
+        tasks.extend((source, low, high) for low, high in _ranges(SOURCES[source][0], chunk_size))
+    return tasks
+
+
+def _ranges(model, chunk_size):
+    bounds = model.objects.aggregate(low=Min('id'), high=Max('id'))
+    if bounds['low'] is None:
+        return []
+    return [(low, low + chunk_size) for low in range(bounds['low'], bounds['high'] + 1, chunk_size)]
+
+
+def aggregate_chunk(source, low, high):
+    """Sums of the source rows in the id range [low, high), in one GROUP BY."""
+    model, group_by = SOURCES[source]
+    rows = model.objects.filter(id__gte=low, id__lt=high)
+    if source == 'karma':
+        sums = {row.pop(group_by): tuple(row[field] for field in KARMA_FIELDS) for row in rows.totals()}
+    else:
+        sums = dict(rows.order_by().values(group_by).annotate(likes=Count('id')).values_list(group_by, 'likes'))
+    return Partial(source, sums)
+
+
+def merge(totals, partial):
+    """Add a chunk's sums into totals ({source: {key: sum}})."""
+    merged = totals.setdefault(partial.source, {})
+    for key, value in partial.sums.items():
+        if key not in merged:
+            merged[key] = value
+        elif partial.source == 'karma':
+            merged[key] = tuple(a + b for a, b in zip(merged[key], value))
+        else:
+            merged[key] += value
+
+
+def add_archived(totals):
+    """Add the karma dropped by retention into merged karma totals."""
+    merged = totals.setdefault('karma', {})
+    for user, *archived in ArchivedKarma.objects.values_list('user', *KARMA_FIELDS).iterator():
+        merged[user] = tuple(a + b for a, b in zip(merged.get(user, (0,) * len(KARMA_FIELDS)), archived))
+
+
+def compare(checks, totals, chunk_size, repair=False):
+    """
+    Compare the counter tables with the merged totals, yielding a
+    ChunkResult per id range checked (and optionally repaired).
+    """
+    for check in checks:
+        expected = totals.get(CHECKS[check], {})
+        if check == 'missing_karma':
+            yield _missing_karma(expected, repair)
+            continue
+        model = {'post_likes': Post, 'comment_likes': Comment, 'user_karma': UserKarma}[check]
+        for low, high in _ranges(model, chunk_size):
+            with transaction.atomic():
+                if check == 'user_karma':
+                    result = _user_karma(expected, low, high, repair)
+                else:
+                    result = _like_counts(check, model, expected, low, high, repair)
+            yield result
+
+
+def _sum_subquery(queryset, group_by, expression):
+    """Correlated aggregate subquery, coalesced to 0 when there are no rows."""
+    return Coalesce(
+        Subquery(queryset.order_by().values(group_by).annotate(total=expression).values('total')),
+        Value(0),
+        output_field=IntegerField()
+    )
+
+
+def _delta_case(deltas):
+    """CASE id WHEN ... THEN delta ... ELSE 0 for an F(field) + delta update."""
+    return Case(
+        *[When(id=pk, then=Value(delta)) for pk, delta in deltas.items()],
+        default=Value(0),
+        output_field=IntegerField()
+    )
+
+
+def _like_counts(check, model, counts, low, high, repair):
+    """
+    like_count must equal the number of like rows minus any changes still
+    queued in the like outbox (which the worker has not applied yet).
+    """
+    content_type = ContentType.objects.get_for_model(model)
+    rows = model.objects.filter(id__gte=low, id__lt=high)
+    pending = dict(
+        LikeEvent.objects.filter(content_type=content_type, object_id__gte=low, object_id__lt=high)
+        .order_by().values('object_id').annotate(delta=Sum('delta')).values_list('object_id', 'delta')
+    )
+    current = list(rows.values_list('id', 'like_count'))
+    flagged = [pk for pk, like_count in current if like_count != counts.get(pk, 0) - pending.get(pk, 0)]
+
+    mismatched = []
+    if flagged:
+        target = model._meta.model_name
+        likes = LIKE_MODELS[model].objects.filter(**{target: OuterRef('id')})
+        queued = LikeEvent.objects.filter(content_type=content_type, object_id=OuterRef('id'))
+        mismatched = list(
+            model.objects.filter(id__in=flagged)
+            .annotate(expected=(
+                _sum_subquery(likes, target, Count('id'))
+                - _sum_subquery(queued, 'object_id', Sum('delta'))
+            ))
+            .exclude(like_count=F('expected'))
+            .values_list('id', 'like_count', 'expected', *(['post_id'] if model is Comment else []))
+        )
+    discrepancies = [(pk, {'like_count': (stored, expected)}) for pk, stored, expected, *_ in mismatched]
+
+    if repair and mismatched:
+        for start in range(0, len(mismatched), REPAIR_BATCH):
+            batch = mismatched[start:start + REPAIR_BATCH]
+            model.objects.filter(id__in=[row[0] for row in batch]).update(
+                like_count=F('like_count') + _delta_case(
+                    {pk: expected - stored for pk, stored, expected, *_ in batch}
+                )
+            )
+        if model is Post:
+            Post.decay_hot_scores(ids=[row[0] for row in mismatched])
+        else:
+            for pk, _, expected, post_id in mismatched:
+                tree_cache.like_count_changed(post_id, pk, expected)
+
+    return ChunkResult(check, len(current), discrepancies, len(mismatched) if repair else 0)
+
+
+def _user_karma(totals, low, high, repair):
+    """
+    UserKarma totals must equal the sums of the user's KarmaTransactions plus
+    the karma of any that retention dropped (ArchivedKarma).
+    """
+    rows = UserKarma.objects.filter(id__gte=low, id__lt=high)
+    current = list(rows.values_list('id', 'user', *KARMA_FIELDS))
+    flagged = [
+        pk for pk, user, *values in current
+        if tuple(values) != totals.get(user, (0,) * len(KARMA_FIELDS))
+    ]
+
+    mismatched = []
+    if flagged:
+        transactions = KarmaTransaction.objects.filter(user=OuterRef('user'))
+        archived = ArchivedKarma.objects.filter(user=OuterRef('user'))
+        expected = {
+            'karma': _sum_subquery(transactions, 'user', Sum('points')),
+            'post_like_karma': _sum_subquery(
+                transactions.filter(transaction_type=KarmaTransaction.POST_LIKE), 'user', Sum('points')
+            ),
+            'comment_like_karma': _sum_subquery(
+                transactions.filter(transaction_type=KarmaTransaction.COMMENT_LIKE), 'user', Sum('points')
+            ),
+        }
+        expected = {
+            field: value + _sum_subquery(archived, 'user', Sum(field)) for field, value in expected.items()
+        }
+        mismatched = list(
+            UserKarma.objects.filter(id__in=flagged)
+            .annotate(**{f'expected_{field}': value for field, value in expected.items()})
+            .exclude(**{field: F(f'expected_{field}') for field in expected})
+            .values('id', 'user__name', *expected, *[f'expected_{field}' for field in expected])
+        )
+    discrepancies = [
+        (row['user__name'], {
+            field: (row[field], row[f'expected_{field}'])
+            for field in KARMA_FIELDS if row[field] != row[f'expected_{field}']
+        })
+        for row in mismatched
+    ]
+
+    if repair and mismatched:
+        for start in range(0, len(mismatched), REPAIR_BATCH):
+            batch = mismatched[start:start + REPAIR_BATCH]
+            UserKarma.objects.filter(id__in=[row['id'] for row in batch]).update(**{
+                field: F(field) + _delta_case({
+                    row['id']: row[f'expected_{field}'] - row[field] for row in batch
+                })
+                for field in KARMA_FIELDS
+            })
+
+    return ChunkResult('user_karma', len(current), discrepancies, len(mismatched) if repair else 0)
+
+
+def _missing_karma(totals, repair):
+    """Every user with karma must have a UserKarma row."""
+    users = list(totals)
+    missing = []
+    for start in range(0, len(users), LOOKUP_BATCH):
+        batch = users[start:start + LOOKUP_BATCH]
+        existing = set(UserKarma.objects.filter(user__in=batch).values_list('user', flat=True))
+        missing.extend(user for user in batch if user not in existing)
+
+    if repair and missing:
+        # Recount exactly rather than trusting the merged sums
+        totals = KarmaTransaction.objects.filter(user__in=missing).totals()
+        archived = {
+            row.pop('user'): row
+            for row in ArchivedKarma.objects.filter(user__in=missing).values('user', *KARMA_FIELDS)
+        }
+        created = []
+        for row in totals:
+            user = row.pop('user')
+            for field, points in archived.pop(user, {}).items():
+                row[field] += points
+            created.append(UserKarma(user_id=user, **row))
+        created.extend(UserKarma(user_id=user, **row) for user, row in archived.items())
+        # A like may have created the user's row since the lookup
+        UserKarma.objects.bulk_create(created, ignore_conflicts=True)
+
+    names = Author.names(missing)
+    discrepancies = [(names[user], {'user_karma': (None, 'missing')}) for user in missing]
+    return ChunkResult('missing_karma', len(users), discrepancies, len(missing) if repair else 0)
@@ -0,0 +1,103 @@
+"""
+Lightweight periodic job scheduler for maintenance tasks.
+
+Jobs are plain functions registered with @job (see community.jobs) that
+return the number of rows they touched. The run_scheduler command calls
+run_due_jobs() in a loop; any number of instances can run it. Each job has
+a ScheduledJob row, and an instance only runs a due job after claiming its
+lease with a conditional UPDATE, so each run happens exactly once across
+instances with no broker. A lease outlives a crashed instance by at most
+the job's lease duration. Every run is recorded as a JobRun.
+"""
+import os
+import socket
+import time
+import traceback
+from collections import namedtuple
+from datetime import timedelta
+
+from django.db.models import Q
+from django.utils import timezone
+
+from .models import ScheduledJob, JobRun
+
+
+Job = namedtuple('Job', ['name', 'every', 'lease', 'func'])
+
+# Registered jobs by name
+JOBS = {}
+
+DEFAULT_LEASE = timedelta(minutes=10)
+
+
+def job(name, every, lease=DEFAULT_LEASE):
+    """Register a function as a periodic job running every `every` (a timedelta)."""
+    def register(func):
+        JOBS[name] = Job(name, every, lease, func)
+        return func
+    return register
+
+
+def instance_name():
+    """Identifies this scheduler instance in leases and run records."""
+    return f'{socket.gethostname()}:{os.getpid()}'
+
+
+def ensure_schedules():
+    """Create the ScheduledJob row of every registered job (due immediately)."""
+    ScheduledJob.objects.bulk_create(
+        [ScheduledJob(name=name) for name in JOBS], ignore_conflicts=True
+    )
+
+
+def claim(job, owner, now=None, force=False):
+    """
+    Take the job's lease if it is due (or force is set) and nobody holds it.
+    Returns True if this instance now owns the run.
+    """
+    now = now or timezone.now()
+    queryset = ScheduledJob.objects.filter(name=job.name).filter(
+        Q(lease_expires_at__isnull=True) | Q(lease_expires_at__lte=now)
+    )
+    if not force:
+        queryset = queryset.filter(next_run_at__lte=now)
+    return queryset.update(leased_by=owner, lease_expires_at=now + job.lease) == 1
+
+
+def run_job(job, owner):
+    """
+    Run a job whose lease this instance holds, record the run, schedule the
+    next one and release the lease. Failures are recorded, not raised.
+    """
+    started_at = timezone.now()
+    start = time.monotonic()
+    rows, error = 0, ''
+    try:
+        rows = job.func() or 0
+    except Exception:
+        error = traceback.format_exc()
+    duration_ms = round((time.monotonic() - start) * 1000)
+
+    run = JobRun.objects.create(
+        job=job.name,
+        ran_by=owner,
+        started_at=started_at,
+        duration_ms=duration_ms,
+        rows=rows,
+        succeeded=not error,
+        error=error,
+    )
+    ScheduledJob.objects.filter(name=job.name, leased_by=owner).update(
+        next_run_at=started_at + job.every, leased_by='', lease_expires_at=None
+    )
+    return run
+
+
+def run_due_jobs(owner=None, now=None):
+    """Run every due job this instance can lease. Returns the JobRuns."""
+    owner = owner or instance_name()
+    return [
+        run_job(job, owner)
+        for job in list(JOBS.values())
+        if claim(job, owner, now)
+    ]
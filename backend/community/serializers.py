@@ -1,19 +1,100 @@
 from rest_framework import serializers
-from .models import Post, Comment, Like, KarmaTransaction
+from .models import Author, Post, Comment, PostLike, CommentLike
 
 
-class CommentSerializer(serializers.ModelSerializer):
+class SparseFieldsMixin:
+    """
+    Drops fields the client did not ask for (?fields= / ?exclude=).
+    The view puts the selected field names in context['sparse_fields'] keyed
+    by model, so nested serializers of other models keep all their fields.
+    Optional fields (Meta.optional_fields) are only present when selected.
+    """
+    
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        selected = self.context.get('sparse_fields', {}).get(self.Meta.model)
+        if selected is None:
+            selected = set(self.fields) - set(getattr(self.Meta, 'optional_fields', []))
+        for name in set(self.fields) - set(selected):
+            self.fields.pop(name)
+
+
+class AuthorNameField(serializers.CharField):
+    """
+    An Author foreign key exchanged as the author's name: renders the name
+    (select the author with the object) and validates names it receives.
+    Serializers intern the names on save (InternAuthorsMixin), so a request
+    that fails validation never creates an Author.
+    """
+    
+    def __init__(self, **kwargs):
+        kwargs.setdefault('max_length', Author._meta.get_field('name').max_length)
+        super().__init__(**kwargs)
+    
+    def to_representation(self, value):
+        return value.name
+
+
+class InternAuthorsMixin:
+    """
+    Swap the validated names of AuthorNameFields for interned Authors when
+    the serializer saves.
+    """
+    
+    def intern_authors(self, attrs):
+        for field in self.fields.values():
+            if isinstance(field, AuthorNameField) and isinstance(attrs.get(field.source), str):
+                attrs[field.source] = Author.intern(attrs[field.source])
+        return attrs
+    
+    def run_validators(self, value):
+        # Uniqueness validators compare the foreign key, so hand them existing
+        # Authors. An unknown name is not created: id 0 matches no rows, as
+        # that author has none to clash with
+        from .authors import author_id
+        value = dict(value)
+        for field in self.fields.values():
+            if isinstance(field, AuthorNameField) and isinstance(value.get(field.source), str):
+                name = value[field.source]
+                value[field.source] = Author(id=author_id(name, create=False) or 0, name=name)
+        super().run_validators(value)
+    
+    def create(self, validated_data):
+        return super().create(self.intern_authors(validated_data))
+    
+    def update(self, instance, validated_data):
+        return super().update(instance, self.intern_authors(validated_data))
+
+
+def _content_preview(obj, context):
+    """
+    Truncated content: the DB-side Substr annotation when the view added one,
+    otherwise truncated here (e.g. for a freshly created object).
+    """
+    if hasattr(obj, 'content_preview_annotated'):
+        return obj.content_preview_annotated
+    return obj.content[:context.get('content_preview_length', 0) or None]
+
+
+class CommentSerializer(InternAuthorsMixin, SparseFieldsMixin, serializers.ModelSerializer):
     """
     Recursive serializer for nested comments.
     Uses prefetch optimization to avoid N+1 queries.
     """
+    author = AuthorNameField()
     replies = serializers.SerializerMethodField()
+    content_preview = serializers.SerializerMethodField()
     
     class Meta:
         model = Comment
-        fields = ['id', 'post', 'parent', 'author', 'content', 'like_count', 
-                  'created_at', 'depth', 'replies']
-        read_only_fields = ['like_count', 'depth', 'created_at']
+        fields = ['id', 'post', 'parent', 'author', 'content', 'content_preview', 'like_count', 
+                  'created_at', 'depth', 'reply_count', 'descendant_count', 'replies']
+        read_only_fields = ['like_count', 'depth', 'created_at',
+                            'reply_count', 'descendant_count']
+        optional_fields = ['content_preview']
+    
+    def get_content_preview(self, obj):
+        return _content_preview(obj, self.context)
     
     def get_replies(self, obj):
         """
@@ -29,18 +110,51 @@ class CommentSerializer(serializers.ModelSerializer):
         return CommentSerializer(replies, many=True, context=self.context).data
 
 
-class PostSerializer(serializers.ModelSerializer):
+# Model columns for every CommentSerializer field except the nested replies,
+# for code that renders comments from value rows instead of instances
+COMMENT_FIELDS = [
+    name for name in CommentSerializer.Meta.fields
+    if name != 'replies' and name not in CommentSerializer.Meta.optional_fields
+]
+COMMENT_COLUMNS = [
+    f'{name}_id' if name in ('post', 'parent') else 'author__name' if name == 'author' else name
+    for name in COMMENT_FIELDS
+]
+
+_datetime_field = serializers.DateTimeField()
+
+
+def comment_row_data(row):
+    """
+    Serialize a Comment value row exactly like CommentSerializer, minus replies.
+    """
+    data = {}
+    for name, column in zip(COMMENT_FIELDS, COMMENT_COLUMNS):
+        value = row[column]
+        if name == 'created_at':
+            value = _datetime_field.to_representation(value)
+        data[name] = value
+    return data
+
+
+class PostSerializer(InternAuthorsMixin, SparseFieldsMixin, serializers.ModelSerializer):
     """
     Serializer for posts with optional comment tree inclusion.
     """
+    author = AuthorNameField()
     comments = serializers.SerializerMethodField()
     comment_count = serializers.SerializerMethodField()
+    content_preview = serializers.SerializerMethodField()
     
     class Meta:
         model = Post
-        fields = ['id', 'author', 'content', 'like_count', 'created_at', 
+        fields = ['id', 'author', 'content', 'content_preview', 'like_count', 'created_at', 
                   'updated_at', 'comments', 'comment_count']
         read_only_fields = ['like_count', 'created_at', 'updated_at']
+        optional_fields = ['content_preview']
+    
+    def get_content_preview(self, obj):
+        return _content_preview(obj, self.context)
     
     def get_comments(self, obj):
         """
@@ -51,6 +165,10 @@ class PostSerializer(serializers.ModelSerializer):
         if not self.context.get('include_comments', False):
             return []
         
+        # Already-serialized tree (from the comment tree cache or a batch fetch)
+        if hasattr(obj, '_comment_tree'):
+            return obj._comment_tree
+        
         # Get all comments for this post (prefetched)
         if hasattr(obj, '_prefetched_comments'):
             all_comments = list(obj._prefetched_comments)
@@ -81,13 +199,27 @@ class PostSerializer(serializers.ModelSerializer):
         return obj.comments.count()
 
 
-class LikeSerializer(serializers.ModelSerializer):
+class PostLikeSerializer(InternAuthorsMixin, serializers.ModelSerializer):
     """
-    Serializer for like actions.
+    Serializer for post likes.
     """
+    user = AuthorNameField()
+    
     class Meta:
-        model = Like
-        fields = ['id', 'user', 'content_type', 'object_id', 'created_at']
+        model = PostLike
+        fields = ['id', 'user', 'post', 'created_at']
+        read_only_fields = ['created_at']
+
+
+class CommentLikeSerializer(InternAuthorsMixin, serializers.ModelSerializer):
+    """
+    Serializer for comment likes.
+    """
+    user = AuthorNameField()
+    
+    class Meta:
+        model = CommentLike
+        fields = ['id', 'user', 'comment', 'created_at']
         read_only_fields = ['created_at']
 
 
@@ -98,3 +230,51 @@ class LeaderboardSerializer(serializers.Serializer):
     user = serializers.CharField()
     karma = serializers.IntegerField()
     rank = serializers.IntegerField()
+
+
+class ActivityTargetSerializer(serializers.Serializer):
+    """
+    Summary of a liked post or comment (post is the comment's post, null for posts).
+    """
+    id = serializers.IntegerField()
+    post = serializers.IntegerField(source='post_id', allow_null=True, default=None)
+    author = serializers.CharField(source='author__name')
+    content_preview = serializers.CharField()
+    like_count = serializers.IntegerField()
+    created_at = serializers.DateTimeField()
+
+
+class UserLikeSerializer(serializers.Serializer):
+    """
+    Serializer for an entry of a user's like history.
+    target is null when the liked post or comment no longer exists.
+    """
+    id = serializers.IntegerField()
+    target_type = serializers.CharField()
+    object_id = serializers.IntegerField()
+    created_at = serializers.DateTimeField()
+    target = ActivityTargetSerializer(allow_null=True)
+
+
+class KarmaHistorySerializer(serializers.Serializer):
+    """
+    Serializer for an entry of a user's karma history.
+    """
+    id = serializers.IntegerField()
+    points = serializers.IntegerField()
+    transaction_type = serializers.CharField()
+    target_type = serializers.CharField(allow_null=True)
+    object_id = serializers.IntegerField(allow_null=True)
+    created_at = serializers.DateTimeField()
+
+
+class UserProfileSerializer(serializers.Serializer):
+    """
+    Serializer for a user's profile built from maintained karma totals.
+    """
+    user = serializers.CharField()
+    karma = serializers.IntegerField()
+    post_like_karma = serializers.IntegerField()
+    comment_like_karma = serializers.IntegerField()
+    post_count = serializers.IntegerField()
+    comment_count = serializers.IntegerField()
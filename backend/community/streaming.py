@@ -0,0 +1,70 @@
+"""
+Incremental JSON rendering of a post's comment tree.
+
+Comments are read as plain rows in path order from a server-side cursor and
+written straight out as nested JSON. Path order is a depth-first walk of the
+tree, so the depth change between consecutive rows says how many "replies"
+arrays to close before the next comment opens. Only the current row and the
+output buffer are held in memory, however large the thread is.
+"""
+import json
+
+from rest_framework.utils.encoders import JSONEncoder
+
+from .models import Comment
+from .serializers import COMMENT_COLUMNS, comment_row_data
+
+
+FLUSH_BYTES = 64 * 1024
+
+
+def _dumps(value):
+    """Encode exactly like DRF's JSONRenderer (compact, unicode, DRF encoder)."""
+    return json.dumps(value, cls=JSONEncoder, ensure_ascii=False, separators=(',', ':'))
+
+
+def _open_comment(row):
+    """JSON for a comment up to and including the opening of its replies array."""
+    return _dumps(comment_row_data(row))[:-1] + ',"replies":['
+
+
+def stream_post_detail(post_data, comment_count, chunk_size=2000):
+    """
+    Yield the post detail JSON (same shape as PostSerializer with comments)
+    in chunks. post_data is the serialized post without its comment tree.
+    """
+    head = {key: value for key, value in post_data.items()
+            if key not in ('comments', 'comment_count')}
+    parts = [_dumps(head)[:-1], ',"comments":[']
+    size = 0
+
+    rows = (
+        Comment.objects
+        .filter(post_id=post_data['id'])
+        .order_by('path')
+        .values(*COMMENT_COLUMNS)
+        .iterator(chunk_size=chunk_size)
+    )
+
+    previous_depth = None
+    for row in rows:
+        depth = row['depth']
+        if previous_depth is None or depth > previous_depth:
+            # First comment, or first reply inside the previous comment
+            chunk = _open_comment(row)
+        else:
+            # Close the previous comment and any finished ancestors, then add a sibling
+            chunk = ']}' * (previous_depth - depth + 1) + ',' + _open_comment(row)
+        previous_depth = depth
+
+        parts.append(chunk)
+        size += len(chunk)
+        if size >= FLUSH_BYTES:
+            yield ''.join(parts)
+            parts = []
+            size = 0
+
+    if previous_depth is not None:
+        parts.append(']}' * (previous_depth + 1))
+    parts.append(f'],"comment_count":{comment_count}}}')
+    yield ''.join(parts)
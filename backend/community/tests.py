@@ -1,37 +1,116 @@
-from django.test import TestCase
+from unittest import skipUnless
+
+from django.db import connection
+from django.test import TestCase, override_settings
 from django.utils import timezone
 from datetime import timedelta
-from django.contrib.contenttypes.models import ContentType
 
-from .models import Post, Comment, Like, KarmaTransaction
+from .models import Author, Post, Comment, PostLike, CommentLike, LikeEvent, KarmaTransaction, LeaderboardEntry
 
 
 class PostModelTest(TestCase):
     def setUp(self):
         self.post = Post.objects.create(
-            author='testuser',
+            author=Author.intern('testuser'),
             content='Test post content'
         )
     
     def test_post_creation(self):
         """Test that a post is created correctly"""
-        self.assertEqual(self.post.author, 'testuser')
+        self.assertEqual(self.post.author.name, 'testuser')
         self.assertEqual(self.post.content, 'Test post content')
         self.assertEqual(self.post.like_count, 0)
     
     def test_post_ordering(self):
         """Test that posts are ordered by created_at descending"""
-        post1 = Post.objects.create(author='user1', content='First')
-        post2 = Post.objects.create(author='user2', content='Second')
+        post1 = Post.objects.create(author=Author.intern('user1'), content='First')
+        post2 = Post.objects.create(author=Author.intern('user2'), content='Second')
         posts = list(Post.objects.all())
         self.assertEqual(posts[0], post2)
         self.assertEqual(posts[1], post1)
 
 
+class AuthorInterningTest(TestCase):
+    """
+    Test the name -> id interning cache and the name-based API around it.
+    """
+    def setUp(self):
+        from rest_framework.test import APIClient
+        from . import authors
+        self.client = APIClient()
+        self.addCleanup(authors.clear_cache)
+    
+    def test_committed_names_are_served_from_cache(self):
+        """Test that a name costs no query once the transaction that interned it commits"""
+        from . import authors
+        with self.captureOnCommitCallbacks(execute=True):
+            alice = authors.author_id('alice')
+        
+        with self.assertNumQueries(0):
+            self.assertEqual(authors.author_id('alice'), alice)
+        self.assertEqual(Author.objects.get(name='alice').id, alice)
+        self.assertEqual(Author.intern('alice').id, alice)
+    
+    def test_rolled_back_names_are_not_cached(self):
+        """Test that an id from a rolled-back insert never reaches the cache"""
+        from django.db import transaction
+        from . import authors
+        with self.captureOnCommitCallbacks(execute=True):
+            try:
+                with transaction.atomic():
+                    authors.author_id('ghost')
+                    raise RuntimeError
+            except RuntimeError:
+                pass
+        
+        self.assertFalse(Author.objects.filter(name='ghost').exists())
+        with self.assertNumQueries(1):
+            self.assertIsNone(authors.author_id('ghost', create=False))
+    
+    def test_api_speaks_names(self):
+        """Test that posts and comments are created and listed by author name"""
+        response = self.client.post('/api/posts/', {'author': 'alice', 'content': 'Hi'}, format='json')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.data['author'], 'alice')
+        post_id = response.data['id']
+        self.client.post('/api/comments/', {'post': post_id, 'author': 'alice', 'content': 'Me again'},
+                         format='json')
+        
+        self.assertEqual(Author.objects.filter(name='alice').count(), 1)
+        self.assertEqual(self.client.get('/api/posts/').data['results'][0]['author'], 'alice')
+        comments = self.client.get(f'/api/comments/?post={post_id}').data['results']
+        self.assertEqual(comments[0]['author'], 'alice')
+        
+        response = self.client.post('/api/posts/', {'author': 'x' * 256, 'content': 'Hi'}, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(Author.objects.filter(name='x' * 256).exists())
+    
+    def test_invalid_request_creates_no_author(self):
+        """Test that a name is only interned once the request has validated"""
+        response = self.client.post('/api/posts/', {'author': 'mallory'}, format='json')
+        self.assertEqual(response.status_code, 400)
+        response = self.client.post('/api/comments/', {'post': 999999, 'author': 'mallory', 'content': 'Hi'},
+                                    format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(Author.objects.filter(name='mallory').exists())
+    
+    def test_like_serializer_checks_uniqueness_by_name(self):
+        """Test that the unique (post, user) check resolves names without creating them"""
+        from .serializers import PostLikeSerializer
+        post = Post.objects.create(author=Author.intern('alice'), content='Hi')
+        PostLike.objects.create(post=post, user=Author.intern('bob'))
+        
+        self.assertFalse(PostLikeSerializer(data={'post': post.id, 'user': 'bob'}).is_valid())
+        serializer = PostLikeSerializer(data={'post': post.id, 'user': 'carol'})
+        self.assertTrue(serializer.is_valid())
+        self.assertFalse(Author.objects.filter(name='carol').exists())
+        self.assertEqual(serializer.save().user.name, 'carol')
+
+
 class CommentModelTest(TestCase):
     def setUp(self):
         self.post = Post.objects.create(
-            author='testuser',
+            author=Author.intern('testuser'),
             content='Test post'
         )
     
@@ -39,7 +118,7 @@ class CommentModelTest(TestCase):
         """Test creating a root-level comment"""
         comment = Comment.objects.create(
             post=self.post,
-            author='commenter',
+            author=Author.intern('commenter'),
             content='Test comment'
         )
         self.assertEqual(comment.depth, 0)
@@ -50,14 +129,14 @@ class CommentModelTest(TestCase):
         """Test creating nested comments"""
         parent = Comment.objects.create(
             post=self.post,
-            author='user1',
+            author=Author.intern('user1'),
             content='Parent comment'
         )
         
         child = Comment.objects.create(
             post=self.post,
             parent=parent,
-            author='user2',
+            author=Author.intern('user2'),
             content='Child comment'
         )
         
@@ -69,27 +148,28 @@ class CommentModelTest(TestCase):
 class LikeTest(TestCase):
     def setUp(self):
         self.post = Post.objects.create(
-            author='author',
+            author=Author.intern('author'),
             content='Test post'
         )
-        self.content_type = ContentType.objects.get_for_model(Post)
     
     def test_unique_like_constraint(self):
         """Test that a user cannot like the same post twice"""
-        Like.objects.create(
-            user='user1',
-            content_type=self.content_type,
-            object_id=self.post.id
-        )
+        PostLike.objects.create(user=Author.intern('user1'), post=self.post)
         
         # Try to create duplicate like
         from django.db import IntegrityError
         with self.assertRaises(IntegrityError):
-            Like.objects.create(
-                user='user1',
-                content_type=self.content_type,
-                object_id=self.post.id
-            )
+            PostLike.objects.create(user=Author.intern('user1'), post=self.post)
+    
+    def test_likes_cascade_with_target(self):
+        """Test that deleting a post deletes its likes and its comments' likes"""
+        comment = Comment.objects.create(post=self.post, author=Author.intern('author'), content='Comment')
+        PostLike.objects.create(user=Author.intern('user1'), post=self.post)
+        CommentLike.objects.create(user=Author.intern('user1'), comment=comment)
+        
+        self.post.delete()
+        self.assertFalse(PostLike.objects.exists())
+        self.assertFalse(CommentLike.objects.exists())
     
     def test_api_prevents_double_like(self):
         """
@@ -121,12 +201,8 @@ class LikeTest(TestCase):
         self.post.refresh_from_db()
         self.assertEqual(self.post.like_count, 1)
         
-        # Verify only one Like object exists
-        like_count = Like.objects.filter(
-            user='user1',
-            content_type=self.content_type,
-            object_id=self.post.id
-        ).count()
+        # Verify only one like exists
+        like_count = PostLike.objects.filter(user__name='user1', post=self.post).count()
         self.assertEqual(like_count, 1)
     
     def test_comment_double_like_prevention(self):
@@ -136,10 +212,9 @@ class LikeTest(TestCase):
         
         comment = Comment.objects.create(
             post=self.post,
-            author='author',
+            author=Author.intern('author'),
             content='Test comment'
         )
-        comment_content_type = ContentType.objects.get_for_model(Comment)
         
         # First like succeeds
         response1 = client.post(
@@ -158,12 +233,8 @@ class LikeTest(TestCase):
         self.assertEqual(response2.status_code, 400)
         self.assertIn('already liked', response2.data['error'])
         
-        # Verify only one Like exists
-        like_count = Like.objects.filter(
-            user='user1',
-            content_type=comment_content_type,
-            object_id=comment.id
-        ).count()
+        # Verify only one like exists
+        like_count = CommentLike.objects.filter(user__name='user1', comment=comment).count()
         self.assertEqual(like_count, 1)
 
 
@@ -171,14 +242,14 @@ class LeaderboardTest(TestCase):
     def setUp(self):
         """Create test data for leaderboard"""
         # Create posts
-        self.post1 = Post.objects.create(author='alice', content='Post 1')
-        self.post2 = Post.objects.create(author='bob', content='Post 2')
-        self.post3 = Post.objects.create(author='charlie', content='Post 3')
+        self.post1 = Post.objects.create(author=Author.intern('alice'), content='Post 1')
+        self.post2 = Post.objects.create(author=Author.intern('bob'), content='Post 2')
+        self.post3 = Post.objects.create(author=Author.intern('charlie'), content='Post 3')
         
         # Create comments
         self.comment1 = Comment.objects.create(
             post=self.post1,
-            author='bob',
+            author=Author.intern('bob'),
             content='Comment 1'
         )
     
@@ -192,13 +263,13 @@ class LeaderboardTest(TestCase):
         
         # Alice gets 2 post likes (10 karma)
         KarmaTransaction.objects.create(
-            user='alice',
+            user=Author.intern('alice'),
             points=5,
             transaction_type=KarmaTransaction.POST_LIKE,
             created_at=now - timedelta(hours=1)
         )
         KarmaTransaction.objects.create(
-            user='alice',
+            user=Author.intern('alice'),
             points=5,
             transaction_type=KarmaTransaction.POST_LIKE,
             created_at=now - timedelta(hours=2)
@@ -206,25 +277,25 @@ class LeaderboardTest(TestCase):
         
         # Bob gets 1 post like (5 karma) and 3 comment likes (3 karma) = 8 karma
         KarmaTransaction.objects.create(
-            user='bob',
+            user=Author.intern('bob'),
             points=5,
             transaction_type=KarmaTransaction.POST_LIKE,
             created_at=now - timedelta(hours=5)
         )
         KarmaTransaction.objects.create(
-            user='bob',
+            user=Author.intern('bob'),
             points=1,
             transaction_type=KarmaTransaction.COMMENT_LIKE,
             created_at=now - timedelta(hours=6)
         )
         KarmaTransaction.objects.create(
-            user='bob',
+            user=Author.intern('bob'),
             points=1,
             transaction_type=KarmaTransaction.COMMENT_LIKE,
             created_at=now - timedelta(hours=7)
         )
         KarmaTransaction.objects.create(
-            user='bob',
+            user=Author.intern('bob'),
             points=1,
             transaction_type=KarmaTransaction.COMMENT_LIKE,
             created_at=now - timedelta(hours=8)
@@ -232,13 +303,13 @@ class LeaderboardTest(TestCase):
         
         # Charlie gets karma but it's older than 24 hours (should not count)
         KarmaTransaction.objects.create(
-            user='charlie',
+            user=Author.intern('charlie'),
             points=5,
             transaction_type=KarmaTransaction.POST_LIKE,
             created_at=now - timedelta(hours=25)
         )
         KarmaTransaction.objects.create(
-            user='charlie',
+            user=Author.intern('charlie'),
             points=5,
             transaction_type=KarmaTransaction.POST_LIKE,
             created_at=now - timedelta(hours=30)
@@ -252,7 +323,7 @@ class LeaderboardTest(TestCase):
         leaderboard = (
             KarmaTransaction.objects
             .filter(created_at__gte=twenty_four_hours_ago)
-            .values('user')
+            .values('user__name')
             .annotate(karma=Sum('points'))
             .order_by('-karma')
         )
@@ -261,13 +332,13 @@ class LeaderboardTest(TestCase):
         
         # Assertions
         self.assertEqual(len(leaderboard_list), 2)  # Only alice and bob
-        self.assertEqual(leaderboard_list[0]['user'], 'alice')
+        self.assertEqual(leaderboard_list[0]['user__name'], 'alice')
         self.assertEqual(leaderboard_list[0]['karma'], 10)
-        self.assertEqual(leaderboard_list[1]['user'], 'bob')
+        self.assertEqual(leaderboard_list[1]['user__name'], 'bob')
         self.assertEqual(leaderboard_list[1]['karma'], 8)
         
         # Charlie should not appear (transactions too old)
-        charlie_in_leaderboard = any(entry['user'] == 'charlie' for entry in leaderboard_list)
+        charlie_in_leaderboard = any(entry['user__name'] == 'charlie' for entry in leaderboard_list)
         self.assertFalse(charlie_in_leaderboard)
     
     def test_leaderboard_with_unlikes(self):
@@ -276,19 +347,19 @@ class LeaderboardTest(TestCase):
         
         # User gets karma then loses some
         KarmaTransaction.objects.create(
-            user='alice',
+            user=Author.intern('alice'),
             points=5,
             transaction_type=KarmaTransaction.POST_LIKE,
             created_at=now - timedelta(hours=1)
         )
         KarmaTransaction.objects.create(
-            user='alice',
+            user=Author.intern('alice'),
             points=5,
             transaction_type=KarmaTransaction.POST_LIKE,
             created_at=now - timedelta(hours=2)
         )
         KarmaTransaction.objects.create(
-            user='alice',
+            user=Author.intern('alice'),
             points=-5,  # Unlike
             transaction_type=KarmaTransaction.POST_LIKE,
             created_at=now - timedelta(hours=3)
@@ -300,13 +371,13 @@ class LeaderboardTest(TestCase):
         leaderboard = (
             KarmaTransaction.objects
             .filter(created_at__gte=twenty_four_hours_ago)
-            .values('user')
+            .values('user__name')
             .annotate(karma=Sum('points'))
             .order_by('-karma')
         )
         
         alice_karma = list(leaderboard)[0]
-        self.assertEqual(alice_karma['user'], 'alice')
+        self.assertEqual(alice_karma['user__name'], 'alice')
         self.assertEqual(alice_karma['karma'], 5)  # 5 + 5 - 5 = 5
 
 
@@ -317,19 +388,19 @@ class CommentTreeQueryTest(TestCase):
     """
     def setUp(self):
         self.post = Post.objects.create(
-            author='author',
+            author=Author.intern('author'),
             content='Test post'
         )
         
         # Create a tree of comments
         self.root1 = Comment.objects.create(
             post=self.post,
-            author='user1',
+            author=Author.intern('user1'),
             content='Root 1'
         )
         self.root2 = Comment.objects.create(
             post=self.post,
-            author='user2',
+            author=Author.intern('user2'),
             content='Root 2'
         )
         
@@ -337,13 +408,13 @@ class CommentTreeQueryTest(TestCase):
         self.child1 = Comment.objects.create(
             post=self.post,
             parent=self.root1,
-            author='user3',
+            author=Author.intern('user3'),
             content='Child 1'
         )
         self.child2 = Comment.objects.create(
             post=self.post,
             parent=self.root1,
-            author='user4',
+            author=Author.intern('user4'),
             content='Child 2'
         )
         
@@ -351,7 +422,7 @@ class CommentTreeQueryTest(TestCase):
         self.grandchild = Comment.objects.create(
             post=self.post,
             parent=self.child1,
-            author='user5',
+            author=Author.intern('user5'),
             content='Grandchild'
         )
     
@@ -374,3 +445,1576 @@ class CommentTreeQueryTest(TestCase):
         # Verify path-based ordering
         self.assertEqual(comments[0], self.root1)
         self.assertTrue(comments[1] in [self.child1, self.child2])
+
+
+class CommentCounterTest(TestCase):
+    """
+    Test that reply_count / descendant_count are maintained on insert and delete.
+    """
+    def setUp(self):
+        from django.core.cache import cache
+        cache.clear()
+        self.post = Post.objects.create(author=Author.intern('author'), content='Test post')
+        self.root = Comment.objects.create(post=self.post, author=Author.intern('user1'), content='Root')
+        self.child1 = Comment.objects.create(
+            post=self.post, parent=self.root, author=Author.intern('user2'), content='Child 1'
+        )
+        self.child2 = Comment.objects.create(
+            post=self.post, parent=self.root, author=Author.intern('user3'), content='Child 2'
+        )
+        self.grandchild = Comment.objects.create(
+            post=self.post, parent=self.child1, author=Author.intern('user4'), content='Grandchild'
+        )
+    
+    def test_counts_on_insert(self):
+        """Test that every ancestor is updated when a reply is added"""
+        self.root.refresh_from_db()
+        self.child1.refresh_from_db()
+        self.assertEqual(self.root.reply_count, 2)
+        self.assertEqual(self.root.descendant_count, 3)
+        self.assertEqual(self.child1.reply_count, 1)
+        self.assertEqual(self.child1.descendant_count, 1)
+        self.assertEqual(self.grandchild.reply_count, 0)
+    
+    def test_ancestors_updated_in_one_query(self):
+        """Test that inserting a reply touches ancestors with a single UPDATE"""
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+        
+        with CaptureQueriesContext(connection) as context:
+            Comment.objects.create(
+                post=self.post, parent=self.grandchild, author=Author.intern('user5'), content='Deep'
+            )
+        
+        ancestor_updates = [
+            q for q in context.captured_queries if 'descendant_count" = (' in q['sql']
+        ]
+        self.assertEqual(len(ancestor_updates), 1)
+        self.root.refresh_from_db()
+        self.assertEqual(self.root.descendant_count, 4)
+    
+    def test_counts_on_subtree_delete(self):
+        """Test that deleting a comment removes its whole subtree from ancestor counts"""
+        self.child1.delete()
+        self.root.refresh_from_db()
+        self.assertEqual(self.root.reply_count, 1)
+        self.assertEqual(self.root.descendant_count, 1)
+    
+    def test_counts_exposed_in_api(self):
+        """Test that the post detail tree carries the counters"""
+        from rest_framework.test import APIClient
+        response = APIClient().get(f'/api/posts/{self.post.id}/')
+        root = response.data['comments'][0]
+        self.assertEqual(root['reply_count'], 2)
+        self.assertEqual(root['descendant_count'], 3)
+
+
+class HotFeedTest(TestCase):
+    """
+    Test the stored hot score and the ?sort=hot feed.
+    """
+    def setUp(self):
+        from rest_framework.test import APIClient
+        self.client = APIClient()
+        now = timezone.now()
+        self.old = Post.objects.create(author=Author.intern('alice'), content='Old but popular')
+        self.new = Post.objects.create(author=Author.intern('bob'), content='New and quiet')
+        Post.objects.filter(pk=self.old.pk).update(created_at=now - timedelta(hours=3))
+        Post.refresh_hot_score(self.old.pk)
+    
+    def test_like_and_comment_refresh_score(self):
+        """Test that likes and comments update the stored score incrementally"""
+        self.old.refresh_from_db()
+        initial = self.old.hot_score
+        
+        self.client.post(f'/api/posts/{self.old.id}/like/', {'user': 'u1'}, format='json')
+        self.old.refresh_from_db()
+        liked = self.old.hot_score
+        self.assertGreater(liked, initial)
+        
+        Comment.objects.create(post=self.old, author=Author.intern('u2'), content='Nice')
+        self.old.refresh_from_db()
+        self.assertGreater(self.old.hot_score, liked)
+    
+    def test_hot_sort_with_keyset_pages(self):
+        """Test that ?sort=hot orders by score and paginates with a cursor"""
+        for user in ['u1', 'u2', 'u3', 'u4', 'u5', 'u6']:
+            self.client.post(f'/api/posts/{self.old.id}/like/', {'user': user}, format='json')
+        
+        response = self.client.get('/api/posts/?sort=hot')
+        self.assertEqual(response.status_code, 200)
+        ids = [p['id'] for p in response.data['results']]
+        self.assertEqual(ids, [self.old.id, self.new.id])
+        self.assertIn('next', response.data)
+        self.assertNotIn('count', response.data)
+    
+    def test_decay_command_rescores_posts(self):
+        """Test that the batch decay command lowers scores as posts age"""
+        from django.core.management import call_command
+        from io import StringIO
+        
+        self.new.refresh_from_db()
+        before = self.new.hot_score
+        Post.objects.filter(pk=self.new.pk).update(
+            created_at=timezone.now() - timedelta(days=2)
+        )
+        call_command('decay_hot_scores', batch_size=1, stdout=StringIO())
+        self.new.refresh_from_db()
+        self.assertLess(self.new.hot_score, before)
+
+
+class UserKarmaTest(TestCase):
+    """
+    Test the maintained UserKarma totals and the /users/{name}/ profile.
+    """
+    def setUp(self):
+        from rest_framework.test import APIClient
+        self.client = APIClient()
+        self.post = Post.objects.create(author=Author.intern('alice'), content='Post')
+        self.comment = Comment.objects.create(post=self.post, author=Author.intern('alice'), content='Comment')
+    
+    def test_totals_follow_likes_and_unlikes(self):
+        """Test that like/unlike keep the aggregate row in step"""
+        from .models import UserKarma
+        self.client.post(f'/api/posts/{self.post.id}/like/', {'user': 'u1'}, format='json')
+        self.client.post(f'/api/posts/{self.post.id}/like/', {'user': 'u2'}, format='json')
+        self.client.post(f'/api/comments/{self.comment.id}/like/', {'user': 'u1'}, format='json')
+        self.client.post(f'/api/posts/{self.post.id}/unlike/', {'user': 'u2'}, format='json')
+        
+        totals = UserKarma.objects.get(user__name='alice')
+        self.assertEqual(totals.karma, 6)
+        self.assertEqual(totals.post_like_karma, 5)
+        self.assertEqual(totals.comment_like_karma, 1)
+    
+    def test_profile_endpoint_single_query(self):
+        """Test that the profile is answered in one query"""
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+        self.client.post(f'/api/posts/{self.post.id}/like/', {'user': 'u1'}, format='json')
+        
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get('/api/users/alice/')
+        
+        self.assertEqual(len(context.captured_queries), 1)
+        self.assertEqual(response.data['karma'], 5)
+        self.assertEqual(response.data['post_count'], 1)
+        self.assertEqual(response.data['comment_count'], 1)
+    
+    def test_profile_unknown_user(self):
+        """Test that users with no activity return 404"""
+        response = self.client.get('/api/users/nobody/')
+        self.assertEqual(response.status_code, 404)
+    
+    def test_rebuild_command_matches_history(self):
+        """Test that the rebuild command recomputes totals from transactions"""
+        from django.core.management import call_command
+        from io import StringIO
+        from .models import UserKarma
+        
+        KarmaTransaction.objects.create(
+            user=Author.intern('bob'), points=5, transaction_type=KarmaTransaction.POST_LIKE
+        )
+        KarmaTransaction.objects.create(
+            user=Author.intern('bob'), points=1, transaction_type=KarmaTransaction.COMMENT_LIKE
+        )
+        call_command('rebuild_user_karma', stdout=StringIO())
+        
+        totals = UserKarma.objects.get(user__name='bob')
+        self.assertEqual(totals.karma, 6)
+        self.assertEqual(totals.post_like_karma, 5)
+        self.assertEqual(totals.comment_like_karma, 1)
+
+
+
+class UserActivityTest(TestCase):
+    """
+    Test the /users/{name}/likes/ and /users/{name}/karma/ history endpoints.
+    """
+    def setUp(self):
+        from rest_framework.test import APIClient
+        self.client = APIClient()
+        self.posts = [Post.objects.create(author=Author.intern('alice'), content=f'Post {i} ' * 50) for i in range(3)]
+        self.comment = Comment.objects.create(post=self.posts[0], author=Author.intern('bob'), content='Comment')
+        for post in self.posts:
+            self.client.post(f'/api/posts/{post.id}/like/', {'user': 'u1'}, format='json')
+        self.client.post(f'/api/comments/{self.comment.id}/like/', {'user': 'u1'}, format='json')
+    
+    def test_likes_newest_first_with_targets(self):
+        """Test that likes list newest first with bulk-loaded post and comment summaries"""
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get('/api/users/u1/likes/')
+        self.assertEqual(response.status_code, 200)
+        # The page from each like table, then one query per target type
+        self.assertEqual(len(context.captured_queries), 4)
+        
+        results = response.data['results']
+        self.assertEqual([r['target_type'] for r in results], ['comment', 'post', 'post', 'post'])
+        self.assertEqual(results[0]['target']['post'], self.posts[0].id)
+        self.assertEqual(results[1]['target']['id'], self.posts[2].id)
+        self.assertIsNone(results[1]['target']['post'])
+        self.assertEqual(results[1]['target']['like_count'], 1)
+        self.assertEqual(len(results[1]['target']['content_preview']), 200)
+    
+    def test_deleted_target_drops_like(self):
+        """Test that the likes of a deleted post leave the history with it"""
+        Post.objects.filter(pk=self.posts[2].pk).delete()
+        results = self.client.get('/api/users/u1/likes/').data['results']
+        self.assertEqual([r['object_id'] for r in results], [self.comment.id, self.posts[1].id, self.posts[0].id])
+    
+    def test_keyset_pages_do_not_overlap(self):
+        """Test that following next walks every like once, including created_at ties"""
+        now = timezone.now()
+        PostLike.objects.filter(user__name='u1').update(created_at=now)
+        CommentLike.objects.filter(user__name='u1').update(created_at=now)
+        
+        from unittest import mock
+        from .pagination import ActivityPagination
+        
+        seen = []
+        url = '/api/users/u1/likes/'
+        with mock.patch.object(ActivityPagination, 'page_size', 3):
+            while url:
+                response = self.client.get(url)
+                seen += [(r['target_type'], r['id']) for r in response.data['results']]
+                url = response.data['next']
+        expected = [('post', pk) for pk in PostLike.objects.values_list('id', flat=True)]
+        expected += [('comment', pk) for pk in CommentLike.objects.values_list('id', flat=True)]
+        self.assertEqual(len(seen), 4)
+        self.assertEqual(set(seen), set(expected))
+    
+    def test_karma_history(self):
+        """Test that karma history lists the user's transactions newest first"""
+        response = self.client.get('/api/users/alice/karma/')
+        self.assertEqual(response.status_code, 200)
+        results = response.data['results']
+        self.assertEqual(len(results), 3)
+        self.assertEqual(results[0]['points'], 5)
+        self.assertEqual(results[0]['target_type'], 'post')
+        self.assertEqual(results[0]['object_id'], self.posts[2].id)
+        self.assertEqual(self.client.get('/api/users/nobody/karma/').data['results'], [])
+
+class WindowedLeaderboardTest(TestCase):
+    """
+    Test the multi-window leaderboards served from precomputed entries.
+    """
+    def setUp(self):
+        from rest_framework.test import APIClient
+        self.client = APIClient()
+    
+    def _history(self, user, points, age):
+        KarmaTransaction.objects.create(
+            user=Author.intern(user),
+            points=points,
+            transaction_type=KarmaTransaction.POST_LIKE,
+            created_at=timezone.now() - age
+        )
+    
+    def test_windows_from_rebuilt_history(self):
+        """Test that each window only counts karma inside it"""
+        from django.core.management import call_command
+        from io import StringIO
+        
+        self._history('alice', 5, timedelta(minutes=20))
+        self._history('bob', 5, timedelta(hours=5))
+        self._history('bob', 5, timedelta(hours=6))
+        self._history('charlie', 50, timedelta(days=3))
+        self._history('diana', 100, timedelta(days=30))
+        call_command('refresh_leaderboard', rebuild=True, stdout=StringIO())
+        
+        def board(window):
+            response = self.client.get(f'/api/leaderboard/?window={window}&limit=10')
+            return [(e['user'], e['karma']) for e in response.data]
+        
+        self.assertEqual(board('1h'), [('alice', 5)])
+        self.assertEqual(board('24h'), [('bob', 10), ('alice', 5)])
+        self.assertEqual(board('7d'), [('charlie', 50), ('bob', 10), ('alice', 5)])
+        self.assertEqual(board('all')[0], ('diana', 100))
+    
+    def test_all_time_read_builds_missing_history(self):
+        """Test that the all-time board is built from history the first time it is read"""
+        from .models import LeaderboardWindow
+        self._history('diana', 100, timedelta(days=30))
+        # As on a database migrated past 0006 before it built the boards
+        LeaderboardWindow.objects.all().delete()
+        
+        response = self.client.get('/api/leaderboard/?window=all')
+        self.assertEqual([(e['user'], e['karma']) for e in response.data], [('diana', 100)])
+        self.assertEqual(self.client.get('/api/leaderboard/rank/?user=diana&window=all').status_code, 200)
+    
+    def test_likes_update_all_windows_and_expire(self):
+        """Test that a like lands in every window and ages out incrementally"""
+        post = Post.objects.create(author=Author.intern('alice'), content='Post')
+        self.client.post(f'/api/posts/{post.id}/like/', {'user': 'u1'}, format='json')
+        
+        for window in LeaderboardEntry.WINDOWS:
+            response = self.client.get(f'/api/leaderboard/?window={window}')
+            self.assertEqual(response.data[0]['user'], 'alice')
+            self.assertEqual(response.data[0]['karma'], 5)
+        
+        later = timezone.now() + timedelta(hours=2)
+        LeaderboardEntry.expire('1h', now=later)
+        LeaderboardEntry.expire('24h', now=later)
+        self.assertFalse(LeaderboardEntry.objects.filter(window='1h').exists())
+        self.assertEqual(LeaderboardEntry.objects.get(window='24h', user='alice').karma, 5)
+    
+    def test_limit_and_window_validation(self):
+        """Test the limit parameter and rejection of unknown windows"""
+        for i in range(7):
+            self._history(f'user{i}', i + 1, timedelta(minutes=1))
+        LeaderboardEntry.rebuild()
+        
+        self.assertEqual(len(self.client.get('/api/leaderboard/').data), 5)
+        self.assertEqual(len(self.client.get('/api/leaderboard/?limit=3').data), 3)
+        self.assertEqual(self.client.get('/api/leaderboard/?window=2d').status_code, 400)
+        self.assertEqual(self.client.get('/api/leaderboard/?limit=0').status_code, 400)
+    
+    def test_leaderboard_read_is_constant_queries(self):
+        """Test that a board read does not aggregate karma history"""
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+        for i in range(20):
+            self._history(f'user{i}', i, timedelta(minutes=1))
+        LeaderboardEntry.rebuild()
+        
+        with CaptureQueriesContext(connection) as context:
+            self.client.get('/api/leaderboard/?window=24h&limit=10')
+        self.assertEqual(len(context.captured_queries), 2)
+        self.assertFalse(any('karmatransaction' in q['sql'] for q in context.captured_queries))
+
+
+class LeaderboardRankTest(TestCase):
+    """
+    Test rank lookup for an arbitrary user.
+    """
+    def setUp(self):
+        from rest_framework.test import APIClient
+        self.client = APIClient()
+        karma = {'alice': 50, 'bob': 30, 'carol': 30, 'dave': 20, 'erin': 10, 'frank': 5}
+        for user, points in karma.items():
+            KarmaTransaction.objects.create(
+                user=Author.intern(user), points=points, transaction_type=KarmaTransaction.POST_LIKE
+            )
+        LeaderboardEntry.rebuild()
+    
+    def test_dense_rank_with_neighbors(self):
+        """Test dense ranking, tie-breaking by name and neighbor ranks"""
+        response = self.client.get('/api/leaderboard/rank/?user=dave&neighbors=2')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['rank'], 3)
+        self.assertEqual(response.data['karma'], 20)
+        self.assertEqual(
+            [(e['user'], e['rank']) for e in response.data['above']],
+            [('bob', 2), ('carol', 2)]
+        )
+        self.assertEqual(
+            [(e['user'], e['rank']) for e in response.data['below']],
+            [('erin', 4), ('frank', 5)]
+        )
+    
+    def test_tied_users(self):
+        """Test that tied users share a rank and are ordered by name"""
+        response = self.client.get('/api/leaderboard/rank/?user=carol&neighbors=1')
+        self.assertEqual(response.data['rank'], 2)
+        self.assertEqual(response.data['above'][0]['user'], 'bob')
+        self.assertEqual(response.data['above'][0]['rank'], 2)
+        self.assertEqual(response.data['below'][0]['user'], 'dave')
+        
+        top = self.client.get('/api/leaderboard/?limit=3').data
+        self.assertEqual([(e['user'], e['rank']) for e in top],
+                         [('alice', 1), ('bob', 2), ('carol', 2)])
+    
+    def test_rank_and_position_follow_likes_and_expiry(self):
+        """Test that the maintained karma counts match the entries after likes, unlikes and expiry"""
+        from .models import LeaderboardKarmaCount
+        post = Post.objects.create(author=Author.intern('frank'), content='Post')
+        for i in range(5):
+            self.client.post(f'/api/posts/{post.id}/like/', {'user': f'u{i}'}, format='json')
+        
+        response = self.client.get('/api/leaderboard/rank/?user=frank&window=all')
+        # 30 karma, tied with bob and carol behind alice
+        self.assertEqual((response.data['rank'], response.data['position']), (2, 4))
+        self.assertEqual(self.client.get('/api/leaderboard/rank/?user=bob&window=all').data['position'], 2)
+        
+        self.client.post(f'/api/posts/{post.id}/unlike/', {'user': 'u0'}, format='json')
+        LeaderboardEntry.expire('24h', now=timezone.now() + timedelta(days=2))
+        LeaderboardEntry.refresh()
+        for window in LeaderboardEntry.WINDOWS:
+            entries = LeaderboardEntry.objects.filter(window=window)
+            counted = dict(
+                LeaderboardKarmaCount.objects.filter(window=window).values_list('karma', 'users')
+            )
+            expected = {}
+            for karma in entries.values_list('karma', flat=True):
+                expected[karma] = expected.get(karma, 0) + 1
+            self.assertEqual(counted, expected, window)
+        self.assertEqual(self.client.get('/api/leaderboard/rank/?user=frank&window=all').data['rank'], 3)
+    
+    def test_expiry_reads_karma_from_its_update(self):
+        """Test that expiry moves the karma counts by what its UPDATE returned, with no separate read"""
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+        from .models import LeaderboardKarmaCount
+        post = Post.objects.create(author=Author.intern('frank'), content='Post')
+        self.client.post(f'/api/posts/{post.id}/like/', {'user': 'u0'}, format='json')
+        
+        with CaptureQueriesContext(connection) as context:
+            LeaderboardEntry.expire('24h', now=timezone.now() + timedelta(days=2))
+        table = connection.ops.quote_name(LeaderboardEntry._meta.db_table)
+        reads = [q['sql'] for q in context.captured_queries if q['sql'].startswith('SELECT') and table in q['sql']]
+        self.assertEqual(reads, [])
+        self.assertFalse(LeaderboardEntry.objects.filter(window='24h').exists())
+        self.assertEqual(
+            list(LeaderboardKarmaCount.objects.filter(window='24h', users__gt=0).values_list('karma', 'users')), []
+        )
+    
+    def test_rank_lookup_errors(self):
+        """Test missing and unknown users"""
+        self.assertEqual(self.client.get('/api/leaderboard/rank/').status_code, 400)
+        self.assertEqual(
+            self.client.get('/api/leaderboard/rank/?user=nobody').status_code, 404
+        )
+
+
+class LikeWritePathTest(TestCase):
+    """
+    Test the upsert/RETURNING like path.
+    """
+    def setUp(self):
+        from rest_framework.test import APIClient
+        from . import authors
+        self.client = APIClient()
+        self.post = Post.objects.create(author=Author.intern('alice'), content='Post')
+        # Known likers, as in a warmed-up worker
+        self.addCleanup(authors.clear_cache)
+        with self.captureOnCommitCallbacks(execute=True):
+            authors.author_ids(['u0', 'u1'])
+    
+    def test_like_issues_no_selects(self):
+        """Test that liking never loads the post and touches each table once"""
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+        # First karma for the author creates the aggregate rows; measure the steady state
+        self.client.post(f'/api/posts/{self.post.id}/like/', {'user': 'u0'}, format='json')
+        
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.post(
+                f'/api/posts/{self.post.id}/like/', {'user': 'u1'}, format='json'
+            )
+        
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.data, {'message': 'Post liked successfully', 'like_count': 2})
+        statements = [
+            q['sql'] for q in context.captured_queries
+            if not q['sql'].startswith(('SAVEPOINT', 'RELEASE SAVEPOINT'))
+        ]
+        self.assertFalse([sql for sql in statements if sql.startswith('SELECT')])
+        self.assertEqual(len(statements), 8)
+        self.assertEqual(len([sql for sql in statements if '"community_postlike"' in sql]), 1)
+    
+    def test_duplicate_like_stops_after_insert(self):
+        """Test that a duplicate like is rejected by ON CONFLICT without side effects"""
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+        self.client.post(f'/api/posts/{self.post.id}/like/', {'user': 'u1'}, format='json')
+        
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.post(
+                f'/api/posts/{self.post.id}/like/', {'user': 'u1'}, format='json'
+            )
+        
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(KarmaTransaction.objects.count(), 1)
+        self.assertEqual(
+            len([q for q in context.captured_queries if 'SAVEPOINT' not in q['sql']]), 1
+        )
+    
+    def test_like_missing_target(self):
+        """Test that liking a missing post is a 404 and leaves no like behind"""
+        response = self.client.post('/api/posts/9999/like/', {'user': 'u1'}, format='json')
+        self.assertEqual(response.status_code, 404)
+        self.assertFalse(PostLike.objects.exists())
+    
+    def test_unlike_returns_new_count(self):
+        """Test the unlike response contract on comments"""
+        comment = Comment.objects.create(post=self.post, author=Author.intern('bob'), content='Comment')
+        self.client.post(f'/api/comments/{comment.id}/like/', {'user': 'u1'}, format='json')
+        
+        response = self.client.post(
+            f'/api/comments/{comment.id}/unlike/', {'user': 'u1'}, format='json'
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            response.data, {'message': 'Comment unliked successfully', 'like_count': 0}
+        )
+        response = self.client.post(
+            f'/api/comments/{comment.id}/unlike/', {'user': 'u1'}, format='json'
+        )
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('not liked', response.data['error'])
+
+
+@override_settings(LIKE_OUTBOX=True)
+class LikeOutboxTest(TestCase):
+    """
+    Test queued like side effects and the outbox worker.
+    """
+    def setUp(self):
+        from rest_framework.test import APIClient
+        from . import authors
+        self.client = APIClient()
+        self.post = Post.objects.create(author=Author.intern('alice'), content='Post')
+        self.comment = Comment.objects.create(post=self.post, author=Author.intern('bob'), content='Comment')
+        self.addCleanup(authors.clear_cache)
+        with self.captureOnCommitCallbacks(execute=True):
+            authors.author_ids(['u1', 'u2'])
+    
+    def _like(self, target, user, action='like'):
+        kind = 'posts' if isinstance(target, Post) else 'comments'
+        return self.client.post(f'/api/{kind}/{target.id}/{action}/', {'user': user}, format='json')
+    
+    def test_request_only_writes_like_and_event(self):
+        """Test that a like writes the like and outbox rows and nothing else"""
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+        
+        with CaptureQueriesContext(connection) as context:
+            response = self._like(self.post, 'u1')
+        
+        self.assertEqual(response.data['like_count'], 1)
+        writes = [q['sql'] for q in context.captured_queries
+                  if q['sql'].startswith(('INSERT', 'UPDATE', 'DELETE'))]
+        self.assertEqual(len(writes), 2)
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.like_count, 0)
+        self.assertEqual(KarmaTransaction.objects.count(), 0)
+        self.assertEqual(LikeEvent.objects.count(), 1)
+    
+    def test_worker_applies_coalesced_events(self):
+        """Test that the worker applies one net update per target"""
+        from django.core.management import call_command
+        from io import StringIO
+        from .models import UserKarma
+        
+        for user in ('u1', 'u2', 'u3'):
+            self._like(self.post, user)
+        self._like(self.post, 'u3', 'unlike')
+        self._like(self.comment, 'u1')
+        self._like(self.comment, 'u1', 'unlike')
+        
+        call_command('process_like_events', '--once', stdout=StringIO())
+        
+        self.post.refresh_from_db()
+        self.comment.refresh_from_db()
+        self.assertEqual(self.post.like_count, 2)
+        self.assertEqual(self.comment.like_count, 0)
+        self.assertFalse(LikeEvent.objects.exists())
+        # One karma row for the post's net +2, none for the comment's net 0
+        self.assertEqual(list(KarmaTransaction.objects.values_list('user__name', 'points')),
+                         [('alice', 10)])
+        self.assertEqual(UserKarma.objects.get(user__name='alice').karma, 10)
+        self.assertEqual(self.client.get('/api/leaderboard/').data[0]['karma'], 10)
+    
+    def test_response_includes_own_change(self):
+        """Test that like_count is the applied count plus the request's own change"""
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+        from .outbox import drain
+        
+        self._like(self.post, 'u1')
+        drain()
+        with CaptureQueriesContext(connection) as context:
+            self.assertEqual(self._like(self.post, 'u2').data['like_count'], 2)
+        self.assertFalse([q for q in context.captured_queries if 'SUM(' in q['sql']])
+        # u2's like is still queued, so only the applied count and this unlike show
+        self.assertEqual(self._like(self.post, 'u1', 'unlike').data['like_count'], 0)
+    
+    def test_replayed_batch_is_not_double_applied(self):
+        """Test that a drained outbox applies nothing on a second run"""
+        from .outbox import drain
+        
+        self._like(self.post, 'u1')
+        self.assertEqual(drain(), 1)
+        self.assertEqual(drain(), 0)
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.like_count, 1)
+        self.assertEqual(KarmaTransaction.objects.count(), 1)
+    
+    def test_missing_target_leaves_no_event(self):
+        """Test that liking a missing post is a 404 and queues nothing"""
+        response = self.client.post('/api/posts/999999/like/', {'user': 'u1'}, format='json')
+        self.assertEqual(response.status_code, 404)
+        self.assertFalse(LikeEvent.objects.exists())
+        self.assertFalse(PostLike.objects.exists())
+
+
+class SchedulerTest(TestCase):
+    """
+    Test the periodic job scheduler and its leases.
+    """
+    def setUp(self):
+        from . import jobs  # noqa: F401 (registers the jobs)
+        from .scheduler import ensure_schedules
+        ensure_schedules()
+    
+    def test_due_jobs_run_once_and_are_recorded(self):
+        """Test that due jobs run, record their stats and are rescheduled"""
+        from .models import JobRun, ScheduledJob
+        from .scheduler import JOBS, run_due_jobs
+        Post.objects.create(author=Author.intern('alice'), content='Post')
+        
+        runs = run_due_jobs('worker-1')
+        self.assertEqual({run.job for run in runs}, set(JOBS))
+        self.assertTrue(all(run.succeeded for run in runs))
+        decay = JobRun.objects.get(job='decay_hot_scores')
+        self.assertEqual(decay.rows, 1)
+        self.assertEqual(decay.ran_by, 'worker-1')
+        
+        # Nothing is due again until each interval has passed
+        self.assertEqual(run_due_jobs('worker-2'), [])
+        schedule = ScheduledJob.objects.get(name='decay_hot_scores')
+        self.assertEqual(schedule.next_run_at, decay.started_at + JOBS['decay_hot_scores'].every)
+        self.assertEqual(schedule.leased_by, '')
+    
+    def test_lease_excludes_other_instances(self):
+        """Test that a held lease stops other instances until it expires"""
+        from .scheduler import JOBS, claim
+        job = JOBS['refresh_leaderboard']
+        now = timezone.now()
+        
+        self.assertTrue(claim(job, 'worker-1', now))
+        self.assertFalse(claim(job, 'worker-2', now))
+        self.assertFalse(claim(job, 'worker-2', now, force=True))
+        # A crashed holder's lease runs out
+        self.assertTrue(claim(job, 'worker-2', now + job.lease + timedelta(seconds=1)))
+    
+    def test_failures_are_recorded(self):
+        """Test that a failing job is recorded with its traceback and rescheduled"""
+        from .models import ScheduledJob
+        from .scheduler import Job, claim, run_job
+        
+        def broken():
+            raise RuntimeError('boom')
+        
+        job = Job('broken', timedelta(minutes=5), timedelta(minutes=1), broken)
+        ScheduledJob.objects.create(name='broken')
+        self.assertTrue(claim(job, 'worker-1'))
+        run = run_job(job, 'worker-1')
+        
+        self.assertFalse(run.succeeded)
+        self.assertIn('RuntimeError: boom', run.error)
+        self.assertGreater(ScheduledJob.objects.get(name='broken').next_run_at, timezone.now())
+
+
+class WarmupTest(TestCase):
+    """
+    Test worker warmup.
+    """
+    def setUp(self):
+        from unittest import mock
+        from django.core.cache import cache
+        from . import tree_cache
+        cache.clear()
+        # The tree cache is only used with a cache shared between processes
+        patcher = mock.patch.object(tree_cache, 'enabled', return_value=True)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.hot = Post.objects.create(author=Author.intern('alice'), content='Hot post')
+        Comment.objects.create(post=self.hot, author=Author.intern('bob'), content='Comment')
+    
+    def test_warm_up_fills_comment_tree_cache(self):
+        """Test that warmup requests the feed and leaderboard and caches hot trees"""
+        from django.core.cache import cache
+        from .warmup import warm_up
+        
+        timings = warm_up(budget=30, feed_pages=1, hot_posts=5)
+        steps = [name for name, _ in timings]
+        self.assertEqual(steps[:5], ['content types', 'feed page 1', 'hot feed', 'leaderboard', 'home'])
+        self.assertIn(f'post {self.hot.id}', steps)
+        self.assertIsNotNone(cache.get(f'comment-tree:{self.hot.id}'))
+    
+    def test_budget_bounds_warmup(self):
+        """Test that an exhausted time budget stops warmup"""
+        from .warmup import warm_up
+        self.assertEqual(warm_up(budget=0), [])
+
+
+class ReconcileCountersTest(TestCase):
+    """
+    Test the like count and karma reconciler.
+    """
+    def setUp(self):
+        from rest_framework.test import APIClient
+        self.client = APIClient()
+        self.posts = [Post.objects.create(author=Author.intern('alice'), content=f'Post {i}') for i in range(3)]
+        self.comment = Comment.objects.create(post=self.posts[0], author=Author.intern('bob'), content='Comment')
+        for user in ('u1', 'u2'):
+            self.client.post(f'/api/posts/{self.posts[0].id}/like/', {'user': user}, format='json')
+        self.client.post(f'/api/comments/{self.comment.id}/like/', {'user': 'u1'}, format='json')
+    
+    def _reconcile(self, *args):
+        from django.core.management import call_command
+        from io import StringIO
+        out = StringIO()
+        call_command('reconcile_counters', '--workers', '1', '--chunk-size', '2', *args, stdout=out)
+        return out.getvalue()
+    
+    def test_consistent_data_reports_nothing(self):
+        """Test that untouched counters produce no discrepancies"""
+        output = self._reconcile()
+        self.assertIn('post_likes: 3 rows checked, 0 discrepancies', output)
+        self.assertIn('user_karma: 2 rows checked, 0 discrepancies', output)
+    
+    def test_drift_is_reported_and_repaired(self):
+        """Test that drifted counters are reported, then repaired by their difference"""
+        from .models import UserKarma
+        Post.objects.filter(pk=self.posts[0].pk).update(like_count=7)
+        Comment.objects.filter(pk=self.comment.pk).update(like_count=0)
+        UserKarma.objects.filter(user__name='alice').update(karma=1)
+        UserKarma.objects.filter(user__name='bob').delete()
+        
+        output = self._reconcile()
+        self.assertIn(f'{self.posts[0].id}: like_count 7 -> 2', output)
+        self.assertIn('comment_likes: 1 rows checked, 1 discrepancies', output)
+        self.assertIn('alice: karma 1 -> 10', output)
+        self.assertIn('missing_karma: 2 rows checked, 1 discrepancies', output)
+        self.assertEqual(Post.objects.get(pk=self.posts[0].pk).like_count, 7)
+        
+        output = self._reconcile('--repair')
+        self.assertIn('post_likes: 3 rows checked, 1 discrepancies, 1 repaired', output)
+        self.assertEqual(Post.objects.get(pk=self.posts[0].pk).like_count, 2)
+        self.assertEqual(Comment.objects.get(pk=self.comment.pk).like_count, 1)
+        self.assertEqual(UserKarma.objects.get(user__name='alice').karma, 10)
+        self.assertEqual(UserKarma.objects.get(user__name='bob').comment_like_karma, 1)
+        self.assertNotIn('discrepancies, ', self._reconcile().replace(' 0 discrepancies', ''))
+    
+    def test_sources_are_aggregated_per_chunk(self):
+        """Test that each source chunk is one grouped aggregate and partial sums merge"""
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+        from . import reconcile
+        for user in ('u3', 'u4'):
+            self.client.post(f'/api/posts/{self.posts[1].id}/like/', {'user': user}, format='json')
+        
+        totals = {}
+        with CaptureQueriesContext(connection) as context:
+            tasks = reconcile.plan(['post_likes', 'user_karma'], 2)
+            planning = len(context.captured_queries)
+            for task in tasks:
+                reconcile.merge(totals, reconcile.aggregate_chunk(*task))
+        self.assertEqual(len(context.captured_queries) - planning, len(tasks))
+        self.assertEqual(totals['post_likes'], {self.posts[0].id: 2, self.posts[1].id: 2})
+        self.assertEqual(totals['karma'][Author.intern('alice').id], (20, 20, 0))
+    
+    @override_settings(LIKE_OUTBOX=True)
+    def test_queued_likes_are_not_drift(self):
+        """Test that likes still in the outbox are not reported as drift"""
+        self.client.post(f'/api/posts/{self.posts[1].id}/like/', {'user': 'u1'}, format='json')
+        self.assertIn('post_likes: 3 rows checked, 0 discrepancies', self._reconcile('--check', 'post_likes'))
+
+
+
+class ExportTest(TestCase):
+    """
+    Test the NDJSON export command and endpoint.
+    """
+    def setUp(self):
+        from rest_framework.test import APIClient
+        self.client = APIClient()
+        self.post = Post.objects.create(author=Author.intern('alice'), content='Post')
+        self.root = Comment.objects.create(post=self.post, author=Author.intern('bob'), content='Root')
+        self.other_root = Comment.objects.create(post=self.post, author=Author.intern('carol'), content='Other root')
+        self.reply = Comment.objects.create(post=self.post, parent=self.root, author=Author.intern('dave'), content='Reply')
+        self.client.post(f'/api/posts/{self.post.id}/like/', {'user': 'u1'}, format='json')
+    
+    def _export(self, *args):
+        from django.core.management import call_command
+        from io import StringIO
+        import os
+        import tempfile
+        fd, path = tempfile.mkstemp(suffix='.ndjson')
+        os.close(fd)
+        self.addCleanup(os.remove, path)
+        call_command('export_data', '--output', path, *args, stdout=StringIO())
+        with open(path, 'rb') as output:
+            return output.read()
+    
+    def _lines(self, data):
+        import json
+        return [json.loads(line) for line in data.decode().splitlines()]
+    
+    def test_exports_every_kind_with_comments_in_path_order(self):
+        """Test that each row is one typed line and comments come depth-first"""
+        lines = self._lines(self._export())
+        self.assertEqual(
+            [line['type'] for line in lines],
+            ['post', 'comment', 'comment', 'comment', 'like', 'karma']
+        )
+        self.assertEqual(
+            [line['id'] for line in lines if line['type'] == 'comment'],
+            [self.root.id, self.reply.id, self.other_root.id]
+        )
+        self.assertEqual(lines[0]['like_count'], 1)
+        self.assertEqual(lines[4]['target'], 'post')
+        self.assertTrue(lines[5]['created_at'].endswith('Z'))
+    
+    def test_gzip_output(self):
+        """Test that a .gz output file is gzip-compressed NDJSON"""
+        import gzip
+        import os
+        import tempfile
+        from django.core.management import call_command
+        from io import StringIO
+        path = os.path.join(tempfile.mkdtemp(), 'export.ndjson.gz')
+        self.addCleanup(os.remove, path)
+        call_command('export_data', '--output', path, '--kind', 'posts', stdout=StringIO())
+        with gzip.open(path) as output:
+            self.assertEqual(self._lines(output.read())[0]['author'], 'alice')
+    
+    def test_incremental_runs_from_state_file(self):
+        """Test that a state file's high-water marks limit the next run to new rows"""
+        import json
+        import os
+        import tempfile
+        state = os.path.join(tempfile.mkdtemp(), 'state.json')
+        self.addCleanup(os.remove, state)
+        
+        self.assertEqual(len(self._lines(self._export('--state', state))), 6)
+        with open(state) as marks:
+            self.assertEqual(json.load(marks)['posts'], self.post.id)
+        self.assertEqual(self._export('--state', state), b'')
+        
+        new_post = Post.objects.create(author=Author.intern('erin'), content='New')
+        lines = self._lines(self._export('--state', state))
+        self.assertEqual([(line['type'], line['id']) for line in lines], [('post', new_post.id)])
+    
+    def test_since_filters_by_creation_time(self):
+        """Test that --since only exports rows created at or after it"""
+        Post.objects.filter(pk=self.post.pk).update(created_at=timezone.now() - timedelta(days=2))
+        since = (timezone.now() - timedelta(days=1)).isoformat()
+        lines = self._lines(self._export('--kind', 'posts', '--kind', 'comments', '--since', since))
+        self.assertEqual({line['type'] for line in lines}, {'comment'})
+    
+    def test_endpoint_requires_admin(self):
+        """Test that the endpoint streams NDJSON to staff users only"""
+        from django.contrib.auth.models import User
+        self.assertEqual(self.client.get('/api/export/').status_code, 403)
+        
+        admin = User.objects.create_user('admin', password='secret', is_staff=True)
+        self.client.force_authenticate(admin)
+        response = self.client.get('/api/export/', {'kind': 'posts,post_likes', 'after_post_likes': 0})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson')
+        like_id = PostLike.objects.get().id
+        self.assertEqual(
+            response['Export-High-Water-Marks'], f'posts={self.post.id}, post_likes={like_id}'
+        )
+        lines = self._lines(b''.join(response.streaming_content))
+        self.assertEqual([line['type'] for line in lines], ['post', 'like'])
+        
+        response = self.client.get('/api/export/', {'kind': 'posts', 'since': 'yesterday'})
+        self.assertEqual(response.status_code, 400)
+
+
+class ImportTest(TestCase):
+    """
+    Test the bulk NDJSON import.
+    """
+    def setUp(self):
+        from rest_framework.test import APIClient
+        self.client = APIClient()
+    
+    def _import(self, lines, *args):
+        from django.core.management import call_command
+        from io import StringIO
+        import json
+        import os
+        import tempfile
+        fd, path = tempfile.mkstemp(suffix='.ndjson')
+        with os.fdopen(fd, 'w') as dump:
+            dump.write('\n'.join(line if isinstance(line, str) else json.dumps(line) for line in lines))
+        self.addCleanup(os.remove, path)
+        out = StringIO()
+        call_command('import_data', path, *args, stdout=out)
+        return out.getvalue()
+    
+    def test_round_trip_through_export(self):
+        """Test that an exported community imports with the same trees, counters and karma"""
+        from .export import Export
+        from .models import UserKarma
+        post = Post.objects.create(author=Author.intern('alice'), content='Post')
+        root = Comment.objects.create(post=post, author=Author.intern('bob'), content='Root')
+        reply = Comment.objects.create(post=post, parent=root, author=Author.intern('carol'), content='Reply')
+        Comment.objects.create(post=post, parent=reply, author=Author.intern('dave'), content='Deep')
+        self.client.post(f'/api/posts/{post.id}/like/', {'user': 'u1'}, format='json')
+        self.client.post(f'/api/comments/{reply.id}/like/', {'user': 'u1'}, format='json')
+        lines = b''.join(Export().lines()).decode().splitlines()
+        
+        output = self._import(lines)
+        self.assertIn('comment: 3 imported', output)
+        self.assertIn('rows/s', output)
+        
+        copy = Post.objects.exclude(pk=post.pk).get()
+        self.assertEqual(copy.like_count, 1)
+        self.assertGreater(copy.hot_score, 0)
+        original_tree = list(Comment.objects.filter(post=post).values_list(
+            'author', 'depth', 'reply_count', 'descendant_count', 'like_count'))
+        copied = Comment.objects.filter(post=copy)
+        self.assertEqual(list(copied.values_list(
+            'author', 'depth', 'reply_count', 'descendant_count', 'like_count')), original_tree)
+        for comment in copied:
+            expected = f'{comment.parent.path}/{comment.id}' if comment.parent else str(comment.id)
+            self.assertEqual(comment.path, expected)
+        # Karma was imported as well, so every total doubles
+        self.assertEqual(UserKarma.objects.get(user__name='alice').karma, 10)
+        self.assertEqual(UserKarma.objects.get(user__name='carol').comment_like_karma, 2)
+    
+    def test_out_of_order_lines_wait_for_their_parents(self):
+        """Test that replies, comments and likes arriving before their targets are linked up"""
+        lines = [
+            {'type': 'like', 'user': 'u1', 'target': 'comment', 'object_id': 11},
+            {'type': 'comment', 'id': 12, 'post_id': 1, 'parent_id': 11, 'author': 'c', 'content': 'Reply'},
+            {'type': 'comment', 'id': 11, 'post_id': 1, 'parent_id': None, 'author': 'b', 'content': 'Root'},
+            {'type': 'post', 'id': 1, 'author': 'a', 'content': 'Post'},
+            {'type': 'like', 'user': 'u1', 'target': 'comment', 'object_id': 11},
+            {'type': 'like', 'user': 'u2', 'target': 'post', 'object_id': 404},
+            {'type': 'comment', 'id': 13, 'post_id': 1, 'parent_id': 99, 'author': 'd', 'content': 'Orphan'},
+        ]
+        output = self._import(lines, '--derive-karma')
+        self.assertIn('comment: 2 imported, 1 skipped', output)
+        self.assertIn('like: 1 imported, 2 skipped', output)
+        
+        root = Comment.objects.get(author__name='b')
+        self.assertEqual(Comment.objects.get(author__name='c').path, f'{root.id}/{root.id + 1}')
+        self.assertEqual((root.reply_count, root.descendant_count, root.like_count), (1, 1, 1))
+        self.assertEqual(KarmaTransaction.objects.get().user.name, 'b')
+    
+    def test_bad_line_writes_nothing(self):
+        """Test that an undecodable line aborts the whole import"""
+        from django.core.management.base import CommandError
+        with self.assertRaisesMessage(CommandError, 'line 2'):
+            self._import([{'type': 'post', 'id': 1, 'author': 'a', 'content': 'Post'}, '{not json'])
+        self.assertFalse(Post.objects.exists())
+
+class KarmaPartitionTest(TestCase):
+    """
+    Test windowed karma reads and the day partition lifecycle.
+    """
+    def setUp(self):
+        from .partitions import day_start
+        self.today = day_start(timezone.now())
+        self.alice = Author.intern('alice')
+        for days_ago, points in [(10, 5), (10, 1), (9, 5), (1, 1), (0, 5)]:
+            KarmaTransaction.objects.create(
+                user=self.alice, points=points, transaction_type=KarmaTransaction.POST_LIKE,
+                created_at=self.today - timedelta(days=days_ago) + timedelta(hours=1)
+            )
+    
+    def test_window_bounds_reads(self):
+        """Test that window() keeps transactions created in [start, end)"""
+        self.assertEqual(KarmaTransaction.objects.window(self.today - timedelta(days=1)).count(), 2)
+        self.assertEqual(
+            KarmaTransaction.objects.window(end=self.today - timedelta(days=9)).count(), 2
+        )
+        self.assertEqual(
+            KarmaTransaction.objects.window(self.today - timedelta(days=10), self.today).count(), 4
+        )
+    
+    def test_days_past_retention_are_archived_and_dropped(self):
+        """Test that old days are written as importable NDJSON before being dropped"""
+        from django.core.management import call_command
+        from io import StringIO
+        import gzip
+        import json
+        import os
+        import shutil
+        import tempfile
+        archive_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, archive_dir)
+        out = StringIO()
+        
+        call_command('karma_partitions', '--retain-days', '5', '--archive-dir', archive_dir, stdout=out)
+        
+        self.assertIn('Dropped 2 partitions', out.getvalue())
+        self.assertEqual(KarmaTransaction.objects.count(), 2)
+        oldest = self.today - timedelta(days=10)
+        with gzip.open(os.path.join(archive_dir, f'karma-{oldest:%Y-%m-%d}.ndjson.gz')) as archive:
+            lines = [json.loads(line) for line in archive]
+        self.assertEqual([line['points'] for line in lines], [5, 1])
+        self.assertTrue(all(line['type'] == 'karma' and line['user'] == 'alice' for line in lines))
+        self.assertEqual(len(os.listdir(archive_dir)), 2)
+    
+    def test_maintain_keeps_history_without_retention(self):
+        """Test that the scheduled maintenance drops nothing unless a retention is set"""
+        from django.conf import settings
+        from django.core.management import call_command
+        from io import StringIO
+        from .partitions import maintain, partitioned, partitions
+        # PostgreSQL creates today's and the days ahead; SQLite has one per day with rows
+        created = settings.KARMA_PARTITION_AHEAD_DAYS + 1 if partitioned() else 0
+        
+        self.assertEqual(maintain(), created)
+        self.assertEqual(KarmaTransaction.objects.count(), 5)
+        self.assertEqual(len(partitions()), created + 2 if partitioned() else 4)
+        
+        with override_settings(KARMA_RETENTION_DAYS=2):
+            self.assertEqual(maintain(), 3)
+        out = StringIO()
+        call_command('karma_partitions', '--list', stdout=out)
+        self.assertEqual(len(out.getvalue().splitlines()), created + 2 if partitioned() else 2)
+    
+    def test_dropped_karma_still_counts(self):
+        """Test that rebuilds and reconcile keep the karma of dropped days"""
+        from django.core.management import call_command
+        from io import StringIO
+        from .models import ArchivedKarma, UserKarma
+        from .partitions import drop_partitions, retention_cutoff
+        UserKarma.rebuild()
+        
+        drop_partitions(retention_cutoff(5))
+        self.assertEqual(KarmaTransaction.objects.count(), 2)
+        self.assertEqual(ArchivedKarma.objects.get(user=self.alice).karma, 11)
+        
+        out = StringIO()
+        call_command('reconcile_counters', '--repair', stdout=out)
+        self.assertEqual(UserKarma.objects.get(user=self.alice).karma, 17)
+        UserKarma.rebuild()
+        LeaderboardEntry.rebuild()
+        self.assertEqual(UserKarma.objects.get(user=self.alice).karma, 17)
+        self.assertEqual(LeaderboardEntry.objects.get(window='all', user='alice').karma, 17)
+    
+    @skipUnless(connection.vendor == 'postgresql', 'native partitioning is PostgreSQL only')
+    def test_window_reads_only_overlapping_partitions(self):
+        """Test that a windowed read is pruned to the day partitions it overlaps"""
+        from .partitions import create_partitions, partition_name
+        create_partitions(ahead=2)
+        
+        plan = KarmaTransaction.objects.window(self.today, self.today + timedelta(days=1)).explain()
+        self.assertIn(partition_name(self.today), plan)
+        self.assertNotIn(partition_name(self.today + timedelta(days=1)), plan)
+        self.assertNotIn('_history', plan)
+
+
+class StreamingDetailTest(TestCase):
+    """
+    Test that the streaming detail mode renders the same tree as the buffered one.
+    """
+    def setUp(self):
+        from django.core.cache import cache
+        cache.clear()
+        from rest_framework.test import APIClient
+        self.client = APIClient()
+        self.post = Post.objects.create(author=Author.intern('author'), content='Thread "quoted" ünïcode')
+        root1 = Comment.objects.create(post=self.post, author=Author.intern('u1'), content='Root 1')
+        child = Comment.objects.create(post=self.post, parent=root1, author=Author.intern('u2'), content='Child')
+        Comment.objects.create(post=self.post, parent=child, author=Author.intern('u3'), content='Grandchild')
+        Comment.objects.create(post=self.post, parent=root1, author=Author.intern('u4'), content='Child 2')
+        root2 = Comment.objects.create(post=self.post, author=Author.intern('u5'), content='Root 2')
+        Comment.objects.create(post=self.post, parent=root2, author=Author.intern('u6'), content='Reply')
+    
+    def test_streamed_tree_matches_buffered(self):
+        """Test that streamed and buffered responses decode to the same document"""
+        import json
+        buffered = self.client.get(f'/api/posts/{self.post.id}/')
+        streamed = self.client.get(f'/api/posts/{self.post.id}/?stream=1')
+        
+        self.assertTrue(streamed.streaming)
+        body = b''.join(streamed.streaming_content)
+        self.assertEqual(json.loads(body), json.loads(buffered.content))
+    
+    def test_stream_post_without_comments(self):
+        """Test that an empty thread still streams valid JSON"""
+        import json
+        post = Post.objects.create(author=Author.intern('author'), content='Quiet')
+        streamed = self.client.get(f'/api/posts/{post.id}/?stream=1')
+        data = json.loads(b''.join(streamed.streaming_content))
+        self.assertEqual(data['comments'], [])
+        self.assertEqual(data['comment_count'], 0)
+
+
+class CommentTreeCacheTest(TestCase):
+    """
+    Test that the patched comment tree cache stays identical to a rebuild.
+    """
+    def setUp(self):
+        from unittest import mock
+        from django.core.cache import cache
+        from rest_framework.test import APIClient
+        from . import authors, tree_cache
+        cache.clear()
+        # Stands in for a shared cache; LocMemCache is otherwise bypassed
+        self.shared_cache = mock.patch.object(tree_cache, 'enabled', return_value=True)
+        self.shared_cache.start()
+        self.addCleanup(self.shared_cache.stop)
+        # On-commit callbacks run here cache author ids the test rollback removes
+        self.addCleanup(authors.clear_cache)
+        self.client = APIClient()
+        self.post = Post.objects.create(author=Author.intern('author'), content='Thread')
+        with self.captureOnCommitCallbacks(execute=True):
+            self.root = Comment.objects.create(post=self.post, author=Author.intern('u1'), content='Root')
+            self.child = Comment.objects.create(
+                post=self.post, parent=self.root, author=Author.intern('u2'), content='Child'
+            )
+    
+    def _cached_and_rebuilt(self):
+        from . import tree_cache
+        cached = tree_cache.get_comment_tree(self.post.id)
+        rebuilt = tree_cache.materialize(tree_cache.rebuild(self.post.id))
+        return cached, rebuilt
+    
+    def test_patched_tree_matches_rebuild(self):
+        """Test that adds, likes and deletes patch the cache consistently"""
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+        from . import tree_cache
+        tree_cache.get_comment_tree(self.post.id)  # warm the cache
+        
+        with self.captureOnCommitCallbacks(execute=True):
+            # Ids 9 and 10 sort out of numeric order in path order
+            for i in range(10):
+                Comment.objects.create(
+                    post=self.post, parent=self.root, author=Author.intern(f'r{i}'), content=f'Reply {i}'
+                )
+            doomed = Comment.objects.create(
+                post=self.post, parent=self.child, author=Author.intern('u3'), content='Grandchild'
+            )
+            Comment.objects.create(post=self.post, parent=doomed, author=Author.intern('u4'), content='Deep')
+            self.client.post(f'/api/comments/{self.child.id}/like/', {'user': 'x'}, format='json')
+            Comment.objects.get(pk=doomed.pk).delete()
+        
+        with CaptureQueriesContext(connection) as context:
+            cached = tree_cache.get_comment_tree(self.post.id)
+        self.assertEqual(len(context.captured_queries), 0)
+        
+        rebuilt = tree_cache.materialize(tree_cache.rebuild(self.post.id))
+        self.assertEqual(cached, rebuilt)
+        self.assertEqual(cached[0]['descendant_count'], 11)
+        child = next(c for c in cached[0]['replies'] if c['id'] == self.child.id)
+        self.assertEqual(child['like_count'], 1)
+        self.assertEqual(child['descendant_count'], 0)
+    
+    def test_edit_patches_cached_node(self):
+        """Test that editing a comment through the API updates the cached tree"""
+        self.client.get(f'/api/posts/{self.post.id}/')  # warm the cache
+        
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.patch(f'/api/comments/{self.child.id}/', {'content': 'edited'}, format='json')
+        self.assertEqual(response.status_code, 200)
+        
+        detail = self.client.get(f'/api/posts/{self.post.id}/').data
+        self.assertEqual(detail['comments'][0]['replies'][0]['content'], 'edited')
+        cached, rebuilt = self._cached_and_rebuilt()
+        self.assertEqual(cached, rebuilt)
+    
+    def test_add_patch_after_rebuild_is_not_applied_twice(self):
+        """Test that a tree rebuilt between commit and the add patch keeps its counts"""
+        from . import tree_cache
+        tree_cache.get_comment_tree(self.post.id)
+        
+        with self.captureOnCommitCallbacks() as callbacks:
+            reply = Comment.objects.create(
+                post=self.post, parent=self.child, author=Author.intern('u5'), content='Late'
+            )
+        # A reader rebuilds from the committed rows before the patch runs
+        tree_cache.rebuild(self.post.id)
+        for callback in callbacks:
+            callback()
+        
+        cached, rebuilt = self._cached_and_rebuilt()
+        self.assertEqual(cached, rebuilt)
+        self.assertEqual(cached[0]['replies'][0]['replies'][0]['id'], reply.id)
+        self.assertEqual(cached[0]['replies'][0]['reply_count'], 1)
+    
+    def test_detail_served_from_cache(self):
+        """Test that the detail view matches the rebuilt tree and skips the comment query"""
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+        self.client.get(f'/api/posts/{self.post.id}/')
+        
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(f'/api/posts/{self.post.id}/')
+        self.assertEqual(len(context.captured_queries), 1)
+        cached, rebuilt = self._cached_and_rebuilt()
+        self.assertEqual(response.data['comments'], rebuilt)
+    
+    def test_process_local_cache_is_bypassed(self):
+        """Test that a LocMemCache never serves a tree, since other processes' patches miss it"""
+        from django.core.cache import cache
+        from . import tree_cache
+        tree_cache.get_comment_tree(self.post.id)
+        version = cache.get(f'comment-tree-version:{self.post.id}')
+        self.shared_cache.stop()
+        
+        self.assertFalse(tree_cache.enabled())
+        with self.captureOnCommitCallbacks(execute=True):
+            Comment.objects.create(post=self.post, author=Author.intern('u5'), content='Elsewhere')
+        Comment.objects.filter(pk=self.child.pk).update(like_count=7)
+        tree = tree_cache.get_comment_tree(self.post.id)
+        
+        self.assertEqual(len(tree), 2)
+        self.assertEqual(tree[0]['replies'][0]['like_count'], 7)
+        self.assertEqual(cache.get(f'comment-tree-version:{self.post.id}'), version)
+    
+    def test_version_mismatch_forces_rebuild(self):
+        """Test that a patch written against a stale entry is never served"""
+        from django.core.cache import cache
+        from . import tree_cache
+        tree_cache.get_comment_tree(self.post.id)
+        
+        # Simulate a lost patch: the version moves on but the entry does not
+        cache.incr(f'comment-tree-version:{self.post.id}')
+        Comment.objects.filter(pk=self.child.pk).update(like_count=42)
+        
+        cached, rebuilt = self._cached_and_rebuilt()
+        self.assertEqual(cached, rebuilt)
+        self.assertEqual(cached[0]['replies'][0]['like_count'], 42)
+
+
+class BatchFetchTest(TestCase):
+    """
+    Test the multi-post batch endpoint.
+    """
+    def setUp(self):
+        from django.core.cache import cache
+        from rest_framework.test import APIClient
+        cache.clear()
+        self.client = APIClient()
+        self.posts = []
+        for i in range(4):
+            post = Post.objects.create(author=Author.intern(f'user{i}'), content=f'Post {i}')
+            root = Comment.objects.create(post=post, author=Author.intern('a'), content='Root')
+            Comment.objects.create(post=post, parent=root, author=Author.intern('b'), content='Reply')
+            self.posts.append(post)
+    
+    def test_batch_matches_detail(self):
+        """Test that batched trees equal the single-post detail responses, in request order"""
+        ids = [self.posts[2].id, self.posts[0].id]
+        response = self.client.get(f'/api/posts/batch/?ids={ids[0]},{ids[1]}&comments=1')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([p['id'] for p in response.data], ids)
+        for data in response.data:
+            detail = self.client.get(f"/api/posts/{data['id']}/").data
+            self.assertEqual(data['comments'], detail['comments'])
+    
+    def test_fixed_query_count(self):
+        """Test that the query count does not grow with the number of ids"""
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+        
+        counts = []
+        for posts in (self.posts[:1], self.posts):
+            ids = ','.join(str(p.id) for p in posts)
+            with CaptureQueriesContext(connection) as context:
+                self.client.get(f'/api/posts/batch/?ids={ids}&comments=1')
+            counts.append(len(context.captured_queries))
+        self.assertEqual(counts, [2, 2])
+    
+    def test_missing_and_invalid_ids(self):
+        """Test that unknown ids are skipped and malformed ids are rejected"""
+        response = self.client.get(f'/api/posts/batch/?ids={self.posts[0].id},9999')
+        self.assertEqual([p['id'] for p in response.data], [self.posts[0].id])
+        self.assertEqual(response.data[0]['comments'], [])
+        self.assertEqual(self.client.get('/api/posts/batch/?ids=abc').status_code, 400)
+        self.assertEqual(self.client.get('/api/posts/batch/').status_code, 400)
+
+
+class FeedPreviewTest(TestCase):
+    """
+    Test top-N root comment previews on the feed.
+    """
+    def setUp(self):
+        from rest_framework.test import APIClient
+        self.client = APIClient()
+    
+    def _make_posts(self, count):
+        for i in range(count):
+            post = Post.objects.create(author=Author.intern(f'user{i}'), content=f'Post {i}')
+            for likes in (3, 7, 1, 5):
+                root = Comment.objects.create(post=post, author=Author.intern('a'), content=f'{likes} likes')
+                Comment.objects.filter(pk=root.pk).update(like_count=likes)
+            Comment.objects.create(post=post, parent=root, author=Author.intern('b'), content='Reply')
+    
+    def test_top_comments_by_likes_and_recency(self):
+        """Test that previews hold the top root comments in the requested order"""
+        self._make_posts(1)
+        data = self.client.get('/api/posts/?preview_comments=2').data['results'][0]
+        self.assertEqual([c['like_count'] for c in data['comments']], [7, 5])
+        self.assertEqual(data['comments'][0]['replies'], [])
+        
+        data = self.client.get(
+            '/api/posts/?preview_comments=2&preview_order=recent'
+        ).data['results'][0]
+        self.assertEqual([c['content'] for c in data['comments']], ['5 likes', '1 likes'])
+        self.assertEqual(data['comments'][0]['reply_count'], 1)
+    
+    def test_constant_query_count(self):
+        """Test that previews cost one query for the whole page"""
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+        
+        counts = []
+        for total in (2, 6):
+            self._make_posts(total - Post.objects.count())
+            with CaptureQueriesContext(connection) as context:
+                response = self.client.get('/api/posts/?preview_comments=3')
+            self.assertEqual(len(response.data['results']), total)
+            counts.append(len(context.captured_queries))
+        self.assertEqual(counts[0], counts[1])
+        self.assertTrue(any('ROW_NUMBER' in q['sql'] for q in context.captured_queries))
+    
+    def test_invalid_preview_parameters(self):
+        """Test validation of the preview parameters"""
+        self.assertEqual(self.client.get('/api/posts/?preview_comments=0').status_code, 400)
+        self.assertEqual(
+            self.client.get('/api/posts/?preview_comments=2&preview_order=x').status_code, 400
+        )
+
+
+class SparseFieldsetTest(TestCase):
+    """
+    Test ?fields= / ?exclude= / ?content_preview= on posts and comments.
+    """
+    def setUp(self):
+        from django.core.cache import cache
+        from rest_framework.test import APIClient
+        cache.clear()
+        self.client = APIClient()
+        self.post = Post.objects.create(author=Author.intern('alice'), content='x' * 500)
+        self.comment = Comment.objects.create(post=self.post, author=Author.intern('bob'), content='Hello world')
+    
+    def test_fields_and_exclude(self):
+        """Test that only the selected fields (plus id) are returned"""
+        data = self.client.get('/api/posts/?fields=author,like_count').data['results'][0]
+        self.assertEqual(set(data), {'id', 'author', 'like_count'})
+        
+        data = self.client.get(f'/api/posts/{self.post.id}/?exclude=comments,content').data
+        self.assertNotIn('comments', data)
+        self.assertNotIn('content', data)
+        self.assertEqual(data['comment_count'], 1)
+        
+        data = self.client.get(f'/api/comments/?post={self.post.id}&fields=author,post').data
+        self.assertEqual(data['results'][0], {'id': self.comment.id, 'author': 'bob',
+                                               'post': self.post.id})
+    
+    def test_content_preview_is_truncated_in_database(self):
+        """Test that previews are truncated by the query, without loading content"""
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+        
+        with CaptureQueriesContext(connection) as context:
+            data = self.client.get(
+                '/api/posts/?fields=author&content_preview=50'
+            ).data['results'][0]
+        self.assertEqual(data['content_preview'], 'x' * 50)
+        self.assertNotIn('content', data)
+        select = next(q['sql'] for q in context.captured_queries
+                      if 'community_post' in q['sql'] and 'COUNT' not in q['sql'])
+        # content is only read inside SUBSTR(...)
+        self.assertIn('SUBSTR', select)
+        self.assertEqual(select.count('"community_post"."content"'), 1)
+        self.assertNotIn('comment_count_annotated', select)
+    
+    def test_full_representation_unchanged(self):
+        """Test that requests without sparse parameters keep every field"""
+        data = self.client.get(f'/api/posts/{self.post.id}/').data
+        self.assertNotIn('content_preview', data)
+        self.assertEqual(data['comments'][0]['content'], 'Hello world')
+    
+    def test_invalid_parameters(self):
+        """Test that unknown fields and bad preview lengths are rejected"""
+        response = self.client.get('/api/posts/?fields=author,secret')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('secret', response.data['error'])
+        self.assertEqual(self.client.get('/api/posts/?content_preview=0').status_code, 400)
+
+
+class IdempotencyKeyTest(TestCase):
+    """
+    Test Idempotency-Key replays on write actions.
+    """
+    def setUp(self):
+        from django.core.cache import caches
+        from rest_framework.test import APIClient
+        caches['idempotency'].clear()
+        self.client = APIClient()
+        self.post = Post.objects.create(author=Author.intern('alice'), content='Post')
+    
+    def _post(self, url, data, key):
+        return self.client.post(url, data, format='json', HTTP_IDEMPOTENCY_KEY=key)
+    
+    def test_like_replay_returns_first_response(self):
+        """Test that a retried like replays the result without a second like or karma"""
+        url = f'/api/posts/{self.post.id}/like/'
+        first = self._post(url, {'user': 'bob'}, 'key-1')
+        retry = self._post(url, {'user': 'bob'}, 'key-1')
+        
+        self.assertEqual(first.status_code, 201)
+        self.assertEqual(retry.status_code, 201)
+        self.assertEqual(retry.data, first.data)
+        self.assertEqual(retry['Idempotent-Replayed'], 'true')
+        self.assertEqual(PostLike.objects.count(), 1)
+        self.assertEqual(KarmaTransaction.objects.count(), 1)
+        
+        # A new key is a new request
+        self.assertEqual(self._post(url, {'user': 'bob'}, 'key-2').status_code, 400)
+    
+    def test_comment_create_is_not_duplicated(self):
+        """Test that retrying a comment creation with the same key creates one comment"""
+        data = {'post': self.post.id, 'author': 'bob', 'content': 'Hi'}
+        first = self._post('/api/comments/', data, 'comment-1')
+        retry = self._post('/api/comments/', data, 'comment-1')
+        
+        self.assertEqual(retry.status_code, 201)
+        self.assertEqual(retry.data['id'], first.data['id'])
+        self.assertEqual(Comment.objects.count(), 1)
+        
+        # Without a key every request is executed
+        self.client.post('/api/comments/', data, format='json')
+        self.assertEqual(Comment.objects.count(), 2)
+    
+    def test_key_reused_with_different_body(self):
+        """Test that a key cannot be replayed for a different request body"""
+        url = f'/api/posts/{self.post.id}/like/'
+        self._post(url, {'user': 'bob'}, 'key-1')
+        response = self._post(url, {'user': 'carol'}, 'key-1')
+        self.assertEqual(response.status_code, 422)
+        self.assertEqual(PostLike.objects.count(), 1)
+    
+    def test_key_claimed_by_another_worker(self):
+        """Test that a key claimed by another worker is seen, not executed again"""
+        from types import SimpleNamespace
+        from django.core.cache import caches
+        from django.core.cache.backends.locmem import LocMemCache
+        from . import idempotency
+        url = f'/api/posts/{self.post.id}/like/'
+        self.assertNotIsInstance(caches['idempotency'], LocMemCache)
+        
+        # A separate connection to the same backend stands in for another worker
+        other_worker = caches.create_connection('idempotency')
+        request = SimpleNamespace(method='POST', path=url, data={'user': 'bob'})
+        other_worker.add(idempotency._cache_key(request, 'key-1'), {
+            'fingerprint': idempotency._fingerprint(request), 'status': None, 'data': None,
+        })
+        
+        self.assertEqual(self._post(url, {'user': 'bob'}, 'key-1').status_code, 409)
+        self.assertEqual(PostLike.objects.count(), 0)
+    
+    def test_errors_release_the_key(self):
+        """Test that a request that raised can be retried with the same key"""
+        url = '/api/posts/999999/like/'
+        self.assertEqual(self._post(url, {'user': 'bob'}, 'key-1').status_code, 404)
+        self.assertEqual(self._post(url, {'user': 'bob'}, 'key-1').status_code, 404)
+
+
+class HomeEndpointTest(TestCase):
+    """
+    Test the aggregated home endpoint.
+    """
+    def setUp(self):
+        from rest_framework.test import APIClient
+        self.client = APIClient()
+        self.post1 = Post.objects.create(author=Author.intern('alice'), content='First')
+        self.post2 = Post.objects.create(author=Author.intern('bob'), content='Second')
+        self.client.post(f'/api/posts/{self.post1.id}/like/', {'user': 'viewer'}, format='json')
+    
+    def test_home_payload(self):
+        """Test that feed, leaderboard and liked state arrive together"""
+        response = self.client.get('/api/home/?viewer=viewer')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['posts']['count'], 2)
+        self.assertEqual(
+            [p['id'] for p in response.data['posts']['results']], [self.post2.id, self.post1.id]
+        )
+        self.assertEqual(response.data['leaderboard'][0]['user'], 'alice')
+        self.assertEqual(response.data['liked_posts'], [self.post1.id])
+    
+    def test_etag_not_modified(self):
+        """Test that an unchanged home screen is a 304 and a change busts the ETag"""
+        etag = self.client.get('/api/home/')['ETag']
+        
+        response = self.client.get('/api/home/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        
+        self.client.post(f'/api/posts/{self.post2.id}/like/', {'user': 'viewer'}, format='json')
+        response = self.client.get('/api/home/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+    
+    def test_if_none_match_compares_whole_tags(self):
+        """Test that If-None-Match lists are parsed and each tag compared exactly"""
+        etag = self.client.get('/api/home/')['ETag']
+        
+        for header in (f'"other", {etag}', f'W/{etag}', '*'):
+            self.assertEqual(self.client.get('/api/home/', HTTP_IF_NONE_MATCH=header).status_code, 304)
+        # The ETag only appears as a substring of these headers
+        for header in (f'x{etag}', f'"0"{etag}', f'W/"1", "{etag}"'):
+            self.assertEqual(self.client.get('/api/home/', HTTP_IF_NONE_MATCH=header).status_code, 200)
+    
+    def test_not_modified_skips_serialization(self):
+        """Test that a 304 is answered without serializing the feed"""
+        from unittest import mock
+        from . import serializers
+        etag = self.client.get('/api/home/')['ETag']
+        with mock.patch.object(serializers.PostSerializer, 'to_representation') as to_representation:
+            response = self.client.get('/api/home/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        to_representation.assert_not_called()
+
+
+class WireFormatTest(TestCase):
+    """
+    Test the JSON/MessagePack renderers and response compression.
+    """
+    def setUp(self):
+        from rest_framework.test import APIClient
+        self.client = APIClient()
+        self.post = Post.objects.create(author=Author.intern('alice'), content='Ünïcode "quoted" post')
+        Comment.objects.create(post=self.post, author=Author.intern('bob'), content='Comment')
+    
+    def test_fast_json_matches_stdlib(self):
+        """Test that the fast renderer produces the same document as DRF's JSONRenderer"""
+        import json
+        from rest_framework.renderers import JSONRenderer
+        from .renderers import FastJSONRenderer
+        data = self.client.get(f'/api/posts/{self.post.id}/').data
+        
+        self.assertEqual(
+            json.loads(FastJSONRenderer().render(data)),
+            json.loads(JSONRenderer().render(data))
+        )
+    
+    def test_messagepack_round_trip(self):
+        """Test that MessagePack is negotiated via Accept and parsed from request bodies"""
+        from .renderers import msgpack
+        if msgpack is None:
+            self.skipTest('msgpack is not installed')
+        
+        response = self.client.get(
+            f'/api/posts/{self.post.id}/', HTTP_ACCEPT='application/msgpack'
+        )
+        self.assertEqual(response['Content-Type'], 'application/msgpack')
+        self.assertEqual(msgpack.unpackb(response.content)['author'], 'alice')
+        
+        response = self.client.post(
+            '/api/posts/', msgpack.packb({'author': 'carol', 'content': 'Packed'}),
+            content_type='application/msgpack'
+        )
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(Post.objects.get(author__name='carol').content, 'Packed')
+    
+    def test_compression_threshold(self):
+        """Test that only responses above the size threshold are gzipped"""
+        from django.test import override_settings
+        
+        # GZipMiddleware pads its output with up to 100 random bytes (BREACH
+        # mitigation) and sends the body as-is when that is not smaller, so
+        # the fixture alone (~250 bytes) is only sometimes compressed
+        Post.objects.create(author=Author.intern('alice'), content='Long post ' * 100)
+        with override_settings(COMPRESSION_MIN_SIZE=100000):
+            response = self.client.get('/api/posts/', HTTP_ACCEPT_ENCODING='gzip')
+            self.assertFalse(response.has_header('Content-Encoding'))
+        
+        with override_settings(COMPRESSION_MIN_SIZE=10):
+            response = self.client.get('/api/posts/', HTTP_ACCEPT_ENCODING='gzip')
+            self.assertEqual(response['Content-Encoding'], 'gzip')
@@ -0,0 +1,235 @@
+"""
+Per-post cache of the serialized comment tree, patched in place on writes.
+
+The cached entry is a compact, id-indexed form of the tree:
+
+    {'version': 7,
+     'nodes': {comment_id: {...serialized comment..., 'path': '1/4'}},
+     'children': {parent_id or 0: [child ids in path order]}}
+
+New comments, edits, like-count changes and deletes patch the entry at their path
+position, touching only the node and its ancestors, instead of invalidating
+it. Every write bumps a per-post version key; a patch only applies to the
+entry it expects (version - 1), and a reader rebuilds from the database
+whenever the entry's version does not match, so a lost or out-of-order
+patch can never be served.
+
+Patches are only seen by the cache the writing process talks to, so the
+tree cache needs a cache every worker shares (REDIS_URL). With the
+per-process LocMemCache a like applied by the outbox worker, or a comment
+posted to another web worker, would never reach this process's entry; the
+cache is bypassed then and every tree is read from the database.
+"""
+from bisect import insort
+from operator import attrgetter
+
+from django.core.cache import cache, caches
+from django.core.cache.backends.locmem import LocMemCache
+from django.db import transaction
+
+from .models import Comment
+from .serializers import COMMENT_COLUMNS, comment_row_data
+
+
+TREE_TIMEOUT = 60 * 60
+ROOT = 0
+TREE_COLUMNS = ['path', *COMMENT_COLUMNS]
+# Node fields kept up to date by likes and replies rather than by edits
+COUNTER_FIELDS = ('like_count', 'reply_count', 'descendant_count')
+
+
+def _tree_key(post_id):
+    return f'comment-tree:{post_id}'
+
+
+def _version_key(post_id):
+    return f'comment-tree-version:{post_id}'
+
+
+def enabled():
+    """Whether the default cache is shared between processes."""
+    return not isinstance(caches['default'], LocMemCache)
+
+
+def get_comment_tree(post_id, comment_count=None):
+    """
+    Nested comment tree for a post, as PostSerializer.get_comments returns it.
+    comment_count, when known, is an extra staleness check against the entry.
+    """
+    if not enabled():
+        return materialize(build_entry(_rows(post_id)))
+
+    keys = cache.get_many([_tree_key(post_id), _version_key(post_id)])
+    entry = keys.get(_tree_key(post_id))
+    version = keys.get(_version_key(post_id), 0)
+
+    if (entry is None or entry['version'] != version
+            or (comment_count is not None and len(entry['nodes']) != comment_count)):
+        entry = rebuild(post_id, version)
+    return materialize(entry)
+
+
+def rebuild(post_id, version=None):
+    """Build the compact entry from the database and cache it."""
+    if version is None:
+        version = cache.get(_version_key(post_id), 0)
+    entry = build_entry(_rows(post_id), version)
+    cache.set(_tree_key(post_id), entry, TREE_TIMEOUT)
+    return entry
+
+
+def _rows(post_id):
+    return (
+        Comment.objects
+        .filter(post_id=post_id)
+        .order_by('path')
+        .values(*TREE_COLUMNS)
+    )
+
+
+def build_entry(rows, version=0):
+    """Compact entry from path-ordered value rows of TREE_COLUMNS."""
+    entry = {'version': version, 'nodes': {}, 'children': {}}
+    for row in rows:
+        node = comment_row_data(row)
+        node['path'] = row['path']
+        entry['nodes'][node['id']] = node
+        # Path order means children arrive already sorted
+        entry['children'].setdefault(node['parent'] or ROOT, []).append(node['id'])
+    return entry
+
+
+def materialize(entry, parent=ROOT):
+    """Expand the compact entry into nested comment dicts."""
+    nodes = entry['nodes']
+    return [
+        {**{k: v for k, v in nodes[pk].items() if k != 'path'},
+         'replies': materialize(entry, pk)}
+        for pk in entry['children'].get(parent, [])
+    ]
+
+
+def _node(comment):
+    """Tree node for a saved comment instance."""
+    # author__name reads comment.author.name
+    node = comment_row_data({
+        column: attrgetter(column.replace('__', '.'))(comment) for column in COMMENT_COLUMNS
+    })
+    node['path'] = comment.path
+    return node
+
+
+def comment_added(comment):
+    """Patch a newly created comment into its post's tree after commit."""
+    node = _node(comment)
+
+    def patch(entry):
+        nodes = entry['nodes']
+        if comment.pk in nodes:
+            # A reader rebuilt the tree after the commit, comment included
+            return True
+        parent = comment.parent_id or ROOT
+        if parent != ROOT and parent not in nodes:
+            return False
+        nodes[comment.pk] = node
+        insort(entry['children'].setdefault(parent, []), comment.pk,
+               key=lambda pk: nodes[pk]['path'])
+        for ancestor in _ancestors(comment.path):
+            nodes[ancestor]['descendant_count'] += 1
+        if parent != ROOT:
+            nodes[parent]['reply_count'] += 1
+        return True
+
+    _on_commit(comment.post_id, patch)
+
+
+def comment_updated(comment):
+    """
+    Rewrite an edited comment's node in its post's tree after commit. The
+    instance's counters may be stale, so only the edited fields are copied.
+    """
+    edited = {name: value for name, value in _node(comment).items() if name not in COUNTER_FIELDS}
+
+    def patch(entry):
+        node = entry['nodes'].get(comment.pk)
+        if node is None or node['parent'] != edited['parent']:
+            return False
+        node.update(edited)
+        return True
+
+    _on_commit(comment.post_id, patch)
+
+
+def comment_deleted(post_id, comment_id, path):
+    """Remove a comment and its subtree from its post's tree after commit."""
+    def patch(entry):
+        nodes = entry['nodes']
+        if comment_id not in nodes:
+            return False
+        parent = nodes[comment_id]['parent'] or ROOT
+        removed = _remove_subtree(entry, comment_id)
+        entry['children'][parent].remove(comment_id)
+        for ancestor in _ancestors(path):
+            nodes[ancestor]['descendant_count'] -= removed
+        if parent != ROOT:
+            nodes[parent]['reply_count'] -= 1
+        return True
+
+    _on_commit(post_id, patch)
+
+
+def like_count_changed(post_id, comment_id, like_count):
+    """Set a comment's like count in its post's tree after commit."""
+    def patch(entry):
+        if comment_id not in entry['nodes']:
+            return False
+        entry['nodes'][comment_id]['like_count'] = like_count
+        return True
+
+    _on_commit(post_id, patch)
+
+
+def _ancestors(path):
+    return [int(pk) for pk in path.split('/')[:-1]]
+
+
+def _remove_subtree(entry, comment_id):
+    """Drop a node and its descendants, returning how many nodes were removed."""
+    removed = 0
+    stack = [comment_id]
+    while stack:
+        pk = stack.pop()
+        entry['nodes'].pop(pk)
+        stack.extend(entry['children'].pop(pk, []))
+        removed += 1
+    return removed
+
+
+def _on_commit(post_id, patch):
+    if not enabled():
+        return
+    transaction.on_commit(lambda: _apply(post_id, patch))
+
+
+def _apply(post_id, patch):
+    """
+    Bump the post's version and patch the cached entry if it is the one
+    the patch was written against; otherwise drop it so readers rebuild.
+    """
+    version_key = _version_key(post_id)
+    cache.add(version_key, 0, None)
+    try:
+        version = cache.incr(version_key)
+    except ValueError:
+        # The version key was evicted between add() and incr()
+        cache.delete(_tree_key(post_id))
+        return
+
+    entry = cache.get(_tree_key(post_id))
+    if entry is None:
+        return
+    if entry['version'] == version - 1 and patch(entry):
+        entry['version'] = version
+        cache.set(_tree_key(post_id), entry, TREE_TIMEOUT)
+    else:
+        cache.delete(_tree_key(post_id))
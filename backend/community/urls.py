@@ -1,11 +1,14 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
-from .views import PostViewSet, CommentViewSet, LeaderboardViewSet
+from .views import PostViewSet, CommentViewSet, LeaderboardViewSet, UserViewSet, HomeViewSet, ExportViewSet
 
 router = DefaultRouter()
 router.register(r'posts', PostViewSet, basename='post')
 router.register(r'comments', CommentViewSet, basename='comment')
 router.register(r'leaderboard', LeaderboardViewSet, basename='leaderboard')
+router.register(r'users', UserViewSet, basename='user')
+router.register(r'home', HomeViewSet, basename='home')
+router.register(r'export', ExportViewSet, basename='export')
 
 urlpatterns = [
     path('', include(router.urls)),
@@ -1,60 +1,59 @@
 from rest_framework import viewsets, status
 from rest_framework.decorators import action
+from rest_framework.exceptions import ValidationError
+from rest_framework.permissions import IsAdminUser
 from rest_framework.response import Response
-from django.db import transaction, IntegrityError
-from django.db.models import Count, Sum, Q, Prefetch, F
+from rest_framework.settings import api_settings
+from rest_framework.utils.encoders import JSONEncoder
+from django.db import connection
+from django.db.models import Count, Q, F, OuterRef, Subquery, Value, Window
+from django.db.models.functions import Coalesce, RowNumber, Substr
+from django.http import Http404, StreamingHttpResponse
 from django.contrib.contenttypes.models import ContentType
-from django.utils import timezone
-from datetime import timedelta
+from django.urls import reverse
+from django.utils.http import parse_etags
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from itertools import groupby
+from operator import itemgetter
+import hashlib
+import json
 
-from .models import Post, Comment, Like, KarmaTransaction
+from . import export, likes, tree_cache
+from .idempotency import idempotent
+from .models import (
+    Post, Comment, PostLike, CommentLike, KarmaTransaction, UserKarma, LeaderboardEntry,
+    LeaderboardKarmaCount, dense_rank
+)
+from .pagination import HotFeedPagination, ActivityPagination, MergedQuerySet
+from .streaming import stream_post_detail
 from .serializers import (
     PostSerializer, 
     CommentSerializer, 
-    LikeSerializer,
-    LeaderboardSerializer
+    LeaderboardSerializer,
+    UserProfileSerializer,
+    UserLikeSerializer,
+    KarmaHistorySerializer,
+    COMMENT_COLUMNS,
+    comment_row_data
 )
 
 
-class PostViewSet(viewsets.ModelViewSet):
+class LikeActionsMixin:
     """
-    ViewSet for Post operations.
-    Optimized with select_related and prefetch_related to avoid N+1 queries.
+    like/unlike actions shared by the post and comment viewsets.
+    The target is never loaded: see community.likes for the write path.
+    Both accept an Idempotency-Key header (see community.idempotency).
     """
-    queryset = Post.objects.all()
-    serializer_class = PostSerializer
-    
-    def get_queryset(self):
-        """
-        Optimize queryset with annotations and prefetching.
-        """
-        queryset = Post.objects.annotate(
-            comment_count_annotated=Count('comments')
-        )
-        return queryset
-    
-    def retrieve(self, request, *args, **kwargs):
-        """
-        Retrieve a single post with its comment tree.
-        Optimized to fetch all comments in a single query.
-        """
-        instance = self.get_object()
-        
-        # Prefetch all comments for this post in one query
-        # Using path ordering ensures proper tree structure
-        comments = Comment.objects.filter(post=instance).order_by('path').select_related('parent')
-        instance._prefetched_comments = comments
-        
-        serializer = self.get_serializer(instance, context={'include_comments': True})
-        return Response(serializer.data)
+    like_model = None
     
     @action(detail=True, methods=['post'])
+    @idempotent
     def like(self, request, pk=None):
         """
-        Like a post. Uses database-level unique constraint to prevent double-liking.
-        Implements atomic transaction to handle race conditions.
+        Like the object. Uses database-level unique constraint to prevent double-liking.
         """
-        post = self.get_object()
+        noun = self.like_model._meta.model_name
         user = request.data.get('user')
         
         if not user:
@@ -64,55 +63,28 @@ class PostViewSet(viewsets.ModelViewSet):
             )
         
         try:
-            with transaction.atomic():
-                # Get content type for Post
-                content_type = ContentType.objects.get_for_model(Post)
-                
-                # Try to create like - will fail if already exists due to unique constraint
-                like, created = Like.objects.get_or_create(
-                    user=user,
-                    content_type=content_type,
-                    object_id=post.id
-                )
-                
-                if not created:
-                    return Response(
-                        {'error': 'You have already liked this post'},
-                        status=status.HTTP_400_BAD_REQUEST
-                    )
-                
-                # Atomically increment like count
-                Post.objects.filter(id=post.id).update(like_count=F('like_count') + 1)
-                
-                # Create karma transaction (5 points for post like)
-                KarmaTransaction.objects.create(
-                    user=post.author,
-                    points=5,
-                    transaction_type=KarmaTransaction.POST_LIKE,
-                    content_type=content_type,
-                    object_id=post.id
-                )
-                
-                # Refresh post instance
-                post.refresh_from_db()
-                
-                return Response(
-                    {'message': 'Post liked successfully', 'like_count': post.like_count},
-                    status=status.HTTP_201_CREATED
-                )
-                
-        except IntegrityError:
+            like_count = likes.add_like(self.like_model, int(pk), user)
+        except (ValueError, self.like_model.DoesNotExist):
+            raise Http404
+        
+        if like_count is None:
             return Response(
-                {'error': 'You have already liked this post'},
+                {'error': f'You have already liked this {noun}'},
                 status=status.HTTP_400_BAD_REQUEST
             )
+        
+        return Response(
+            {'message': f'{noun.capitalize()} liked successfully', 'like_count': like_count},
+            status=status.HTTP_201_CREATED
+        )
     
     @action(detail=True, methods=['post'])
+    @idempotent
     def unlike(self, request, pk=None):
         """
-        Unlike a post.
+        Unlike the object.
         """
-        post = self.get_object()
+        noun = self.like_model._meta.model_name
         user = request.data.get('user')
         
         if not user:
@@ -122,210 +94,727 @@ class PostViewSet(viewsets.ModelViewSet):
             )
         
         try:
-            with transaction.atomic():
-                content_type = ContentType.objects.get_for_model(Post)
-                
-                # Delete the like
-                deleted_count, _ = Like.objects.filter(
-                    user=user,
-                    content_type=content_type,
-                    object_id=post.id
-                ).delete()
-                
-                if deleted_count == 0:
-                    return Response(
-                        {'error': 'You have not liked this post'},
-                        status=status.HTTP_400_BAD_REQUEST
-                    )
-                
-                # Atomically decrement like count
-                from django.db.models import F
-                Post.objects.filter(id=post.id).update(like_count=F('like_count') - 1)
-                
-                # Remove karma transaction (negative points)
-                KarmaTransaction.objects.create(
-                    user=post.author,
-                    points=-5,
-                    transaction_type=KarmaTransaction.POST_LIKE,
-                    content_type=content_type,
-                    object_id=post.id
-                )
-                
-                # Refresh post instance
-                post.refresh_from_db()
-                
-                return Response(
-                    {'message': 'Post unliked successfully', 'like_count': post.like_count},
-                    status=status.HTTP_200_OK
-                )
-                
-        except Exception as e:
+            like_count = likes.remove_like(self.like_model, int(pk), user)
+        except (ValueError, self.like_model.DoesNotExist):
+            raise Http404
+        
+        if like_count is None:
             return Response(
-                {'error': str(e)},
-                status=status.HTTP_500_INTERNAL_SERVER_ERROR
+                {'error': f'You have not liked this {noun}'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        return Response(
+            {'message': f'{noun.capitalize()} unliked successfully', 'like_count': like_count},
+            status=status.HTTP_200_OK
+        )
+
+
+class SparseFieldsetMixin:
+    """
+    Sparse fieldsets for read actions: ?fields=a,b returns only those fields
+    (plus id), ?exclude=a,b drops them, and ?content_preview=N (or listing
+    content_preview in ?fields=) adds the content truncated to N characters.
+    
+    get_queryset uses sparse_columns() to defer the columns nothing reads,
+    and the truncation happens in the database, so a preview-only listing
+    never transfers the full content.
+    """
+    sparse_actions = ('list', 'retrieve')
+    DEFAULT_CONTENT_PREVIEW = 200
+    MAX_CONTENT_PREVIEW = 1000
+    
+    def get_sparse_fields(self):
+        """
+        Selected field names, or None when the client asked for the full
+        representation. Raises ValidationError for unknown field names.
+        """
+        if not hasattr(self, '_sparse_fields'):
+            self._sparse_fields = self._parse_sparse_fields()
+        return self._sparse_fields
+    
+    def _parse_sparse_fields(self):
+        params = self.request.query_params
+        if self.action not in self.sparse_actions or not (
+                {'fields', 'exclude', 'content_preview'} & set(params)):
+            return None
+        
+        meta = self.get_serializer_class().Meta
+        known = set(meta.fields)
+        fields = self._split_param('fields')
+        excluded = self._split_param('exclude')
+        unknown = (fields | excluded) - known
+        if unknown:
+            raise ValidationError({
+                'error': f"Unknown field(s): {', '.join(sorted(unknown))}. "
+                         f"Available: {', '.join(meta.fields)}"
+            })
+        
+        selected = fields or known - set(getattr(meta, 'optional_fields', []))
+        if 'content_preview' in params:
+            selected.add('content_preview')
+        return (selected - excluded) | {'id'}
+    
+    def _split_param(self, name):
+        return {field.strip() for field in self.request.query_params.get(name, '').split(',')
+                if field.strip()}
+    
+    def get_content_preview_length(self):
+        value = self.request.query_params.get('content_preview')
+        if value is None:
+            return self.DEFAULT_CONTENT_PREVIEW
+        try:
+            length = int(value)
+        except ValueError:
+            length = 0
+        if not 1 <= length <= self.MAX_CONTENT_PREVIEW:
+            raise ValidationError({
+                'error': f'content_preview must be 1 to {self.MAX_CONTENT_PREVIEW}'
+            })
+        return length
+    
+    def sparse_columns(self, queryset, extra=()):
+        """
+        Restrict the queryset to the model columns the selected fields read
+        (plus extra), annotating the truncated content when it is selected.
+        """
+        selected = self.get_sparse_fields()
+        if selected is None:
+            return queryset
+        model = queryset.model
+        columns = {field.name for field in model._meta.concrete_fields} & selected
+        queryset = queryset.only(*columns, *extra)
+        if 'content_preview' in selected:
+            queryset = queryset.annotate(content_preview_annotated=Substr(
+                'content', 1, self.get_content_preview_length()
+            ))
+        return queryset
+    
+    def get_serializer_context(self):
+        context = super().get_serializer_context()
+        selected = self.get_sparse_fields()
+        if selected is not None:
+            model = self.get_serializer_class().Meta.model
+            context['sparse_fields'] = {model: selected}
+            if 'content_preview' in selected:
+                context['content_preview_length'] = self.get_content_preview_length()
+        return context
+    
+    def wants_field(self, name):
+        selected = self.get_sparse_fields()
+        return selected is None or name in selected
+
+
+class PostViewSet(LikeActionsMixin, SparseFieldsetMixin, viewsets.ModelViewSet):
+    """
+    ViewSet for Post operations.
+    Optimized with select_related and prefetch_related to avoid N+1 queries.
+    """
+    queryset = Post.objects.all()
+    serializer_class = PostSerializer
+    like_model = Post
+    sparse_actions = ('list', 'retrieve', 'batch')
+    include_comments = False
+    MAX_BATCH_IDS = 50
+    MAX_PREVIEW_COMMENTS = 10
+    PREVIEW_ORDERINGS = {
+        'likes': [F('like_count').desc(), F('id').desc()],
+        'recent': [F('created_at').desc(), F('id').desc()],
+    }
+    
+    @property
+    def paginator(self):
+        """
+        Use keyset pagination on the stored score for the hot feed (?sort=hot).
+        """
+        if self.action == 'list' and self.request.query_params.get('sort') == 'hot':
+            if not isinstance(getattr(self, '_paginator', None), HotFeedPagination):
+                self._paginator = HotFeedPagination()
+            return self._paginator
+        return super().paginator
+    
+    def get_queryset(self):
+        """
+        Optimize queryset with annotations and prefetching.
+        With a sparse fieldset only the selected columns are loaded, and the
+        comment count is only aggregated when comment_count is selected.
+        """
+        # Meta.ordering is not applied to GROUP BY queries, so order explicitly
+        queryset = Post.objects.order_by(*Post._meta.ordering)
+        if self.wants_field('author'):
+            queryset = queryset.select_related('author')
+        if self.wants_field('comment_count'):
+            queryset = queryset.annotate(comment_count_annotated=Count('comments'))
+        # The hot feed's cursor is built from hot_score
+        extra = ['hot_score'] if self.request.query_params.get('sort') == 'hot' else []
+        return self.sparse_columns(queryset, extra)
+    
+    def get_serializer_context(self):
+        context = super().get_serializer_context()
+        context['include_comments'] = self.include_comments
+        return context
+    
+    @idempotent
+    def create(self, request, *args, **kwargs):
+        """
+        Create a post. Retries with the same Idempotency-Key replay the first response.
+        """
+        return super().create(request, *args, **kwargs)
+    
+    def list(self, request, *args, **kwargs):
+        """
+        List posts. With ?preview_comments=N (1-10) each post's comments holds
+        its top N root comments, by likes or by recency (?preview_order=recent).
+        
+        Previews for the whole page come from one ROW_NUMBER() OVER
+        (PARTITION BY post_id ...) query, so the query count stays constant.
+        """
+        if 'preview_comments' not in request.query_params or not self.wants_field('comments'):
+            return super().list(request, *args, **kwargs)
+        
+        try:
+            preview_count = int(request.query_params['preview_comments'])
+        except ValueError:
+            preview_count = 0
+        preview_order = request.query_params.get('preview_order', 'likes')
+        if not 1 <= preview_count <= self.MAX_PREVIEW_COMMENTS or preview_order not in self.PREVIEW_ORDERINGS:
+            return Response(
+                {'error': f'preview_comments must be 1 to {self.MAX_PREVIEW_COMMENTS} and '
+                          f"preview_order one of: {', '.join(self.PREVIEW_ORDERINGS)}"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        queryset = self.filter_queryset(self.get_queryset())
+        page = self.paginate_queryset(queryset)
+        posts = page if page is not None else list(queryset)
+        
+        for post in posts:
+            post._comment_tree = []
+        posts_by_id = {post.id: post for post in posts}
+        previews = (
+            Comment.objects
+            .filter(post_id__in=posts_by_id, parent__isnull=True)
+            .annotate(preview_rank=Window(
+                expression=RowNumber(),
+                partition_by=[F('post_id')],
+                order_by=self.PREVIEW_ORDERINGS[preview_order],
+            ))
+            .filter(preview_rank__lte=preview_count)
+            .order_by('post_id', 'preview_rank')
+            .values(*COMMENT_COLUMNS)
+        )
+        for row in previews:
+            posts_by_id[row['post_id']]._comment_tree.append(
+                {**comment_row_data(row), 'replies': []}
+            )
+        
+        self.include_comments = True
+        serializer = self.get_serializer(posts, many=True)
+        if page is not None:
+            return self.get_paginated_response(serializer.data)
+        return Response(serializer.data)
+    
+    def retrieve(self, request, *args, **kwargs):
+        """
+        Retrieve a single post with its comment tree.
+        The tree comes from the comment tree cache (one query to rebuild on a miss).
+        
+        With ?stream=1 the tree is written incrementally from a server-side
+        cursor instead of being built in memory (for very large threads).
+        """
+        if request.query_params.get('stream') in ('1', 'true'):
+            # Streamed output always has the full shape
+            self._sparse_fields = None
+            instance = self.get_object()
+            post_data = self.get_serializer(instance).data
+            return StreamingHttpResponse(
+                stream_post_detail(post_data, instance.comment_count_annotated),
+                content_type='application/json'
+            )
+        
+        instance = self.get_object()
+        if self.wants_field('comments'):
+            # Serve the tree from the per-post cache, which writes patch in place;
+            # on a miss it is rebuilt from one path-ordered query
+            instance._comment_tree = tree_cache.get_comment_tree(
+                instance.id, getattr(instance, 'comment_count_annotated', None)
+            )
+            self.include_comments = True
+        
+        serializer = self.get_serializer(instance)
+        return Response(serializer.data)
+    
+    @action(detail=False, methods=['get'])
+    def batch(self, request):
+        """
+        Fetch several posts at once (?ids=1,2,3), optionally with their
+        comment trees (?comments=1).
+        
+        Uses a fixed number of queries however many ids are requested: one
+        for the annotated posts and one post_id IN (...) query for all of
+        their comments, ordered by (post, path).
+        """
+        try:
+            ids = [int(pk) for pk in request.query_params.get('ids', '').split(',') if pk]
+        except ValueError:
+            ids = []
+        if not 1 <= len(ids) <= self.MAX_BATCH_IDS:
+            return Response(
+                {'error': f'ids must be a comma-separated list of 1 to {self.MAX_BATCH_IDS} post ids'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        include_comments = (request.query_params.get('comments') in ('1', 'true')
+                            and self.wants_field('comments'))
+        
+        posts = {post.id: post for post in self.get_queryset().filter(id__in=ids)}
+        
+        if include_comments:
+            rows = (
+                Comment.objects
+                .filter(post_id__in=posts)
+                .order_by('post_id', 'path')
+                .values(*tree_cache.TREE_COLUMNS)
             )
+            for post_id, post_rows in groupby(rows, key=itemgetter('post_id')):
+                posts[post_id]._comment_tree = tree_cache.materialize(
+                    tree_cache.build_entry(post_rows)
+                )
+            for post in posts.values():
+                if not hasattr(post, '_comment_tree'):
+                    post._comment_tree = []
+        
+        # Keep the requested order, skipping ids that do not exist
+        ordered = [posts[pk] for pk in dict.fromkeys(ids) if pk in posts]
+        self.include_comments = include_comments
+        serializer = self.get_serializer(ordered, many=True)
+        return Response(serializer.data)
 
 
-class CommentViewSet(viewsets.ModelViewSet):
+class CommentViewSet(LikeActionsMixin, SparseFieldsetMixin, viewsets.ModelViewSet):
     """
     ViewSet for Comment operations.
     """
     queryset = Comment.objects.all()
     serializer_class = CommentSerializer
+    like_model = Comment
     
     def get_queryset(self):
         """
         Filter comments by post if provided.
         """
-        queryset = Comment.objects.select_related('post', 'parent')
+        if self.get_sparse_fields() is None:
+            queryset = Comment.objects.select_related('post', 'parent', 'author')
+        else:
+            # Serialized relations only need the foreign key columns, except the author's name
+            queryset = Comment.objects.all()
+            if self.wants_field('author'):
+                queryset = queryset.select_related('author')
+            queryset = self.sparse_columns(queryset)
         post_id = self.request.query_params.get('post')
         if post_id:
             queryset = queryset.filter(post_id=post_id)
         return queryset
     
-    @action(detail=True, methods=['post'])
-    def like(self, request, pk=None):
+    @idempotent
+    def create(self, request, *args, **kwargs):
         """
-        Like a comment. Uses database-level unique constraint to prevent double-liking.
+        Create a comment. Retries with the same Idempotency-Key replay the first response.
         """
-        comment = self.get_object()
-        user = request.data.get('user')
+        return super().create(request, *args, **kwargs)
+
+
+class LeaderboardViewSet(viewsets.ViewSet):
+    """
+    ViewSet for leaderboard operations.
+    Serves every window from precomputed LeaderboardEntry rows.
+    Ranks are dense (equal karma shares a rank); ties are ordered by username.
+    """
+    DEFAULT_LIMIT = 5
+    MAX_LIMIT = 100
+    DEFAULT_NEIGHBORS = 2
+    MAX_NEIGHBORS = 10
+    
+    def list(self, request):
+        """
+        Get the top users by karma for a window (?window=1h|24h|7d|all, default 24h).
         
+        Entries are maintained incrementally from time-bucketed karma, so this
+        reads ?limit= rows (default 5) off the (window, -karma) index instead
+        of aggregating KarmaTransaction.
+        """
+        window, error = self._get_window(request)
+        if error:
+            return error
+        limit, error = self._get_int_param(request, 'limit', self.DEFAULT_LIMIT, 1, self.MAX_LIMIT)
+        if error:
+            return error
+        
+        serializer = LeaderboardSerializer(LeaderboardEntry.top(window, limit), many=True)
+        return Response(serializer.data)
+    
+    @action(detail=False, methods=['get'])
+    def rank(self, request):
+        """
+        Get one user's rank and karma in a window plus their neighbors
+        (?user=<name>&window=24h&neighbors=2).
+        
+        The dense rank counts the karma values above the user's in
+        LeaderboardKarmaCount; position (1-based place on the board, ties
+        ordered by name) adds up their users plus the tied users before this
+        one. The neighbors are range scans on the (window, -karma, user) index.
+        """
+        user = request.query_params.get('user')
         if not user:
             return Response(
-                {'error': 'User field is required'}, 
+                {'error': 'user parameter is required'},
                 status=status.HTTP_400_BAD_REQUEST
             )
+        window, error = self._get_window(request)
+        if error:
+            return error
+        neighbors, error = self._get_int_param(
+            request, 'neighbors', self.DEFAULT_NEIGHBORS, 0, self.MAX_NEIGHBORS
+        )
+        if error:
+            return error
         
-        try:
-            with transaction.atomic():
-                content_type = ContentType.objects.get_for_model(Comment)
-                
-                like, created = Like.objects.get_or_create(
-                    user=user,
-                    content_type=content_type,
-                    object_id=comment.id
-                )
-                
-                if not created:
-                    return Response(
-                        {'error': 'You have already liked this comment'},
-                        status=status.HTTP_400_BAD_REQUEST
-                    )
-                
-                # Atomically increment like count
-                Comment.objects.filter(id=comment.id).update(like_count=F('like_count') + 1)
-                
-                # Create karma transaction (1 point for comment like)
-                KarmaTransaction.objects.create(
-                    user=comment.author,
-                    points=1,
-                    transaction_type=KarmaTransaction.COMMENT_LIKE,
-                    content_type=content_type,
-                    object_id=comment.id
-                )
-                
-                comment.refresh_from_db()
-                
-                return Response(
-                    {'message': 'Comment liked successfully', 'like_count': comment.like_count},
-                    status=status.HTTP_201_CREATED
-                )
-                
-        except IntegrityError:
+        board = LeaderboardEntry.objects.filter(window=window)
+        karma = board.filter(user=user).values_list('karma', flat=True).first()
+        if karma is None:
             return Response(
-                {'error': 'You have already liked this comment'},
+                {'error': 'User has no karma in this window'},
+                status=status.HTTP_404_NOT_FOUND
+            )
+        
+        # Both read the maintained per-karma user counts, so they cost the
+        # number of distinct karma values above the user, not of users
+        rank = LeaderboardKarmaCount.dense_rank(window, karma)
+        position = (
+            LeaderboardKarmaCount.users_above(window, karma)
+            + board.filter(karma=karma, user__lt=user).count() + 1
+        )
+        
+        above = list(
+            board.filter(Q(karma__gt=karma) | Q(karma=karma, user__lt=user))
+            .order_by('karma', '-user')
+            .values('user', 'karma')[:neighbors]
+        )
+        below = list(
+            board.filter(Q(karma__lt=karma) | Q(karma=karma, user__gt=user))
+            .order_by('-karma', 'user')
+            .values('user', 'karma')[:neighbors]
+        )
+        
+        # Walk outwards from the user so neighbors get their dense ranks too
+        ranked = dense_rank([{'user': user, 'karma': karma}] + below, rank)
+        above_ranked = dense_rank([{'user': user, 'karma': karma}] + above, rank, step=-1)[1:]
+        
+        return Response({
+            'window': window,
+            **LeaderboardSerializer(ranked[0]).data,
+            'position': position,
+            'above': LeaderboardSerializer(reversed(above_ranked), many=True).data,
+            'below': LeaderboardSerializer(ranked[1:], many=True).data,
+        })
+    
+    def _get_window(self, request):
+        """Validate ?window=, returning (window, error_response)."""
+        window = request.query_params.get('window', LeaderboardEntry.DEFAULT_WINDOW)
+        if window not in LeaderboardEntry.WINDOWS:
+            return None, Response(
+                {'error': f"window must be one of: {', '.join(LeaderboardEntry.WINDOWS)}"},
                 status=status.HTTP_400_BAD_REQUEST
             )
+        # Subtract any buckets that aged out since the last refresh
+        LeaderboardEntry.expire(window)
+        return window, None
     
-    @action(detail=True, methods=['post'])
-    def unlike(self, request, pk=None):
+    def _get_int_param(self, request, name, default, minimum, maximum):
+        """Validate an integer query parameter, returning (value, error_response)."""
+        try:
+            value = int(request.query_params.get(name, default))
+        except ValueError:
+            value = minimum - 1
+        if not minimum <= value <= maximum:
+            return None, Response(
+                {'error': f'{name} must be an integer between {minimum} and {maximum}'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        return value, None
+
+
+class UserViewSet(viewsets.ViewSet):
+    """
+    ViewSet for user profiles and like/karma history.
+    Reads maintained karma totals instead of summing transaction history.
+    """
+    lookup_field = 'name'
+    lookup_value_regex = '[^/]+'
+    
+    def retrieve(self, request, name=None):
         """
-        Unlike a comment.
+        Get a user's karma totals plus their post and comment counts.
+        
+        Everything is fetched in one round trip: the author's name index,
+        the unique index on UserKarma.user and count subqueries on the
+        author indexes.
         """
-        comment = self.get_object()
-        user = request.data.get('user')
+        post_count = Subquery(
+            Post.objects.filter(author=OuterRef('user')).order_by()
+            .values('author').annotate(n=Count('id')).values('n')
+        )
+        comment_count = Subquery(
+            Comment.objects.filter(author=OuterRef('user')).order_by()
+            .values('author').annotate(n=Count('id')).values('n')
+        )
         
-        if not user:
+        profile = (
+            UserKarma.objects.filter(user__name=name)
+            .values('karma', 'post_like_karma', 'comment_like_karma')
+            .annotate(
+                post_count=Coalesce(post_count, Value(0)),
+                comment_count=Coalesce(comment_count, Value(0)),
+            )
+            .first()
+        )
+        
+        if profile is None:
+            # No karma yet; the user may still have posted or commented
+            profile = {
+                'karma': 0,
+                'post_like_karma': 0,
+                'comment_like_karma': 0,
+                'post_count': Post.objects.filter(author__name=name).count(),
+                'comment_count': Comment.objects.filter(author__name=name).count(),
+            }
+            if not profile['post_count'] and not profile['comment_count']:
+                raise Http404
+        profile['user'] = name
+        
+        serializer = UserProfileSerializer(profile)
+        return Response(serializer.data)
+    
+    @action(detail=True, methods=['get'])
+    def likes(self, request, name=None):
+        """
+        Get a user's likes, newest first (cursor-paginated), each with a
+        summary of the liked post or comment.
+        
+        Pages merge a range scan of each like table's (user, -created_at, -id)
+        index, which also carries the target column. The targets of a page
+        are loaded with one id IN (...) query per target type.
+        """
+        paginator = ActivityPagination()
+        history = MergedQuerySet(*[
+            like_model.objects.filter(user__name=name).values(
+                'id', 'created_at',
+                target_type=Value(target_type), object_id=F(f'{target_type}_id')
+            )
+            for target_type, like_model in (('post', PostLike), ('comment', CommentLike))
+        ])
+        page = paginator.paginate_queryset(history, request, view=self)
+        targets = _like_targets(page)
+        for row in page:
+            row['target'] = targets.get((row['target_type'], row['object_id']))
+        return paginator.get_paginated_response(UserLikeSerializer(page, many=True).data)
+    
+    @action(detail=True, methods=['get'])
+    def karma(self, request, name=None):
+        """
+        Get a user's karma transactions, newest first (cursor-paginated).
+        Every column read is in the (user, -created_at, -id) index.
+        """
+        paginator = ActivityPagination()
+        page = paginator.paginate_queryset(
+            KarmaTransaction.objects.filter(user__name=name).values(
+                'id', 'points', 'transaction_type', 'content_type_id', 'object_id', 'created_at'
+            ),
+            request, view=self
+        )
+        for row in page:
+            content_type_id = row['content_type_id']
+            row['target_type'] = (
+                ContentType.objects.get_for_id(content_type_id).model if content_type_id else None
+            )
+        return paginator.get_paginated_response(KarmaHistorySerializer(page, many=True).data)
+
+
+class ExportViewSet(viewsets.ViewSet):
+    """
+    Admin-only streaming NDJSON export (see community.export).
+    """
+    permission_classes = [IsAdminUser]
+    
+    def list(self, request):
+        """
+        Stream posts, path-ordered comments, likes and karma transactions as
+        NDJSON (?kind=posts,comments,post_likes,comment_likes,karma, default all).
+        
+        Incremental runs pass the previous run's marks back as
+        ?after_<kind>=<id>, or ?since=<ISO 8601 timestamp>. The marks of this
+        run are in the Export-High-Water-Marks header, set before the body
+        starts. Send Accept-Encoding: gzip for a compressed stream.
+        """
+        kinds = [kind for kind in request.query_params.get('kind', '').split(',') if kind]
+        unknown = [kind for kind in kinds if kind not in export.KINDS]
+        if unknown:
             return Response(
-                {'error': 'User field is required'}, 
+                {'error': f"kind must be one of: {', '.join(export.KINDS)}"},
                 status=status.HTTP_400_BAD_REQUEST
             )
         
+        after_ids = {}
         try:
-            with transaction.atomic():
-                content_type = ContentType.objects.get_for_model(Comment)
-                
-                deleted_count, _ = Like.objects.filter(
-                    user=user,
-                    content_type=content_type,
-                    object_id=comment.id
-                ).delete()
-                
-                if deleted_count == 0:
-                    return Response(
-                        {'error': 'You have not liked this comment'},
-                        status=status.HTTP_400_BAD_REQUEST
-                    )
-                
-                Comment.objects.filter(id=comment.id).update(like_count=F('like_count') - 1)
-                
-                KarmaTransaction.objects.create(
-                    user=comment.author,
-                    points=-1,
-                    transaction_type=KarmaTransaction.COMMENT_LIKE,
-                    content_type=content_type,
-                    object_id=comment.id
-                )
-                
-                comment.refresh_from_db()
-                
-                return Response(
-                    {'message': 'Comment unliked successfully', 'like_count': comment.like_count},
-                    status=status.HTTP_200_OK
-                )
-                
-        except Exception as e:
+            for kind in export.KINDS:
+                if f'after_{kind}' in request.query_params:
+                    after_ids[kind] = int(request.query_params[f'after_{kind}'])
+            since = request.query_params.get('since')
+            since = export.parse_since(since) if since else None
+        except ValueError as exc:
             return Response(
-                {'error': str(e)},
-                status=status.HTTP_500_INTERNAL_SERVER_ERROR
+                {'error': f'Invalid export range: {exc}'},
+                status=status.HTTP_400_BAD_REQUEST
             )
+        
+        run = export.Export(kinds, after_ids=after_ids, since=since)
+        response = StreamingHttpResponse(run.chunks(), content_type='application/x-ndjson')
+        response['Content-Disposition'] = 'attachment; filename="export.ndjson"'
+        response['Export-High-Water-Marks'] = ', '.join(
+            f'{kind}={high}' for kind, high in run.high_water.items() if high is not None
+        )
+        return response
 
 
-class LeaderboardViewSet(viewsets.ViewSet):
+class HomeViewSet(viewsets.ViewSet):
     """
-    ViewSet for leaderboard operations.
-    Calculates karma dynamically from transaction history.
+    ViewSet for the app's first screen.
+    Collapses the feed, leaderboard and liked-state requests into one round trip.
     """
+    LEADERBOARD_LIMIT = 5
     
     def list(self, request):
         """
-        Get top 5 users by karma earned in the last 24 hours.
+        Get the first feed page, the 24h leaderboard and, with ?viewer=<name>,
+        which of those posts the viewer has liked.
         
-        This uses aggregation on KarmaTransaction to calculate recent karma,
-        not a simple integer field on User model.
+        The feed and leaderboard queries are independent and run concurrently
+        on backends that allow it. The response carries an ETag derived from
+        what the payload is built from (post versions, like and comment counts,
+        leaderboard and liked ids), so an unchanged home screen is answered
+        with a 304 before anything is serialized.
         """
-        # Calculate 24 hours ago
-        twenty_four_hours_ago = timezone.now() - timedelta(hours=24)
+        page_size = api_settings.PAGE_SIZE
+        viewer = request.query_params.get('viewer')
         
-        # Aggregate karma from transactions in the last 24 hours
-        # This is the critical query that satisfies the "Complex Aggregation" constraint
-        leaderboard = (
-            KarmaTransaction.objects
-            .filter(created_at__gte=twenty_four_hours_ago)
-            .values('user')
-            .annotate(karma=Sum('points'))
-            .order_by('-karma')[:5]
-        )
+        def feed():
+            posts = list(
+                Post.objects.select_related('author')
+                .annotate(comment_count_annotated=Count('comments'))
+                .order_by('-created_at')[:page_size]
+            )
+            return posts, Post.objects.count()
         
-        # Add rank to results
-        leaderboard_data = []
-        for rank, entry in enumerate(leaderboard, start=1):
-            leaderboard_data.append({
-                'user': entry['user'],
-                'karma': entry['karma'],
-                'rank': rank
-            })
+        def leaderboard():
+            LeaderboardEntry.expire(LeaderboardEntry.DEFAULT_WINDOW)
+            return LeaderboardEntry.top(LeaderboardEntry.DEFAULT_WINDOW, self.LEADERBOARD_LIMIT)
         
-        serializer = LeaderboardSerializer(leaderboard_data, many=True)
-        return Response(serializer.data)
+        (posts, post_count), top = _run_concurrently([feed, leaderboard])
+        
+        next_page = None
+        if post_count > page_size:
+            next_page = request.build_absolute_uri(reverse('post-list')) + '?page=2'
+        
+        liked_posts = None
+        if viewer:
+            liked_posts = list(
+                PostLike.objects.filter(
+                    user__name=viewer,
+                    post_id__in=[post.id for post in posts]
+                ).values_list('post_id', flat=True)
+            )
+        
+        etag = _etag([
+            post_count, next_page, liked_posts,
+            [(post.id, post.updated_at, post.like_count, post.comment_count_annotated) for post in posts],
+            [(entry['user'], entry['karma'], entry['rank']) for entry in top],
+        ])
+        if _etag_matches(request, etag):
+            return Response(status=status.HTTP_304_NOT_MODIFIED, headers={'ETag': etag})
+        
+        data = {
+            'posts': {
+                'count': post_count,
+                'next': next_page,
+                'results': PostSerializer(posts, many=True).data,
+            },
+            'leaderboard': LeaderboardSerializer(top, many=True).data,
+        }
+        if viewer:
+            data['liked_posts'] = liked_posts
+        return Response(data, headers={'ETag': etag})
+
+
+def _etag(version):
+    """Strong entity tag over JSON-encodable version data."""
+    return '"{}"'.format(hashlib.sha1(
+        json.dumps(version, cls=JSONEncoder, sort_keys=True).encode()
+    ).hexdigest())
+
+
+def _etag_matches(request, etag):
+    """
+    If-None-Match check: each listed entity tag is compared exactly, with the
+    weak comparison the header calls for (W/ tags, e.g. from gzip, still match).
+    """
+    tags = parse_etags(request.headers.get('If-None-Match', ''))
+    return '*' in tags or etag in {tag.removeprefix('W/') for tag in tags}
+
+
+# Columns summarizing a liked post or comment (plus a content preview)
+LIKE_TARGET_COLUMNS = {
+    Post: ['id', 'author__name', 'like_count', 'created_at'],
+    Comment: ['id', 'post_id', 'author__name', 'like_count', 'created_at'],
+}
+
+
+def _like_targets(rows):
+    """
+    Summaries of the posts and comments liked in rows (like history rows),
+    keyed by (target_type, object_id). One query per target type.
+    """
+    object_ids = defaultdict(set)
+    for row in rows:
+        object_ids[row['target_type']].add(row['object_id'])
+    
+    targets = {}
+    for model in LIKE_TARGET_COLUMNS:
+        target_type = model._meta.model_name
+        if not object_ids[target_type]:
+            continue
+        summaries = model.objects.filter(id__in=object_ids[target_type]).values(
+            *LIKE_TARGET_COLUMNS[model],
+            content_preview=Substr('content', 1, SparseFieldsetMixin.DEFAULT_CONTENT_PREVIEW)
+        )
+        for summary in summaries:
+            targets[(target_type, summary['id'])] = summary
+    return targets
+
+
+def _run_concurrently(tasks):
+    """
+    Run independent read-only query functions, returning their results in order.
+    Uses one thread (and so one database connection) per task on Postgres;
+    SQLite and callers inside a transaction run them sequentially.
+    """
+    if connection.vendor != 'postgresql' or connection.in_atomic_block:
+        return [task() for task in tasks]
+    with ThreadPoolExecutor(max_workers=len(tasks)) as pool:
+        return list(pool.map(_run_with_own_connection, tasks))
+
+
+def _run_with_own_connection(task):
+    try:
+        return task()
+    finally:
+        # Each worker thread opened its own connection
+        connection.close()
@@ -0,0 +1,108 @@
+"""
+Warm a freshly started worker before real traffic reaches it.
+
+The first requests after a deploy or worker recycle pay for cold caches:
+ContentType lookups, URL resolution, serializer and renderer setup, cold
+database pages and empty comment tree cache entries. warm_up() runs the
+views of the hottest read requests, within a time budget, so those costs
+land on the warmup instead of a user.
+
+Views are called directly with RequestFactory requests rather than through
+django.test.Client: the test client disconnects the request_started /
+request_finished connection cleanup while it runs, which would race with
+the real requests this worker serves at the same time.
+
+gunicorn.conf.py starts it in a background thread in every worker once the
+worker has loaded the app, so the worker accepts requests immediately and
+warming never delays readiness.
+"""
+import threading
+import time
+
+from django.conf import settings
+from django.contrib.contenttypes.models import ContentType
+from django.db import connection
+from django.test import RequestFactory
+from django.urls import resolve
+
+from .models import Post, Comment
+
+
+def _host():
+    """A host name the app accepts, for requests that build absolute URLs."""
+    for host in settings.ALLOWED_HOSTS:
+        host = host.lstrip('.')
+        if host and host != '*':
+            return host
+    return 'localhost'
+
+
+def _view_caller():
+    """A get(path, params) that runs the path's view and renders its response."""
+    factory = RequestFactory(HTTP_HOST=_host())
+
+    def get(path, params=None):
+        request = factory.get(path, params)
+        match = resolve(request.path_info)
+        response = match.func(request, *match.args, **match.kwargs)
+        if hasattr(response, 'render'):
+            response.render()
+        return response
+
+    return get
+
+
+def warm_up(budget=None, feed_pages=None, hot_posts=None):
+    """
+    Preload the feed, leaderboard and hottest post trees, stopping once
+    `budget` seconds have been spent. Returns [(step, milliseconds), ...]
+    for the steps that ran.
+    """
+    budget = settings.WARMUP_TIME_BUDGET if budget is None else budget
+    feed_pages = settings.WARMUP_FEED_PAGES if feed_pages is None else feed_pages
+    hot_posts = settings.WARMUP_HOT_POSTS if hot_posts is None else hot_posts
+    get = _view_caller()
+    deadline = time.monotonic() + budget
+    timings = []
+
+    def steps():
+        yield 'content types', lambda: ContentType.objects.get_for_models(Post, Comment)
+        page_size = settings.REST_FRAMEWORK['PAGE_SIZE']
+        pages = max(1, min(feed_pages, -(-Post.objects.count() // page_size)))
+        for page in range(1, pages + 1):
+            yield f'feed page {page}', lambda page=page: get('/api/posts/', {'page': page})
+        yield 'hot feed', lambda: get('/api/posts/', {'sort': 'hot'})
+        yield 'leaderboard', lambda: get('/api/leaderboard/')
+        yield 'home', lambda: get('/api/home/')
+        hottest = Post.objects.order_by('-hot_score', '-id').values_list('id', flat=True)[:hot_posts]
+        for post_id in hottest:
+            # Fills the comment tree cache for the post
+            yield f'post {post_id}', lambda post_id=post_id: get(f'/api/posts/{post_id}/')
+
+    for name, step in steps():
+        if time.monotonic() >= deadline:
+            break
+        start = time.monotonic()
+        step()
+        timings.append((name, round((time.monotonic() - start) * 1000, 1)))
+    return timings
+
+
+def start_in_background(callback=None):
+    """
+    Run warm_up() in a daemon thread. callback, if given, receives the
+    timings, or the exception if warming failed.
+    """
+    def run():
+        try:
+            result = warm_up()
+        except Exception as exc:
+            result = exc
+        finally:
+            connection.close()
+        if callback:
+            callback(result)
+
+    thread = threading.Thread(target=run, name='warmup', daemon=True)
+    thread.start()
+    return thread
@@ -3,8 +3,9 @@ Django settings for config project.
 """
 
 from pathlib import Path
+from corsheaders.defaults import default_headers
 from decouple import config
-import os
+import importlib.util
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
@@ -37,6 +38,7 @@ INSTALLED_APPS = [
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
     'whitenoise.middleware.WhiteNoiseMiddleware',
+    'community.middleware.CompressionMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'corsheaders.middleware.CorsMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -66,12 +68,72 @@ TEMPLATES = [
 
 WSGI_APPLICATION = 'config.wsgi.application'
 
+# API-only workers (ADMIN_ENABLED=False) skip loading the admin and the
+# session and message framework it depends on; the API uses none of them.
+ADMIN_ENABLED = config('ADMIN_ENABLED', default=True, cast=bool)
+if not ADMIN_ENABLED:
+    ADMIN_ONLY_APPS = ['django.contrib.admin', 'django.contrib.sessions', 'django.contrib.messages']
+    INSTALLED_APPS = [app for app in INSTALLED_APPS if app not in ADMIN_ONLY_APPS]
+    MIDDLEWARE = [
+        middleware for middleware in MIDDLEWARE
+        if not middleware.startswith(('django.contrib.sessions.', 'django.contrib.auth.',
+                                      'django.contrib.messages.'))
+    ]
+    TEMPLATES[0]['OPTIONS']['context_processors'].remove(
+        'django.contrib.messages.context_processors.messages'
+    )
+
 # Database
-DATABASES = {
-    'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
+# SQLite by default. Set DB_ENGINE=postgresql (with DB_NAME, DB_USER,
+# DB_PASSWORD, DB_HOST and DB_PORT) for PostgreSQL, which natively
+# partitions karma transactions by day (community.partitions)
+DB_ENGINE = config('DB_ENGINE', default='sqlite3')
+if DB_ENGINE == 'postgresql':
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.postgresql',
+            'NAME': config('DB_NAME', default='community'),
+            'USER': config('DB_USER', default='postgres'),
+            'PASSWORD': config('DB_PASSWORD', default=''),
+            'HOST': config('DB_HOST', default='localhost'),
+            'PORT': config('DB_PORT', default='5432'),
+        }
     }
+else:
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': BASE_DIR / 'db.sqlite3',
+        }
+    }
+
+# Cache
+# Per-process memory cache by default. Set REDIS_URL (requires the redis
+# package) so every worker shares one cache; the comment tree cache is only
+# used then (community.tree_cache).
+REDIS_URL = config('REDIS_URL', default='')
+IDEMPOTENCY_KEY_TTL = config('IDEMPOTENCY_KEY_TTL', default=24 * 60 * 60, cast=int)
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': REDIS_URL,
+    } if REDIS_URL else {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    # Responses stored for Idempotency-Key replays (community.idempotency).
+    # Every worker has to see the same keys, so without Redis they go in a
+    # database table (the IdempotencyKey model, so `migrate` creates it).
+    'idempotency': {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': REDIS_URL,
+        'KEY_PREFIX': 'idempotency',
+        'TIMEOUT': IDEMPOTENCY_KEY_TTL,
+    } if REDIS_URL else {
+        'BACKEND': 'django.core.cache.backends.db.DatabaseCache',
+        'LOCATION': 'community_idempotency_key',
+        'TIMEOUT': IDEMPOTENCY_KEY_TTL,
+        'OPTIONS': {'MAX_ENTRIES': 100000},
+    },
 }
 
 # Password validation
@@ -108,11 +170,45 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 REST_FRAMEWORK = {
     'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.PageNumberPagination',
     'PAGE_SIZE': 20,
+    # orjson-backed when installed, stdlib json otherwise
     'DEFAULT_RENDERER_CLASSES': [
-        'rest_framework.renderers.JSONRenderer',
+        'community.renderers.FastJSONRenderer',
+    ],
+    'DEFAULT_PARSER_CLASSES': [
+        'rest_framework.parsers.JSONParser',
+        'rest_framework.parsers.FormParser',
+        'rest_framework.parsers.MultiPartParser',
     ],
 }
 
+# Opt-in MessagePack (Accept / Content-Type: application/msgpack) when msgpack is installed
+if importlib.util.find_spec('msgpack'):
+    REST_FRAMEWORK['DEFAULT_RENDERER_CLASSES'].append('community.renderers.MessagePackRenderer')
+    REST_FRAMEWORK['DEFAULT_PARSER_CLASSES'].append('community.renderers.MessagePackParser')
+
+# Queue like side effects (counters, karma, caches) in the LikeEvent outbox
+# instead of applying them in the request; requires the process_like_events worker
+LIKE_OUTBOX = config('LIKE_OUTBOX', default=False, cast=bool)
+
+# Author name -> id lookups kept per process (community.authors)
+AUTHOR_CACHE_SIZE = config('AUTHOR_CACHE_SIZE', default=100000, cast=int)
+
+# KarmaTransaction day partitions (community.partitions): days created ahead,
+# and days of history kept (0 keeps everything). Older days are dropped, after
+# being archived as NDJSON to KARMA_ARCHIVE_DIR when it is set
+KARMA_PARTITION_AHEAD_DAYS = config('KARMA_PARTITION_AHEAD_DAYS', default=7, cast=int)
+KARMA_RETENTION_DAYS = config('KARMA_RETENTION_DAYS', default=0, cast=int)
+KARMA_ARCHIVE_DIR = config('KARMA_ARCHIVE_DIR', default='')
+
+# Worker warmup after fork (community.warmup, started from gunicorn.conf.py)
+WARMUP_ON_START = config('WARMUP_ON_START', default=True, cast=bool)
+WARMUP_TIME_BUDGET = config('WARMUP_TIME_BUDGET', default=5.0, cast=float)
+WARMUP_FEED_PAGES = config('WARMUP_FEED_PAGES', default=2, cast=int)
+WARMUP_HOT_POSTS = config('WARMUP_HOT_POSTS', default=10, cast=int)
+
+# Responses smaller than this many bytes are not gzipped
+COMPRESSION_MIN_SIZE = config('COMPRESSION_MIN_SIZE', default=1024, cast=int)
+
 # CORS settings
 CORS_ALLOWED_ORIGINS = config(
     'CORS_ALLOWED_ORIGINS',
@@ -120,3 +216,5 @@ CORS_ALLOWED_ORIGINS = config(
     cast=lambda v: [s.strip() for s in v.split(',')]
 )
 CORS_ALLOW_CREDENTIALS = True
+CORS_ALLOW_HEADERS = (*default_headers, 'idempotency-key')
+CORS_EXPOSE_HEADERS = ['Idempotent-Replayed', 'Export-High-Water-Marks']
@@ -1,10 +1,15 @@
 """
 URL configuration for config project.
 """
-from django.contrib import admin
+from django.conf import settings
 from django.urls import path, include
 
 urlpatterns = [
-    path('admin/', admin.site.urls),
     path('api/', include('community.urls')),
 ]
+
+# Left out on API-only workers (ADMIN_ENABLED=False)
+if settings.ADMIN_ENABLED:
+    from django.contrib import admin
+
+    urlpatterns.append(path('admin/', admin.site.urls))
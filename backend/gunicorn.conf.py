@@ -0,0 +1,47 @@
+"""
+Gunicorn settings, read automatically when gunicorn starts in this directory.
+Command line flags (e.g. --bind 0.0.0.0:$PORT) still take precedence.
+"""
+# Module-level names are read as gunicorn settings, so use decouple.config
+# rather than importing config (a gunicorn setting of its own)
+import decouple
+
+
+# Import the app once in the master and fork workers from it: workers start
+# almost instantly and share the loaded code copy-on-write
+preload_app = decouple.config('GUNICORN_PRELOAD', default=False, cast=bool)
+
+
+def pre_fork(server, worker):
+    """
+    With preload_app the master has loaded Django: close any database and
+    cache connections it opened so no worker inherits (and shares) a socket.
+    Each worker opens its own connections on first use.
+    """
+    if not server.cfg.preload_app:
+        return
+
+    from django.core.cache import caches
+    from django.db import connections
+
+    connections.close_all()
+    caches.close_all()
+
+
+def post_worker_init(worker):
+    """Warm each new worker's caches in the background (community.warmup)."""
+    from django.conf import settings
+
+    if not settings.WARMUP_ON_START:
+        return
+
+    from community import warmup
+
+    def done(result):
+        if isinstance(result, Exception):
+            worker.log.warning('Warmup failed: %r', result)
+        else:
+            total = sum(ms for _, ms in result)
+            worker.log.info('Warmed up %d endpoints in %.0fms', len(result), total)
+
+    warmup.start_in_background(done)
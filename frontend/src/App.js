@@ -1,11 +1,12 @@
 import React, { useState, useEffect } from 'react';
 import Post from './components/Post';
 import Leaderboard from './components/Leaderboard';
-import { postAPI } from './services/api';
+import { homeAPI, postAPI } from './services/api';
 import './index.css';
 
 function App() {
   const [posts, setPosts] = useState([]);
+  const [leaderboard, setLeaderboard] = useState(null);
   const [loading, setLoading] = useState(true);
   const [currentUser, setCurrentUser] = useState('');
   const [showNewPostForm, setShowNewPostForm] = useState(false);
@@ -20,16 +21,18 @@ function App() {
     } else {
       setUserModalOpen(true);
     }
-    fetchPosts();
+    fetchHome();
   }, []);
 
-  const fetchPosts = async () => {
+  const fetchHome = async () => {
     setLoading(true);
     try {
-      const response = await postAPI.getAll();
-      setPosts(response.data.results || response.data);
+      // Feed and leaderboard arrive in one round trip
+      const response = await homeAPI.get();
+      setPosts(response.data.posts.results);
+      setLeaderboard(response.data.leaderboard);
     } catch (error) {
-      console.error('Error fetching posts:', error);
+      console.error('Error fetching home:', error);
     } finally {
       setLoading(false);
     }
@@ -54,7 +57,7 @@ function App() {
       });
       setNewPostContent('');
       setShowNewPostForm(false);
-      fetchPosts();
+      fetchHome();
     } catch (error) {
       console.error('Error creating post:', error);
       alert('Failed to create post. Please try again.');
@@ -81,7 +84,7 @@ function App() {
   const handleUnlike = async (postId) => {
     try {
       await postAPI.unlike(postId, currentUser);
-      fetchPosts();
+      fetchHome();
     } catch (error) {
       console.error('Error unliking post:', error);
     }
@@ -209,7 +212,7 @@ function App() {
                   currentUser={currentUser}
                   onLike={handleLike}
                   onUnlike={handleUnlike}
-                  onUpdate={fetchPosts}
+                  onUpdate={fetchHome}
                 />
               ))
             ) : (
@@ -241,7 +244,7 @@ function App() {
 
           {/* Leaderboard */}
           <div className="lg:col-span-1">
-            <Leaderboard />
+            <Leaderboard entries={leaderboard} />
           </div>
         </div>
       </main>
@@ -1,7 +1,7 @@
 import React, { useEffect, useState } from 'react';
 import { leaderboardAPI } from '../services/api';
 
-const Leaderboard = () => {
+const Leaderboard = ({ entries }) => {
   const [leaderboard, setLeaderboard] = useState([]);
   const [loading, setLoading] = useState(true);
 
@@ -16,8 +16,15 @@ const Leaderboard = () => {
     }
   };
 
+  // The first entries come with the home payload
+  useEffect(() => {
+    if (entries) {
+      setLeaderboard(entries);
+      setLoading(false);
+    }
+  }, [entries]);
+
   useEffect(() => {
-    fetchLeaderboard();
     // Refresh every 30 seconds
     const interval = setInterval(fetchLeaderboard, 30000);
     return () => clearInterval(interval);
@@ -28,4 +28,8 @@ export const leaderboardAPI = {
   get: () => api.get('/leaderboard/'),
 };
 
+export const homeAPI = {
+  get: (viewer) => api.get('/home/', { params: viewer ? { viewer } : {} }),
+};
+
 export default api;